@@ -1,9 +1,11 @@
 # -*- coding: Windows-1252 -*-
 from motor import *
 from servo_controller_improved import servo_controller
-from gpiozero import InputDevice
+from ir_sensors import get_ir_sensors
 from servo_controller import set_angle
 from ultrasound import checkdist
+from control_loop import ControlLoop
+from ir_state_machine import IRStateMachine, TRACKING_TABLE, VIRAGE_STATES
 import threading
 from time import sleep
 import time
@@ -12,6 +14,7 @@ import time
 line_pin_left = 17
 line_pin_middle = 27
 line_pin_right = 22
+IR_PINS = (line_pin_right, line_pin_middle, line_pin_left)  # Ordre (gauche, milieu, droite) du code original
 
 # Configuration des angles du servo de direction
 ANGLE_CENTER = 90     # Position centrale
@@ -28,6 +31,26 @@ MOTOR_SPEED_NORMAL = 25   # Vitesse normale
 MOTOR_SPEED_SLOW = 15     # Vitesse reduite en virage
 MOTOR_SPEED_SEARCH = 10   # Vitesse de recherche
 
+# Dcision capteurs + dernier virage -> angle, vitesse, virage (ir_state_machine)
+ANGLES = {
+    'center': ANGLE_CENTER,
+    'left': ANGLE_LEFT,
+    'right': ANGLE_RIGHT,
+    'sharp_left': ANGLE_SHARP_LEFT,
+    'sharp_right': ANGLE_SHARP_RIGHT,
+}
+state_machine = IRStateMachine(TRACKING_TABLE, states=VIRAGE_STATES, angles=ANGLES,
+                               speeds={'normal': MOTOR_SPEED_NORMAL}, name="challenge2_v2")
+
+# LEDs arrire selon l'action dcide
+BACK_LIGHT_EVENTS = {
+    'sharp_right': 'on_turn_right',
+    'right': 'on_turn_right',
+    'forward': 'on_move_forward',
+    'sharp_left': 'on_turn_left',
+    'left': 'on_turn_left',
+}
+
 # D?finition des fonctions motor manquantes
 def motor_25():
     """Avance ? vitesse normale"""
@@ -49,10 +72,8 @@ class Challenge2V2:
         self.back_light_controller = back_light_controller
         self.camera = camera
         
-        # Capteurs - seront initialiss au dmarrage
-        self.left = None
-        self.middle = None
-        self.right = None
+        # Capteurs IR (service partag) - rcuprs au dmarrage
+        self.ir_sensors = None
         
         # Variables d'?tat
         self.virage = 0  # -1=gauche ; 0=toutdroit ; 1=droit
@@ -63,6 +84,11 @@ class Challenge2V2:
         # Thread pour mise ? jour couleur
         self.color_update_thread = None
         self.color_update_running = False
+        
+        # Boucle de controle a frequence fixe (100 Hz)
+        self.control_loop = ControlLoop(rate=100, name="challenge2_v2", stop_on_error=True)
+        self.control_loop.add_phase("sense", self.sense)
+        self.control_loop.add_phase("act", self.act)
     
     def update_color_from_camera(self):
         """Thread pour mettre ? jour la couleur des LEDs selon la cam?ra"""
@@ -91,15 +117,32 @@ class Challenge2V2:
                 print(f"Erreur mise ? jour couleur: {e}")
                 time.sleep(1)
 
-    def tracking(self, virage):
+    def read_sensors(self):
+        """Etat des capteurs (gauche, milieu, droite)"""
+        return self.ir_sensors.read(IR_PINS)
+
+    def wait_line(self):
+        """
+        Attend qu'un capteur voie la ligne (rveil sur front) ou que le
+        programme soit arrt. Retourne l'tat des capteurs.
+        """
+        while self.running:
+            status = self.ir_sensors.wait_for(any, timeout=0.1, pins=IR_PINS)
+            if status is not None:
+                return status
+        return (0, 0, 0)
+
+    def tracking(self, virage, status=None):
         """Fonction de suivi de ligne originale avec LEDs arri?re"""
-        status_right = self.right.value
-        status_middle = self.middle.value
-        status_left = self.left.value
+        if status is None:
+            status = self.read_sensors()
+        status_left, status_middle, status_right = status
 
         print("Current : ", status_left, " +", status_middle, " + ", status_right, "\n")
 
-        if status_left == 0 and status_middle == 0 and status_right == 0: #1
+        decision = state_machine.decide(status, virage)
+
+        if decision.action == 'lost': #1
             # Arr?t et notification des LEDs arri?re
             if self.back_light_controller:
                 self.back_light_controller.on_stop()
@@ -111,25 +154,23 @@ class Challenge2V2:
             
             print(virage)
             
-            if virage == -1:
-                set_angle(0, ANGLE_SHARP_RIGHT)
-                if self.back_light_controller:
+            # Braquage du recul selon le dernier virage
+            if decision.angle is not None:
+                set_angle(0, decision.angle)
+            if self.back_light_controller:
+                if virage == -1:
                     self.back_light_controller.on_turn_right()
-            elif virage == 1:
-                set_angle(0, ANGLE_SHARP_LEFT)
-                if self.back_light_controller:
+                elif virage == 1:
                     self.back_light_controller.on_turn_left()
             
             sleep(0.5)
 
             # Recherche de la ligne en reculant
-            while(status_left != 1 and status_middle != 1 and status_right != 1):
-                status_right = self.right.value
-                status_middle = self.middle.value
-                status_left = self.left.value
-                motor_25_negative()
-                if self.back_light_controller:
-                    self.back_light_controller.on_move_backward()
+            # Rveil sur le premier front d'un capteur (plus de boucle active)
+            motor_25_negative()
+            if self.back_light_controller:
+                self.back_light_controller.on_move_backward()
+            status_left, status_middle, status_right = self.wait_line()
                     
             motorStop()
             
@@ -142,44 +183,15 @@ class Challenge2V2:
             motor_25()
 
         else:
-            drive()
+            Motor(1, 1, decision.speed)
+            if decision.angle is not None:
+                set_angle(0, decision.angle)
+            virage = decision.state
             
-            # Mise ? jour des LEDs arri?re selon la direction
-            if status_left == 0 and status_middle == 0 and status_right == 1: #2
-                set_angle(0, ANGLE_SHARP_RIGHT)
-                virage = 1
-                if self.back_light_controller:
-                    self.back_light_controller.on_turn_right()
-                
-            elif status_left == 0 and status_middle == 1 and status_right == 0: #3
-                set_angle(0, ANGLE_CENTER)
-                virage = 0
-                if self.back_light_controller:
-                    self.back_light_controller.on_move_forward()
-                
-            elif status_left == 0 and status_middle == 1 and status_right == 1: #4
-                set_angle(0, ANGLE_RIGHT)
-                virage = 1
-                if self.back_light_controller:
-                    self.back_light_controller.on_turn_right()
-                
-            elif status_left == 1 and status_middle == 0 and status_right == 0: #5
-                set_angle(0, ANGLE_SHARP_LEFT)
-                virage = -1
-                if self.back_light_controller:
-                    self.back_light_controller.on_turn_left()
-                
-            elif status_left == 1 and status_middle == 1 and status_right == 0: #7
-                set_angle(0, ANGLE_LEFT)
-                virage = -1
-                if self.back_light_controller:
-                    self.back_light_controller.on_turn_left()
-                
-            elif status_left == 1 and status_middle == 1 and status_right == 1: #8
-                set_angle(0, ANGLE_CENTER)
-                virage = 0
-                if self.back_light_controller:
-                    self.back_light_controller.on_move_forward()
+            # Mise  jour des LEDs arrire selon la direction
+            event = BACK_LIGHT_EVENTS.get(decision.action)
+            if event and self.back_light_controller:
+                getattr(self.back_light_controller, event)()
         
         return status_left, status_middle, status_right, virage
 
@@ -195,8 +207,9 @@ class Challenge2V2:
         # Scan gauche
         set_angle(1, RIGHT_ANGLE_LEFT)
         sleep(2)
-        print(checkdist())
-        if checkdist() < 250:
+        distance = checkdist()
+        print(distance)
+        if distance < 250:
             tete = -1
         
         sleep(1)
@@ -204,8 +217,9 @@ class Challenge2V2:
         # Scan droite
         set_angle(1, RIGHT_ANGLE_RIGHT)
         sleep(2)
-        print(checkdist())
-        if checkdist() < 250:
+        distance = checkdist()
+        print(distance)
+        if distance < 250:
             tete = 1
         
         print(tete)
@@ -251,28 +265,36 @@ class Challenge2V2:
             if self.back_light_controller:
                 self.back_light_controller.on_turn_right()
         
-        # Recherche de la ligne
-        status_right = self.right.value
-        status_middle = self.middle.value
-        status_left = self.left.value
-        
-        while status_left != 1 and status_middle != 1 and status_right != 1:
-            status_right = self.right.value
-            status_middle = self.middle.value
-            status_left = self.left.value
-            motor_25()
-            if self.back_light_controller:
-                self.back_light_controller.on_move_forward()
+        # Recherche de la ligne : avance jusqu'au premier front d'un capteur
+        motor_25()
+        if self.back_light_controller:
+            self.back_light_controller.on_move_forward()
+        self.wait_line()
         
         tete = 0
 
+    def sense(self):
+        """Phase capteurs : etat IR et distance"""
+        return self.read_sensors(), checkdist()
+
+    def act(self, data):
+        """Phase action : suivi de ligne, ou evitement si obstacle"""
+        status, distance = data
+        a, b, c, self.virage = self.tracking(self.virage, status)
+        if status == (0, 0, 0):
+            # Recul bloquant pour retrouver la ligne
+            self.control_loop.resync()
+        
+        # D?tection d'obstacle
+        if distance < self.obstacle_distance:
+            self.evitement()
+            self.control_loop.resync()
+
     def _main_loop(self):
         """Boucle principale du programme comme l'original"""
-        # Initialiser les capteurs au dmarrage
+        # Capteurs IR au dmarrage
         try:
-            self.left = InputDevice(pin=line_pin_right)
-            self.middle = InputDevice(pin=line_pin_middle)
-            self.right = InputDevice(pin=line_pin_left)
+            self.ir_sensors = get_ir_sensors()
         except Exception as e:
             print(f"Erreur initialisation capteurs: {e}")
             self.running = False
@@ -296,29 +318,10 @@ class Challenge2V2:
             self.color_update_thread = threading.Thread(target=self.update_color_from_camera, daemon=True)
             self.color_update_thread.start()
         
-        status_right_before = 0
-        status_middle_before = 1
-        status_left_before = 0
+        self.virage = 0  # -1=gauche ; 0=toutdroit ; 1=droit
         
-        counter = 0
-        virage = 0  # -1=gauche ; 0=toutdroit ; 1=droit
-        
-        while self.running:  # Condition de fin ajout?e
-            try:
-                # Suivi de ligne
-                a, b, c, virage = self.tracking(virage)
-                print("Past : ", status_left_before, " +", status_middle_before, " + ", status_right_before)
-                
-                # D?tection d'obstacle
-                if checkdist() < self.obstacle_distance:
-                    self.evitement()
-                
-                # Petite pause pour ne pas surcharger le CPU
-                time.sleep(0.02)
-                
-            except Exception as e:
-                print(f"Erreur dans la boucle principale: {e}")
-                break
+        # Boucle a 100 Hz jusqu'a stop() (condition de fin)
+        self.control_loop.run(condition=lambda: self.running)
         
         # Arr?t des moteurs quand on sort de la boucle
         motorStop()
@@ -369,19 +372,7 @@ class Challenge2V2:
         if self.back_light_controller:
             self.back_light_controller.on_stop()
         
-        # Librer les pins GPIO des capteurs
-        try:
-            if self.left:
-                self.left.close()
-                self.left = None
-            if self.middle:
-                self.middle.close()
-                self.middle = None
-            if self.right:
-                self.right.close()
-                self.right = None
-        except Exception as e:
-            print(f"Erreur lors de la libration des capteurs: {e}")
+        # Les capteurs IR restent ouverts : service partag avec les autres modes
         
         print("Challenge 2 V2 arr?t? compl?tement")
         return True
@@ -392,15 +383,13 @@ class Challenge2V2:
 
     def get_status(self):
         """Retourne le statut actuel"""
-        sensors = (self.left.value if self.left else 0, 
-                  self.middle.value if self.middle else 0, 
-                  self.right.value if self.right else 0)
+        sensors = self.ir_sensors.read(IR_PINS) if self.ir_sensors else (0, 0, 0)
         return {
             'running': self.running,
             'sensors': sensors,
             'virage': self.virage,
             'obstacle_detected': checkdist() < self.obstacle_distance,
-            'stats': {}
+            'stats': self.control_loop.get_status()
         }
     
     def set_obstacle_distance(self, distance):
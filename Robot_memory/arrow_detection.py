@@ -6,11 +6,20 @@ import numpy as np
 class ArrowDetector:
     def __init__(self, threshold=70, min_area=1000):
         self.threshold = threshold
-        self.min_area = min_area
-
-    def detect_arrow(self, frame):
+        self.min_area = min_area    # Aire exprimee pour une image 640x480
+        self.reference_width = 640
+
+    def analyze(self, frame):
+        """
+        Detecte une fleche dans frame sans rien dessiner.
+        Retourne un dict : direction ('left', 'right', 'none', ou None sans
+        image), center et tip (pixels de frame) et polygon (liste de points),
+        ces trois derniers a None si aucune fleche n'est trouvee.
+        """
+        result = {'direction': "none", 'center': None, 'tip': None, 'polygon': None}
         if frame is None:
-            return None, frame
+            result['direction'] = None
+            return result
 
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         blurred = cv2.GaussianBlur(gray, (5, 5), 0)
@@ -18,15 +27,17 @@ class ArrowDetector:
 
         contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         if not contours:
-            return "none", frame
+            return result
 
+        # Seuil d'aire ramene a la resolution de la frame analysee
+        scale = frame.shape[1] / self.reference_width
         contour = max(contours, key=cv2.contourArea)
-        if cv2.contourArea(contour) < self.min_area:
-            return "none", frame
+        if cv2.contourArea(contour) < self.min_area * scale * scale:
+            return result
 
         M = cv2.moments(contour)
         if M["m00"] == 0:
-            return "none", frame
+            return result
         cx = int(M["m10"] / M["m00"])
         cy = int(M["m01"] / M["m00"])
         center = (cx, cy)
@@ -36,7 +47,7 @@ class ArrowDetector:
         approx = cv2.approxPolyDP(contour, epsilon, True)
 
         if len(approx) < 3:
-            return "none", frame  # Pas suffisant pour une flche
+            return result  # Pas suffisant pour une flche
 
         # Trouver le segment le plus court
         min_dist = float("inf")
@@ -52,22 +63,48 @@ class ArrowDetector:
                 tip = (pt1, pt2)
 
         if tip is None:
-            return "none", frame
+            return result
 
         # Choisir l'extrmit du segment le plus proche du bord comme la "pointe"
         # (par rapport au centre du contour)
         tip_point = tip[0] if np.linalg.norm(tip[0] - np.array(center)) > np.linalg.norm(tip[1] - np.array(center)) else tip[1]
 
-        direction = "left" if tip_point[0] < cx else "right"
-
-        # Affichage
-        cv2.circle(frame, center, 5, (255, 0, 0), -1)
-        cv2.circle(frame, tuple(tip_point), 5, (0, 0, 255), -1)
-        cv2.drawContours(frame, [approx], -1, (0, 255, 0), 2)
-        cv2.putText(frame, f"Direction: {direction}", (10, 40),
+        result['direction'] = "left" if tip_point[0] < cx else "right"
+        result['center'] = center
+        result['tip'] = (int(tip_point[0]), int(tip_point[1]))
+        result['polygon'] = [(int(x), int(y)) for x, y in approx[:, 0]]
+        return result
+
+    def draw_result(self, overlay, result, scale=1.0):
+        """
+        Dessine un resultat de analyze() sur overlay.
+        scale : rapport entre la largeur d'overlay et celle de la frame analysee.
+        """
+        if result['polygon'] is None:
+            return overlay
+        center = (int(result['center'][0] * scale), int(result['center'][1] * scale))
+        tip_point = (int(result['tip'][0] * scale), int(result['tip'][1] * scale))
+        approx = (np.array(result['polygon']) * scale).astype(np.int32)
+        cv2.circle(overlay, center, 5, (255, 0, 0), -1)
+        cv2.circle(overlay, tip_point, 5, (0, 0, 255), -1)
+        cv2.drawContours(overlay, [approx], -1, (0, 255, 0), 2)
+        cv2.putText(overlay, f"Direction: {result['direction']}", (10, 40),
                     cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
-
-        return direction, frame
+        return overlay
+
+    def detect_arrow(self, frame, overlay=None):
+        """
+        Detecte une fleche dans frame et retourne (direction, image annotee).
+        Si overlay est fourni (par ex. frame pleine resolution quand frame est
+        le flux lores), les annotations y sont dessinees a l'echelle.
+        Pour detecter sans dessiner (frame partagee), utiliser analyze().
+        """
+        if overlay is None:
+            overlay = frame
+        result = self.analyze(frame)
+        if frame is not None:
+            self.draw_result(overlay, result, overlay.shape[1] / frame.shape[1])
+        return result['direction'], overlay
         
         
         # arrow_detection.py
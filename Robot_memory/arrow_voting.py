@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+# arrow_voting.py - Vote temporel continu sur la direction des fleches
+import threading
+import time
+
+from arrow_detection import ArrowDetector
+
+
+class ArrowVoter:
+    """
+    Analyse chaque frame capturee (flux lores) et tient un vote a moyenne
+    exponentielle pour chaque direction ('left', 'right', 'none').
+
+    Une direction est decidee tant que son vote depasse le seuil de
+    confiance, en general apres quelques frames (quelques centaines de ms).
+    get_decision() ne bloque jamais ; wait_decision() attend une decision.
+    """
+
+    DIRECTIONS = ("left", "right", "none")
+
+    def __init__(self, camera, detector=None, alpha=0.3, threshold=0.8,
+                 none_threshold=0.95, min_frames=3):
+        self.camera = camera
+        self.detector = detector or getattr(camera, 'arrow_detector', None) or ArrowDetector()
+
+        self.alpha = alpha                    # Poids de la nouvelle frame dans le vote
+        self.threshold = threshold            # Confiance pour decider 'left' / 'right'
+        self.none_threshold = none_threshold  # 'none' (marche arriere) demande plus de certitude
+        self.min_frames = min_frames          # Frames minimum depuis le dernier reset
+
+        self.condition = threading.Condition()
+        self.votes = dict.fromkeys(self.DIRECTIONS, 0.0)
+        self.frames = 0
+        self.decision = None
+        self.decision_time = None
+        self.reset_time = time.monotonic()
+
+        self.thread = None
+        self.running = False
+
+        # Statistiques
+        self.stats = {
+            'frames_analyzed': 0,
+            'decisions': 0,
+            'errors': 0
+        }
+
+    def _vote(self, direction):
+        """Ajoute l'observation d'une frame au vote (sous verrou)"""
+        if direction not in self.votes:
+            direction = "none"
+        for name in self.DIRECTIONS:
+            hit = 1.0 if name == direction else 0.0
+            self.votes[name] += self.alpha * (hit - self.votes[name])
+        self.frames += 1
+
+        # La decision suit le vote : elle change si une autre direction
+        # depasse le seuil, et disparait si aucune ne le depasse plus
+        decision = None
+        if self.frames >= self.min_frames:
+            for name in self.DIRECTIONS:
+                threshold = self.none_threshold if name == "none" else self.threshold
+                if self.votes[name] >= threshold:
+                    decision = name
+                    break
+
+        if decision != self.decision:
+            self.decision = decision
+            if decision is not None:
+                self.decision_time = time.monotonic()
+                self.stats['decisions'] += 1
+                self.condition.notify_all()
+
+    def _loop(self):
+        """Boucle du thread : une frame capturee = une observation"""
+        last_seq = 0
+        while self.running:
+            entry = self.camera.wait_for_frame(last_seq, timeout=1.0, stream="lores")
+            if entry is None:
+                continue
+            last_seq = entry[0]
+
+            try:
+                direction = self.detector.analyze(entry[2])['direction']
+            except Exception as e:
+                print(f"Erreur vote fleche: {e}")
+                self.stats['errors'] += 1
+                continue
+
+            with self.condition:
+                self.stats['frames_analyzed'] += 1
+                self._vote(direction)
+
+    def reset(self):
+        """Oublie les votes precedents (nouvelle intersection)"""
+        with self.condition:
+            self.votes = dict.fromkeys(self.DIRECTIONS, 0.0)
+            self.frames = 0
+            self.decision = None
+            self.decision_time = None
+            self.reset_time = time.monotonic()
+
+    def get_decision(self):
+        """
+        Retourne (direction, confiance) sans bloquer.
+        direction vaut None tant qu'aucune direction n'a passe le seuil.
+        """
+        with self.condition:
+            if self.decision is None:
+                return None, 0.0
+            return self.decision, self.votes[self.decision]
+
+    def get_leader(self):
+        """Direction actuellement en tete du vote et sa confiance"""
+        with self.condition:
+            name = max(self.DIRECTIONS, key=self.votes.get)
+            return name, self.votes[name]
+
+    def wait_decision(self, timeout=2.0):
+        """
+        Attend une decision au plus timeout secondes.
+        Sans decision, retourne la direction en tete du vote ('none' si vide).
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.decision is not None or not self.running,
+                                    timeout)
+            if self.decision is not None:
+                return self.decision
+            if self.frames == 0:
+                return "none"
+            return max(self.DIRECTIONS, key=self.votes.get)
+
+    def start(self):
+        """Demarre l'analyse continue"""
+        if self.running:
+            return False
+        self.running = True
+        self.reset()
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self):
+        """Arrete l'analyse continue"""
+        if not self.running:
+            return False
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=2.0)
+        return True
+
+    def get_status(self):
+        """Retourne le statut du vote"""
+        with self.condition:
+            return {
+                'running': self.running,
+                'votes': self.votes.copy(),
+                'frames': self.frames,
+                'decision': self.decision,
+                'decision_delay': (self.decision_time - self.reset_time
+                                   if self.decision_time else None),
+                'stats': self.stats.copy()
+            }
@@ -18,64 +18,79 @@ def initialisation_direction():
     set_angle(0, 90)
 
 
-async def radar():
-    initialisation_radar()
+async def radar(period=0.05):
+    """
+    Carte du radar (cm) a chaque balayage termine. Le balayage tourne dans
+    son propre thread : ici on attend par asyncio.sleep, la boucle
+    d'evenements n'est jamais bloquee. Le radar n'est arrete en sortie que
+    s'il a ete lance par ce generateur (d'autres peuvent encore le lire).
+    """
+    started = radar_scanner.start()
     try :
-        detection_map = [0]*18
-        direction = 1
-        angle = 90
-        while True: 
-            for i in range(len(detection_map)):
-                # mise a jour de la map de detection
-                detection_map[(angle//10)-1] = detection(angle)
-                #print("\n", detection_map)
-
-                # mise a jour du sens de direction
-                if angle >= 180 and direction == 1:
-                    direction = 0
-                elif angle <= 10 and direction == 0:
-                    direction = 1
-
-                # mise a jour de l'angle
-                if direction:
-                    angle += 10
-                else:
-                    angle -= 10
-
-            yield detection_map
+        sweeps = None
+        while True:
+            scan = radar_scanner.get_scan()
+            if scan['complete'] and scan['sweeps'] != sweeps:
+                sweeps = scan['sweeps']
+                yield carte_radar()
+            await asyncio.sleep(period)
     except KeyboardInterrupt:
         print("\nArret du radar")
         #queue.put(None)
     finally:
-        print("\nReinitialisation des servomoteurs")
-        set_angle(1, 90)
-        set_angle(2, 90)
-
-
-async def cast_stop_warning():
-    async for result in radar():
-        if result[9] <= 100:
-            return True
-        elif result[8] <= 51.8 or result[10] <= 51.8:
-            return True
-        elif result[7] <= 26.3 or result[11] <= 26.3:
-            return True
-        elif result[6] <= 18 or result[12] <= 18:
-            return True
-        elif result[5] <= 14 or result[13] <= 14:
-            return True
-        elif result[4] <= 11.7 or result[14] <= 11.7:
-            return True
-        else:
-            return False
-
-
-async def stopRobot():
-    async for result in cast_stop_warning():
-        if result:
-            motorStop()
-        else:
-            motor_drive(25, 1, 1)
+        if started:
+            print("\nReinitialisation des servomoteurs")
+            radar_scanner.stop()
+            set_angle(1, 90)
+            set_angle(2, 90)
+
+
+def proche(distance, limite):
+    # Secteur pas encore mesure (ou trop ancien) : compte comme un obstacle
+    return distance is None or distance <= limite
+
+
+async def cast_stop_warning(max_age=None):
+    """
+    Vrai si un obstacle est dans la zone d'arret devant le robot, d'apres
+    la derniere carte du radar (lue sans attendre de balayage). Le radar
+    est lance par l'appelant (stopRobot, radar()).
+    """
+    result = carte_radar(max_age)
+    if proche(result[9], 100):
+        return True
+    elif proche(result[8], 51.8) or proche(result[10], 51.8):
+        return True
+    elif proche(result[7], 26.3) or proche(result[11], 26.3):
+        return True
+    elif proche(result[6], 18) or proche(result[12], 18):
+        return True
+    elif proche(result[5], 14) or proche(result[13], 14):
+        return True
+    elif proche(result[4], 11.7) or proche(result[14], 11.7):
+        return True
+    else:
+        return False
+
+
+async def stopRobot(period=0.05):
+    """
+    Arret ou avance selon la derniere carte du radar, toutes les period
+    secondes. Lance le radar et, s'il l'a lance, l'arrete en sortie.
+    """
+    started = radar_scanner.start()
+    try:
+        while True:
+            if await cast_stop_warning():
+                motorStop()
+            else:
+                motor_drive(25, 1, 1)
+            await asyncio.sleep(period)
+    finally:
+        motorStop()
+        if started:
+            radar_scanner.stop()
+            initialisation_radar()
 
 
 if __name__ == "__main__":
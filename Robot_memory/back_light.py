@@ -3,7 +3,7 @@
 # -*- coding: utf-8 -*-
 
 import time
-import spidev
+from hardware import spidev
 import threading
 import numpy
 
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Verification et benchmark de la machine a etats IR (ir_state_machine).
+
+Compare, pour chaque (motif, etat), la table compilee aux anciennes
+chaines de if de challenge1 et challenge2 / challenge3 / Challenge2V2 et
+a l'ancien ACTION_MAP de LineFollowerImproved, puis mesure le cout d'une
+decision (ns) sur une sequence aleatoire de motifs.
+"""
+
+import argparse
+import itertools
+import time
+
+import numpy as np
+
+from ir_state_machine import (IRStateMachine, CHALLENGE1_TABLE, TRACKING_TABLE,
+                              FOLLOWER_TABLE, VIRAGE_STATES)
+
+ANGLES = {'center': 90, 'left': 120, 'right': 60, 'sharp_left': 130, 'sharp_right': 50}
+WHEEL_ANGLES = {'center': 90, 'slight_left': 100, 'slight_right': 80,
+                'turn_left': 110, 'turn_right': 70}
+SPEEDS = {'normal': 20, 'turn': 18}
+
+
+# --- Anciennes implementations (reference) ---
+
+def challenge1_if_chain(status):
+    """steering_angle() de challenge1 : angle ou None"""
+    status_left, status_middle, status_right = status
+    if status_left == 0 and status_middle == 0 and status_right == 0:
+        return None
+    elif status_left == 0 and status_middle == 0 and status_right == 1:
+        return 130
+    elif status_left == 0 and status_middle == 1 and status_right == 0:
+        return 90
+    elif status_left == 0 and status_middle == 1 and status_right == 1:
+        return 120
+    elif status_left == 1 and status_middle == 0 and status_right == 0:
+        return 50
+    elif status_left == 1 and status_middle == 0 and status_right == 1:
+        return None
+    elif status_left == 1 and status_middle == 1 and status_right == 0:
+        return 60
+    elif status_left == 1 and status_middle == 1 and status_right == 1:
+        return 90
+
+
+def tracking_if_chain(status, virage):
+    """Decision de tracking() (challenge2) : (perdu, angle, virage)"""
+    status_left, status_middle, status_right = status
+    if status_left == 0 and status_middle == 0 and status_right == 0:
+        if virage == -1:
+            return True, 50, virage
+        elif virage == 1:
+            return True, 130, virage
+        return True, None, virage
+    angle = None
+    if status_left == 0 and status_middle == 0 and status_right == 1:
+        angle, virage = 50, 1
+    elif status_left == 0 and status_middle == 1 and status_right == 0:
+        angle, virage = 90, 0
+    elif status_left == 0 and status_middle == 1 and status_right == 1:
+        angle, virage = 60, 1
+    elif status_left == 1 and status_middle == 0 and status_right == 0:
+        angle, virage = 130, -1
+    elif status_left == 1 and status_middle == 1 and status_right == 0:
+        angle, virage = 120, -1
+    elif status_left == 1 and status_middle == 1 and status_right == 1:
+        angle, virage = 90, 0
+    return False, angle, virage
+
+
+FOLLOWER_ACTION_MAP = {
+    (0, 0, 0): "lost",
+    (1, 1, 1): "forward",
+    (0, 1, 0): "forward",
+    (1, 1, 0): "slight_right",
+    (0, 1, 1): "slight_left",
+    (1, 0, 0): "turn_right",
+    (0, 0, 1): "turn_left",
+    (1, 0, 1): "forward"
+}
+
+
+def check(challenge1, tracking, follower):
+    """Compare les tables aux implementations de reference, retourne les ecarts"""
+    errors = []
+    patterns = list(itertools.product((0, 1), repeat=3))
+    for status in patterns:
+        expected = challenge1_if_chain(status)
+        if challenge1.decide(status).angle != expected:
+            errors.append(('challenge1', status, None))
+        for virage in VIRAGE_STATES:
+            decision = tracking.decide(status, virage)
+            got = (decision.action == 'lost', decision.angle, decision.state)
+            if got != tracking_if_chain(status, virage):
+                errors.append(('tracking', status, virage))
+        if follower.decide(status).action != FOLLOWER_ACTION_MAP[status]:
+            errors.append(('follower', status, None))
+    return errors
+
+
+def measure(func, statuses, states, repeat):
+    """Temps moyen d'une decision (ns)"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for status, state in zip(statuses, states):
+            func(status, state)
+        best = min(best, time.perf_counter() - start)
+    return best / len(statuses) * 1e9
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verification et cout de la machine a etats IR")
+    parser.add_argument("--count", type=int, default=200000, help="Decisions par passe")
+    parser.add_argument("--repeat", type=int, default=5, help="Passes (on garde la meilleure)")
+    args = parser.parse_args()
+
+    challenge1 = IRStateMachine(CHALLENGE1_TABLE, angles=ANGLES, speeds=SPEEDS, name="challenge1")
+    tracking = IRStateMachine(TRACKING_TABLE, states=VIRAGE_STATES, angles=ANGLES,
+                              speeds=SPEEDS, name="tracking")
+    follower = IRStateMachine(FOLLOWER_TABLE, angles=WHEEL_ANGLES, speeds=SPEEDS,
+                              name="follower")
+
+    errors = check(challenge1, tracking, follower)
+    if errors:
+        for name, status, state in errors:
+            print(f"ECART {name}: capteurs {status}, etat {state}")
+        raise SystemExit(1)
+    print("Tables identiques aux anciennes chaines de if (8 motifs x etats)")
+
+    rng = np.random.default_rng(0)
+    statuses = [tuple(int(v) for v in row) for row in rng.integers(0, 2, (args.count, 3))]
+    virages = [int(v) for v in rng.choice(VIRAGE_STATES, args.count)]
+    patterns = [(l << 2) | (m << 1) | r for l, m, r in statuses]
+    nones = [None] * args.count
+
+    benchmarks = (
+        ("challenge1 if", lambda s, _: challenge1_if_chain(s), statuses, nones),
+        ("challenge1 table", challenge1.decide, statuses, nones),
+        ("tracking if", tracking_if_chain, statuses, virages),
+        ("tracking table", tracking.decide, statuses, virages),
+        ("tracking motif", tracking.step, patterns, virages),
+        ("follower dict", lambda s, _: FOLLOWER_ACTION_MAP.get(s, 'stop'), statuses, nones),
+        ("follower table", follower.decide, statuses, nones),
+    )
+    print(f"{args.count} decisions par passe, meilleure de {args.repeat}")
+    print(f"{'decision':18s} {'ns':>8s}")
+    for name, func, inputs, states in benchmarks:
+        print(f"{name:18s} {measure(func, inputs, states, args.repeat):8.1f}")
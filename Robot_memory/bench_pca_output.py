@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de l'etage de sortie du PCA9685 : ecritures I2C sur un parcours
+enregistre (piste simulee de track_sim, meme depart et meme horloge
+virtuelle a chaque passe), sans regroupement (une transaction par
+commande, comme avant) puis avec (commandes inutiles abandonnees, lot par
+tick envoye en bursts auto-increment).
+
+Affiche par passe : commandes, commandes abandonnees, transactions,
+canaux ecrits, octets et temps de bus estime (100 kHz), plus les
+transactions vues par le gestionnaire de bus. Chaque passe tourne dans
+son propre processus : moteur, servos et etage de sortie repartent de
+zero, comme au demarrage du robot.
+
+    ROBOT_HARDWARE=sim python bench_pca_output.py --controller challenge1 --laps 2
+"""
+
+import argparse
+import multiprocessing
+
+import track_sim
+from i2c_bus import get_bus
+from pca_output import get_output
+
+
+def measure(controller, laps, coalesce):
+    """Un parcours complet, retourne le resultat de la simulation et les compteurs"""
+    output = get_output()
+    output.coalesce = coalesce
+    bus = get_bus()
+    track, scale, start = track_sim.make_oval_track()
+    simulator = track_sim.TrackSimulator(track, scale, start)
+    target = track_sim.CONTROLLERS[controller]()
+
+    output.reset_stats()
+    bus_before = bus.get_status()['stats']['transactions']
+    result = simulator.run(target, laps=laps)
+    status = output.get_status()
+    status['bus_transactions'] = bus.get_status()['stats']['transactions'] - bus_before
+    return result, status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ecritures PCA9685 avec et sans regroupement")
+    parser.add_argument("--controller", choices=sorted(track_sim.CONTROLLERS), default="challenge1")
+    parser.add_argument("--laps", type=int, default=2, help="Tours par passe")
+    args = parser.parse_args()
+
+    print(f"{args.controller}, {args.laps} tours par passe")
+    print(f"{'':8s} {'tours':>5s} {'temps':>7s} {'cmd':>7s} {'abandon':>7s} {'trans':>7s} "
+          f"{'canaux':>7s} {'octets':>8s} {'bus ms':>8s} {'bus/s':>7s}")
+    for label, coalesce in (("avant", False), ("apres", True)):
+        with multiprocessing.Pool(1) as pool:
+            result, status = pool.apply(measure, (args.controller, args.laps, coalesce))
+        stats = status['stats']
+        sim_time = result['sim_time'] or 1.0
+        print(f"{label:8s} {len(result['laps']):5d} {sim_time:6.1f}s {stats['commands']:7d} "
+              f"{stats['dropped']:7d} {stats['transactions']:7d} {stats['channel_writes']:7d} "
+              f"{stats['bytes']:8d} {status['bus_time'] * 1000:8.1f} "
+              f"{status['bus_transactions'] / sim_time:7.1f}")
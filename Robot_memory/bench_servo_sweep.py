@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark des ecritures servo : balayage 0 -> 180 -> 0 degres, avant
+(objet Servo cree a chaque commande, comme l'ancien set_angle) et apres
+(ServoDriver : voies en cache, table angle -> rapport cyclique, ecritures
+inutiles sautees).
+
+Compte les acces I2C au PCA9685 (ecritures de rapport cyclique, lectures
+de frequence) et le temps CPU par degre parcouru. Fonctionne sur le robot
+ou en simulation :
+
+    ROBOT_HARDWARE=sim python bench_servo_sweep.py
+"""
+
+import argparse
+import time
+
+from hardware import create_i2c, PCA9685, Servo
+from servo_driver import ServoDriver
+
+
+class CountingChannel:
+    """Canal PWM qui compte les acces (frequence lue = registre lu sur le PCA9685)"""
+
+    def __init__(self, channel, counts):
+        self._channel = channel
+        self._counts = counts
+
+    @property
+    def frequency(self):
+        self._counts['reads'] += 1
+        return self._channel.frequency
+
+    @property
+    def duty_cycle(self):
+        self._counts['reads'] += 1
+        return self._channel.duty_cycle
+
+    @duty_cycle.setter
+    def duty_cycle(self, value):
+        self._counts['writes'] += 1
+        self._channel.duty_cycle = value
+
+    def __getattr__(self, name):
+        return getattr(self._channel, name)
+
+
+class CountingPCA:
+    """PCA9685 dont les canaux comptent leurs acces"""
+
+    def __init__(self, pca):
+        self._pca = pca
+        self.counts = {'reads': 0, 'writes': 0}
+        self.channels = [CountingChannel(channel, self.counts) for channel in pca.channels]
+
+    @property
+    def frequency(self):
+        self.counts['reads'] += 1
+        return self._pca.frequency
+
+    def reset(self):
+        self.counts['reads'] = self.counts['writes'] = 0
+
+
+def sweep(step, repeat=1):
+    """Angles d'un aller-retour 0 -> 180 -> 0, chaque commande repetee repeat fois"""
+    count = int(round(180 / step))
+    forward = [i * step for i in range(count + 1)]
+    angles = forward + forward[-2::-1]
+    return [angle for angle in angles for _ in range(repeat)], 2 * 180.0
+
+
+def before(pca, channel):
+    """Ancien set_angle : un objet Servo par commande"""
+    def set_angle(angle):
+        servo_angle = Servo(pca.channels[channel], min_pulse=500, max_pulse=2400,
+                            actuation_range=180)
+        servo_angle.angle = angle
+    return set_angle
+
+
+def after(pca, channel):
+    driver = ServoDriver(pca)
+    return lambda angle: driver.set_angle(channel, angle)
+
+
+def measure(pca, make, channel, angles, degrees, passes):
+    """Acces I2C et CPU (us) par degre, meilleure passe (hors construction)"""
+    best = float('inf')
+    for _ in range(passes):
+        set_angle = make(pca, channel)
+        pca.reset()
+        start = time.process_time()
+        for angle in angles:
+            set_angle(angle)
+        best = min(best, time.process_time() - start)
+    return {
+        'writes': pca.counts['writes'] / degrees,
+        'reads': pca.counts['reads'] / degrees,
+        'cpu_us': best / degrees * 1e6
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ecritures I2C et CPU par degre de balayage servo")
+    parser.add_argument("--channel", type=int, default=1, help="Voie servo (1 = tete gauche-droite)")
+    parser.add_argument("--passes", type=int, default=5, help="Passes (on garde la meilleure)")
+    args = parser.parse_args()
+
+    pca = PCA9685(create_i2c(), address=0x5f)
+    pca.frequency = 50
+    counting = CountingPCA(pca)
+
+    scenarios = (
+        ("pas de 1 deg (slow_angle)", sweep(1.0)),
+        ("pas de 2 deg (direction, tick 10 ms)", sweep(2.0)),
+        ("1 deg, commande x5 (boucle 100 Hz)", sweep(1.0, repeat=5)),
+        ("pas de 0.05 deg", sweep(0.05)),
+    )
+    print(f"Voie {args.channel}, acces I2C et CPU par degre parcouru (meilleure de {args.passes})")
+    print(f"{'balayage':40s} {'':6s} {'ecr/deg':>8s} {'lect/deg':>8s} {'cpu us/deg':>10s}")
+    for name, (angles, degrees) in scenarios:
+        for label, make in (("avant", before), ("apres", after)):
+            result = measure(counting, make, args.channel, angles, degrees, args.passes)
+            print(f"{name:40s} {label:6s} {result['writes']:8.2f} {result['reads']:8.2f} "
+                  f"{result['cpu_us']:10.2f}")
+    pca.deinit()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark des detecteurs de vision sans Picamera2.
+
+Mesure la latence (percentiles) et le debit (frames/s) de LineDetector,
+ColorDetector et ArrowDetector sur des frames enregistrees (fichier .npy
+N x H x W x 3, voir frame_replay.record_frames) ou synthetiques.
+A lancer sur un PC avant de deployer pour reperer les regressions.
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from arrow_detection import ArrowDetector
+from color_detection import ColorDetector
+from line_detection import LineDetector
+
+
+def synthetic_frames(count, width, height, seed=0):
+    """
+    Frames de test : sol clair bruite, ligne noire qui ondule, et selon la
+    frame un carre de couleur et une fleche noire.
+    """
+    rng = np.random.default_rng(seed)
+    frames = np.empty((count, height, width, 3), dtype=np.uint8)
+    rows = np.arange(height)
+    colors = [(0, 0, 220), (0, 200, 0), (220, 30, 0)]  # Rouge, vert, bleu (BGR)
+    for i in range(count):
+        frame = frames[i]
+        frame[:] = rng.integers(170, 230, (height, width, 3), dtype=np.uint8)
+
+        # Ligne : decalage et courbure qui varient d'une frame a l'autre
+        phase = i / 15.0
+        centers = (width / 2 + width / 5 * np.sin(phase)
+                   + (height - rows) * 0.3 * np.sin(phase / 2))
+        half = max(3, width // 40)
+        for y in range(height // 3, height):
+            cx = int(centers[y])
+            frame[y, max(0, cx - half):max(0, cx + half)] = 20
+
+        # Carre de couleur une frame sur deux
+        if i % 2 == 0:
+            size = height // 5
+            x, y = int(rng.integers(0, width - size)), int(rng.integers(0, height // 3))
+            frame[y:y + size, x:x + size] = colors[i % 3]
+
+        # Fleche une frame sur trois, pointe a gauche ou a droite
+        if i % 3 == 0:
+            s = width / 640
+            pts = np.array([[0, 40], [120, 40], [120, 0], [200, 70], [120, 140], [120, 100], [0, 100]])
+            if i % 2:
+                pts[:, 0] = 200 - pts[:, 0]
+            pts = (pts * s + [width * 0.3, height * 0.05]).astype(np.int32)
+            cv2.fillPoly(frame, [pts], (10, 10, 10))
+    return frames
+
+
+def bench_line_full(detector, frame):
+    """Ligne, recherche sur toute l'image (pas de suivi)"""
+    detector.reset_tracking()
+    return detector.detect_line_in_frame(frame)
+
+
+def bench_line_tracking(detector, frame):
+    """Ligne, suivi fenetre (frames consecutives)"""
+    return detector.detect_line_in_frame(frame)
+
+
+def measure(func, frames, repeat):
+    """Retourne les durees (s) de func sur chaque frame, repeat passes"""
+    func(frames[0])  # Echauffement (tables, caches)
+    durations = []
+    for _ in range(repeat):
+        for frame in frames:
+            start = time.perf_counter()
+            func(frame)
+            durations.append(time.perf_counter() - start)
+    return np.array(durations)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latence et debit des detecteurs de vision")
+    parser.add_argument("--frames-file", help="Fichier .npy de frames enregistrees")
+    parser.add_argument("--synthetic", type=int, default=200, help="Nombre de frames synthetiques")
+    parser.add_argument("--width", type=int, default=320, help="Largeur des frames synthetiques")
+    parser.add_argument("--height", type=int, default=240, help="Hauteur des frames synthetiques")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes sur l'ensemble des frames")
+    parser.add_argument("--save", help="Enregistre les frames synthetiques dans ce fichier .npy")
+    args = parser.parse_args()
+
+    if args.frames_file:
+        frames = np.load(args.frames_file, mmap_mode='r')
+        source = args.frames_file
+    else:
+        frames = synthetic_frames(args.synthetic, args.width, args.height)
+        source = "synthetiques"
+        if args.save:
+            np.save(args.save, frames)
+            print(f"Frames synthetiques enregistrees dans {args.save}")
+
+    line_detector = LineDetector()
+    color_detector = ColorDetector()
+    arrow_detector = ArrowDetector()
+    benchmarks = (
+        ("ligne (image)", lambda f: bench_line_full(line_detector, f)),
+        ("ligne (suivi)", lambda f: bench_line_tracking(line_detector, f)),
+        ("couleur", color_detector.detect_colors),
+        ("fleche", arrow_detector.analyze),
+    )
+
+    count, height, width = frames.shape[:3]
+    print(f"{count} frames {width}x{height} ({source}), {args.repeat} passes, "
+          f"{cv2.getNumThreads()} thread(s) OpenCV")
+    print(f"{'detecteur':14s} {'p50':>8s} {'p90':>8s} {'p99':>8s} {'max':>8s} {'fps':>8s}")
+    for name, func in benchmarks:
+        durations = measure(func, frames, args.repeat) * 1000
+        p50, p90, p99 = np.percentile(durations, [50, 90, 99])
+        fps = 1000 / durations.mean()
+        print(f"{name:14s} {p50:7.2f}ms {p90:7.2f}ms {p99:7.2f}ms "
+              f"{durations.max():7.2f}ms {fps:8.0f}")
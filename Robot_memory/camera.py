@@ -1,10 +1,19 @@
 # -*- coding: Windows-1252 -*-
 # camera.py (version modifiee pour Picamera2 avec detection de ligne - SIMPLE)
-from picamera2 import Picamera2
+try:
+    from picamera2 import Picamera2, MappedArray
+except ImportError:
+    # Sans Picamera2 (PC de developpement) seul le rejeu de frames est possible
+    print("Warning: picamera2 module not found, only frame replay available")
+    Picamera2 = MappedArray = None
 import cv2
 import time
+import threading
 import numpy as np
 from arrow_detection import ArrowDetector
+from line_detection import LineDetector
+from vision_worker import VisionWorker
+from detector_scheduler import DetectorScheduler
 
 try:
     from color_detection import ColorDetector
@@ -12,16 +21,150 @@ except ImportError:
     print("Warning: color_detection module not found, color detection disabled")
     ColorDetector = None
 
+
+class FrameRingBuffer:
+    """
+    Petit tampon circulaire de frames horodatees.
+    Chaque entree est un tuple (seq, timestamp, frame) ; seq augmente de 1 a
+    chaque frame publiee, ce qui permet aux consommateurs d'attendre la
+    frame suivante sans en rater ni en traiter deux fois la meme.
+
+    Si shape est fourni, le tampon pre-alloue un buffer par case : le
+    producteur ecrit dans next_buffer() puis appelle publish() sans argument,
+    et les consommateurs recoivent une vue en lecture seule de la case.
+    Aucune allocation par frame, mais une vue n'est valide que pendant
+    size - 1 frames : copier la frame pour la garder plus longtemps.
+    """
+
+    def __init__(self, size=4, shape=None, dtype=np.uint8):
+        self.size = size
+        self.slots = [None] * size
+        self.seq = 0
+        self.condition = threading.Condition()
+        
+        self.buffers = None
+        self.views = None
+        if shape is not None:
+            self.buffers = [np.zeros(shape, dtype=dtype) for _ in range(size)]
+            self.views = []
+            for buf in self.buffers:
+                view = buf.view()
+                view.flags.writeable = False
+                self.views.append(view)
+
+    def next_buffer(self):
+        """Retourne le buffer pre-alloue de la prochaine case (la plus ancienne)"""
+        return self.buffers[(self.seq + 1) % self.size]
+
+    def publish(self, frame=None):
+        """Publie une nouvelle frame et reveille les consommateurs en attente"""
+        with self.condition:
+            self.seq += 1
+            index = self.seq % self.size
+            if frame is None:
+                frame = self.views[index]
+            self.slots[index] = (self.seq, time.monotonic(), frame)
+            self.condition.notify_all()
+            return self.seq
+
+    def latest(self):
+        """Retourne la derniere entree publiee, ou None si aucune frame"""
+        with self.condition:
+            if self.seq == 0:
+                return None
+            return self.slots[self.seq % self.size]
+
+    def get(self, seq):
+        """Retourne l'entree de numero seq si elle est encore dans le tampon"""
+        with self.condition:
+            entry = self.slots[seq % self.size]
+            if entry is not None and entry[0] == seq:
+                return entry
+            return None
+
+    def wait_next(self, after_seq=0, timeout=1.0):
+        """
+        Bloque jusqu'a ce qu'une frame de numero > after_seq soit disponible.
+        Retourne la plus recente, ou None en cas de timeout.
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.seq > after_seq, timeout):
+                return None
+            return self.slots[self.seq % self.size]
+
+
 class PiCameraStream:
-    def __init__(self):
+    def __init__(self, buffer_size=4, lores_size=(320, 240), vision_process=False):
+        # Processus de vision lance (fork) avant Picamera2 et ses threads
+        main_size = (640, 480)
+        self.vision_worker = None
+        if vision_process:
+            self._start_vision_process(main_size, lores_size)
+        
         # Initialisation SIMPLE comme dans l'ancienne version qui fonctionne
         self.picam2 = Picamera2()
-        self.picam2.preview_configuration.main.size = (640, 480)
-        self.picam2.preview_configuration.main.format = "BGR888"  # Retour au BGR original
+        self.picam2.preview_configuration.main.size = main_size
+        # "RGB888" chez Picamera2 = pixels ranges B, G, R en memoire, soit
+        # directement l'ordre attendu par OpenCV : plus d'echange de canaux
+        self.picam2.preview_configuration.main.format = "RGB888"
+        
+        # Second flux basse resolution (lores) pour les detecteurs, capture
+        # par le capteur en meme temps que le flux principal (lores_size=None
+        # pour le desactiver). Le lores est en YUV420 sur le Pi.
+        if lores_size:
+            self.picam2.preview_configuration.lores.size = lores_size
+            self.picam2.preview_configuration.lores.format = "YUV420"
+        
         self.picam2.configure("preview")
         self.picam2.start()
         time.sleep(1)
         
+        if lores_size:
+            lores_width, lores_height = lores_size
+            self.lores_stride = self.picam2.stream_configuration("lores")["stride"]
+            self.i420_buffer = np.zeros(lores_width * lores_height * 3 // 2, dtype=np.uint8)
+        
+        self._init_pipeline(main_size, lores_size, buffer_size, vision_process)
+
+    def _start_vision_process(self, main_size, lores_size):
+        """
+        Lance le processus de vision, avant tout thread de la camera : le
+        fils est cree par fork et ne doit heriter d'aucun verrou tenu par
+        libcamera, OpenCV ou le thread de capture. Ses detecteurs sont
+        construits dans le fils. Les threads des autres modules (bus I2C,
+        ultrason...) doivent aussi demarrer apres : voir webserver.py.
+        """
+        width, height = lores_size or main_size
+        self.vision_worker = VisionWorker(
+            self,
+            {'color': ColorDetector, 'arrow': ArrowDetector, 'line': LineDetector},
+            (height, width, 3), main_size)
+        self.vision_worker.start_process()
+
+    def _init_pipeline(self, main_size, lores_size, buffer_size, vision_process):
+        """
+        Tampons de frames, thread de capture et detecteurs : commun a la
+        camera reelle et aux sources de rejeu (voir frame_replay.py).
+        """
+        # Processus de vision avant le premier thread (deja lance par la
+        # camera reelle, avant Picamera2)
+        if vision_process and self.vision_worker is None:
+            self._start_vision_process(main_size, lores_size)
+        
+        # Thread de capture unique : c'est le seul a lire la camera, il copie
+        # chaque frame dans un buffer pre-alloue du tampon circulaire
+        width, height = main_size
+        self.lores_size = lores_size
+        self.frames = FrameRingBuffer(size=buffer_size, shape=(height, width, 3))
+        self.lores_frames = None
+        if lores_size:
+            lores_width, lores_height = lores_size
+            self.lores_frames = FrameRingBuffer(size=buffer_size, shape=(lores_height, lores_width, 3))
+        self.overlay_buffers = threading.local()  # Un buffer d'overlay par thread client
+        self.capture_running = True
+        self.capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self.capture_thread.start()
+        
         # Initialiser le detecteur de couleurs
         self.color_detector = ColorDetector() if ColorDetector else None
         self.show_color_detection = False
@@ -40,49 +183,254 @@ class PiCameraStream:
         self.arrow_detection_enabled = False
         self.arrow_direction = "none"
         self.arrow_frame = None
+        
+        # Derniers resultats bruts (coordonnees de la frame analysee), dessines
+        # par render_overlays() seulement sur le flux envoye aux clients
+        self.arrow_result = None
+        self.line_result = None
+        
+        # Option : detecteurs dans un processus separe (hors GIL des boucles
+        # de controle) ; les overlays utilisent alors ses derniers resultats.
+        # Le processus tourne deja, il ne reste qu'a l'alimenter en frames
+        if self.vision_worker:
+            self.vision_worker.start()
+        
+        # Detecteurs cadences sur le flux lores (resultats en cache) : la
+        # ligne a 30 Hz en priorite, les fleches a 5 Hz, les couleurs a 2 Hz
+        self.line_detector = LineDetector()
+        self.line_reset = threading.Event()  # Remise a zero du suivi demandee (request_line_reset)
+        self.detector_scheduler = DetectorScheduler(self)
+        self.detector_scheduler.register('line', self._run_line_detection, rate=30, priority=0,
+                                         enabled=lambda: self.show_line_detection)
+        self.detector_scheduler.register('arrow', self._run_arrow_detection, rate=5, priority=1,
+                                         enabled=lambda: self.arrow_detection_enabled and not self._worker_active())
+        self.detector_scheduler.register('color', self._run_color_detection, rate=2, priority=2,
+                                         enabled=lambda: self.show_color_detection and not self._worker_active())
+        self.detector_scheduler.start()
 
-    def get_frame(self):
-        """Retourne le frame actuel encode en JPEG"""
-        try:
-            frame = self.picam2.capture_array()  # Frame en BGR
-            
-            # Inverser manuellement les canaux Rouge et Bleu
-            frame[:, :, [0, 2]] = frame[:, :, [2, 0]]  # Echange canal 0 (B) et canal 2 (R)
-            
-            # Appliquer la detection de couleurs si activee
-            if self.show_color_detection and self.color_detector:
+    def _capture_loop(self):
+        """Boucle du thread de capture : publie chaque frame dans le tampon"""
+        while self.capture_running:
+            try:
+                request = self.picam2.capture_request()
                 try:
-                    detections = self.color_detector.detect_colors(frame)
-                    self.detected_colors = detections
-                    frame = self.color_detector.draw_detections(frame, detections)
+                    # Copie du buffer DMA vers la case pre-allouee (pas d'allocation)
+                    with MappedArray(request, "main") as m:
+                        np.copyto(self.frames.next_buffer(), m.array)
                     
-                    # Afficher un indicateur de detection active
-                    cv2.putText(frame, "DETECTION COULEUR ACTIVE", (10, 30), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-                    
-                    # Afficher le nombre de couleurs detectees
-                    color_count = len(detections)
-                    if color_count > 0:
-                        cv2.putText(frame, f"Couleurs detectees: {color_count}", 
-                                   (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                except Exception as e:
-                    print(f"Erreur dtection couleur: {e}")
-            
-                        # Dtection de flche si active
-            if self.arrow_detection_enabled and self.arrow_detector:
-                try:
-                    self.arrow_direction, frame = self.arrow_detector.detect_arrow(frame)
-                    # Afficher tat
-                    cv2.putText(frame, f"Fleche: {self.arrow_direction}", (10, 110),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 0), 2)
-                except Exception as e:
-                    print(f"Erreur dtection flche: {e}")
-                    self.arrow_direction = "none"
+                    # Conversion YUV420 -> BGR du lores directement dans sa case
+                    if self.lores_frames:
+                        with MappedArray(request, "lores", reshape=False) as m:
+                            cv2.cvtColor(self._pack_i420(m.array), cv2.COLOR_YUV2BGR_I420,
+                                         dst=self.lores_frames.next_buffer())
+                finally:
+                    request.release()
+                
+                # Lores publie en premier : quand une frame principale est visible,
+                # le lores de meme numero l'est aussi
+                if self.lores_frames:
+                    self.lores_frames.publish()
+                self.frames.publish()
+            except Exception as e:
+                print(f"Erreur thread de capture: {e}")
+                time.sleep(0.1)
 
+    def _pack_i420(self, flat):
+        """
+        Retourne le buffer YUV420 du lores sous forme (h*3/2, w) contigue.
+        Sans padding (stride == largeur) c'est une simple vue, sinon les
+        plans Y, U et V sont recopies ligne a ligne dans un buffer reutilise.
+        """
+        width, height = self.lores_size
+        stride = self.lores_stride
+        if stride == width:
+            return flat[:width * height * 3 // 2].reshape(height * 3 // 2, width)
+        
+        dst = self.i420_buffer
+        np.copyto(dst[:width * height].reshape(height, width),
+                  flat[:stride * height].reshape(height, stride)[:, :width])
+        chroma_w, chroma_h, chroma_stride = width // 2, height // 2, stride // 2
+        for plane in (0, 1):
+            src = stride * height + plane * chroma_stride * chroma_h
+            out = width * height + plane * chroma_w * chroma_h
+            np.copyto(dst[out:out + chroma_w * chroma_h].reshape(chroma_h, chroma_w),
+                      flat[src:src + chroma_stride * chroma_h].reshape(chroma_h, chroma_stride)[:, :chroma_w])
+        return dst.reshape(height * 3 // 2, width)
+
+    def _buffer(self, stream):
+        """Tampon du flux demande ("main" ou "lores", main si lores desactive)"""
+        if stream == "lores" and self.lores_frames:
+            return self.lores_frames
+        return self.frames
+
+    def get_latest_frame(self, stream="main"):
+        """
+        Retourne la derniere frame capturee sous forme (seq, timestamp, frame).
+        Attend la premiere frame si le thread de capture vient de demarrer.
+        La frame est partagee entre consommateurs : ne pas la modifier.
+        """
+        frames = self._buffer(stream)
+        entry = frames.latest()
+        if entry is None:
+            entry = frames.wait_next(0, timeout=1.0)
+        return entry
+
+    def wait_for_frame(self, after_seq=0, timeout=1.0, stream="main"):
+        """Bloque jusqu'a la prochaine frame de numero > after_seq (ou None si timeout)"""
+        return self._buffer(stream).wait_next(after_seq, timeout)
+
+    def get_analysis_frame(self, seq):
+        """Frame lores de numero seq (meme instant que la frame principale), ou None"""
+        if not self.lores_frames:
+            return None
+        entry = self.lores_frames.get(seq)
+        return entry[2] if entry else None
+
+    def _scale_detections(self, detections, scale_x, scale_y):
+        """Ramene des detections couleur du lores aux coordonnees du flux principal"""
+        scaled = []
+        for detection in detections:
+            x, y, w, h = detection['bbox']
+            cx, cy = detection['center']
+            scaled.append(dict(detection,
+                               center=(int(cx * scale_x), int(cy * scale_y)),
+                               area=detection['area'] * scale_x * scale_y,
+                               bbox=(int(x * scale_x), int(y * scale_y),
+                                     int(w * scale_x), int(h * scale_y))))
+        return scaled
+
+    def _worker_active(self):
+        """True si le processus de vision fait tourner les detecteurs"""
+        return self.vision_worker is not None and self.vision_worker.running
+
+    def request_line_reset(self):
+        """
+        Demande la remise a zero du suivi de ligne (fenetre de recherche).
+        Faite par le thread du scheduler avant sa prochaine detection : lui
+        seul touche a l'etat de suivi de line_detector.
+        """
+        self.line_reset.set()
+
+    def _run_line_detection(self, analysis):
+        """Detecteur de ligne cadence"""
+        if not self.line_detector:
+            return None
+        if self.line_reset.is_set():
+            self.line_reset.clear()
+            self.line_detector.reset_tracking()
+        result = self.line_detector.detect_line_in_frame(analysis)
+        self.line_result = result
+        self.line_detection_info = {
+            'angle': result['angle'],
+            'direction': result['direction'],
+            'line_detected': result['line_detected']
+        }
+        return result
+
+    def _run_arrow_detection(self, analysis):
+        """Detecteur de fleches cadence"""
+        if not self.arrow_detector:
+            return None
+        result = self.arrow_detector.analyze(analysis)
+        self.arrow_result = result
+        self.arrow_direction = result['direction']
+        return result
+
+    def _run_color_detection(self, analysis):
+        """Detecteur de couleurs cadence, resultats aux coordonnees du flux principal"""
+        if not self.color_detector:
+            return None
+        main_h, main_w = self.frames.buffers[0].shape[:2]
+        detections = self.color_detector.detect_colors(analysis)
+        self.detected_colors = self._scale_detections(
+            detections, main_w / analysis.shape[1], main_h / analysis.shape[0])
+        return self.detected_colors
+
+    def _overlay_frame(self, frame):
+        """Copie la frame dans le buffer d'overlay (reutilise) du thread courant"""
+        buf = getattr(self.overlay_buffers, 'frame', None)
+        if buf is None or buf.shape != frame.shape:
+            buf = np.empty_like(frame)
+            self.overlay_buffers.frame = buf
+        np.copyto(buf, frame)
+        return buf
+
+    def render_overlays(self, frame):
+        """
+        Dessine les derniers resultats des detecteurs actifs sur une frame
+        du flux principal. La frame partagee n'est jamais modifiee : le
+        dessin se fait dans un buffer reutilise, et seulement si un overlay
+        est actif. Retourne la frame a envoyer.
+        """
+        show_colors = self.show_color_detection and self.color_detector
+        show_arrow = self.arrow_detection_enabled and self.arrow_detector
+        line_result = self.line_result if self.show_line_detection else None
+        if not (show_colors or show_arrow or line_result):
+            return frame
+        
+        frame = self._overlay_frame(frame)
+        analysis = self.lores_frames or self.frames
+        scale_x = frame.shape[1] / analysis.buffers[0].shape[1]
+        scale_y = frame.shape[0] / analysis.buffers[0].shape[0]
+        
+        # Ligne : zone analysee, centres et droite ajustee
+        if line_result:
+            try:
+                self.line_detector.draw_result(frame, line_result, scale_x, scale_y)
+            except Exception as e:
+                print(f"Erreur overlay ligne: {e}")
+        
+        # Couleurs (deja aux coordonnees du flux principal)
+        if show_colors:
+            try:
+                detections = self.detected_colors
+                frame = self.color_detector.draw_detections(frame, detections)
+                
+                # Afficher un indicateur de detection active
+                cv2.putText(frame, "DETECTION COULEUR ACTIVE", (10, 30), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+                
+                # Afficher le nombre de couleurs detectees
+                color_count = len(detections)
+                if color_count > 0:
+                    cv2.putText(frame, f"Couleurs detectees: {color_count}", 
+                               (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            except Exception as e:
+                print(f"Erreur overlay couleur: {e}")
+        
+        # Flche : contour, pointe et tat
+        if show_arrow:
+            try:
+                if self.arrow_result:
+                    self.arrow_detector.draw_result(frame, self.arrow_result, scale_x)
+                cv2.putText(frame, f"Fleche: {self.arrow_direction}", (10, 110),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 0), 2)
+            except Exception as e:
+                print(f"Erreur overlay flche: {e}")
+        
+        return frame
+
+    def encode_frame(self, frame, seq=None):
+        """
+        Dessine les overlays actifs sur une frame et l'encode en JPEG.
+        Les detecteurs ne tournent pas ici : ils sont cadences par
+        detector_scheduler (ou le processus de vision), render_overlays()
+        ne fait que dessiner leurs derniers resultats.
+        """
+        frame = self.render_overlays(frame)
+        
+        # Encoder en JPEG
+        _, jpeg = cv2.imencode('.jpg', frame)
+        return jpeg.tobytes()
+
+    def get_frame(self):
+        """Retourne le frame actuel encode en JPEG"""
+        try:
+            entry = self.get_latest_frame()
+            if entry is None:
+                raise RuntimeError("aucune frame disponible")
             
-            # Encoder en JPEG
-            _, jpeg = cv2.imencode('.jpg', frame)
-            return jpeg.tobytes()
+            return self.encode_frame(entry[2], entry[0])
             
         except Exception as e:
             print(f"Erreur capture frame: {e}")
@@ -125,6 +473,14 @@ class PiCameraStream:
 
     def stop(self):
         """Arrete la capture video"""
+        self.detector_scheduler.stop()
+        if self.vision_worker:
+            self.vision_worker.stop()
+        self.capture_running = False
+        if self.capture_thread.is_alive():
+            self.capture_thread.join(timeout=1.0)
+        if self.picam2 is None:  # Source de rejeu
+            return
         try:
             self.picam2.stop()
             print("Camra arrte")
@@ -134,33 +490,35 @@ class PiCameraStream:
     def photo(self, filename="myphoto.png"):
         """Prend une photo et la sauvegarde"""
         try:
-            frame = self.picam2.capture_array()  # Frame en BGR
-            # Inverser manuellement les canaux Rouge et Bleu
-            frame[:, :, [0, 2]] = frame[:, :, [2, 0]]  # Echange canal 0 (B) et canal 2 (R)
-            cv2.imwrite(filename, frame)
+            entry = self.get_latest_frame()
+            if entry is None:
+                return None
+            cv2.imwrite(filename, entry[2])
             return filename
         except Exception as e:
             print(f"Erreur photo: {e}")
             return None
     
-    def get_frame_for_processing(self):
+    def get_frame_for_processing(self, copy=False, stream="lores"):
         """
         Rcupre une frame pour le traitement (dtection de ligne)
-        sans interfrer avec le flux principal ou la dtection couleur
+        sans interfrer avec le flux principal ou la dtection couleur.
+        Par dfaut c'est la frame basse rsolution (lores), en vue lecture
+        seule (aucune copie) ; copy=True retourne une copie modifiable et
+        stream="main" la frame pleine rsolution.
         """
         try:
-            # Capturer une frame directement depuis Picamera2
-            frame = self.picam2.capture_array()
+            # Lire la derniere frame publiee par le thread de capture
+            entry = self.get_latest_frame(stream)
             
             # Vrifier que la frame est valide
-            if frame is None:
+            if entry is None:
                 return None
             
-            # Inverser les canaux Rouge et Bleu pour correspondre au format attendu
-            frame[:, :, [0, 2]] = frame[:, :, [2, 0]]
-            
-            # Retourner une copie pour viter les conflits
-            return frame.copy()
+            # Copie seulement si l'appelant doit modifier la frame
+            if copy:
+                return entry[2].copy()
+            return entry[2]
             
         except Exception as e:
             print(f"Erreur get_frame_for_processing: {e}")
@@ -1,18 +1,22 @@
 from servo_controller_improved import *
 from motor import *
 from servo_controller_improved import servo_controller
-from gpiozero import InputDevice
+from ir_sensors import get_ir_sensors
 from servo_controller import *
+from control_loop import ControlLoop
+from pca_output import get_output
+from ir_state_machine import IRStateMachine, CHALLENGE1_TABLE
+from steering_pid import IRLineError, SteeringController
+import sys
 
 # Configuration des pins des capteurs de ligne
 line_pin_left = 22
 line_pin_middle = 27
 line_pin_right = 17
 
-# Initialisation des capteurs (attention: assignation inversee dans le code original)
-left = InputDevice(pin=line_pin_right)    # Capteur gauche sur pin droite
-middle = InputDevice(pin=line_pin_middle) # Capteur milieu
-right = InputDevice(pin=line_pin_left)    # Capteur droit sur pin gauche
+# Capteurs IR sur callbacks de front (attention: assignation inversee dans le code original)
+ir_sensors = get_ir_sensors()
+IR_PINS = (line_pin_right, line_pin_middle, line_pin_left)  # Gauche sur pin droite, droit sur pin gauche
 
 # Configuration des angles du servo de direction
 ANGLE_CENTER = 90     # Position centrale
@@ -25,73 +29,90 @@ ANGLE_SHARP_RIGHT = 50   # Virage serre a droite
 MOTOR_SPEED_NORMAL = 25   # Vitesse normale
 MOTOR_SPEED_SLOW = 15     # Vitesse reduite en virage
 MOTOR_SPEED_SEARCH = 10   # Vitesse de recherche
+MOTOR_SPEED_DRIVE = 20    # Vitesse de drive() (motor_25)
+MOTOR_SPEED_PID = 35      # Vitesse avec la direction continue (PID)
+
+# Decision capteurs -> angle et vitesse : table partagee (ir_state_machine)
+ANGLES = {
+    'center': ANGLE_CENTER,
+    'left': ANGLE_LEFT,
+    'right': ANGLE_RIGHT,
+    'sharp_left': ANGLE_SHARP_LEFT,
+    'sharp_right': ANGLE_SHARP_RIGHT,
+}
+state_machine = IRStateMachine(CHALLENGE1_TABLE, angles=ANGLES,
+                               speeds={'normal': MOTOR_SPEED_DRIVE}, name="challenge1")
+
+
+def read_sensors():
+    """Etat des capteurs (gauche, milieu, droite)"""
+    return ir_sensors.read(IR_PINS)
+
+
+def decide(status):
+    """Decision (angle, vitesse) pour un etat des capteurs, angle None = garder l'angle actuel"""
+    return state_machine.decide(status)
+
+
+def act(decision):
+    """Applique l'angle decide et maintient l'avance"""
+    if decision.angle is not None:
+      set_angle(0, decision.angle)
+    Motor(1, 1, decision.speed)
 
 
 def tracking(status_left, status_middle, status_right):
 
-    status_right = right.value
-    status_middle = middle.value
-    status_left = left.value
+    status_left, status_middle, status_right = read_sensors()
 
     print("Current : ",status_left," +", status_middle, " + ", status_right,"\n")
 
-    if status_left == 0 and status_middle == 0 and status_right == 0: #1
-    
-      #motorStop()
-      pass
-    
-    elif status_left == 0 and status_middle == 0 and status_right == 1: #2
-      set_angle(0,ANGLE_SHARP_LEFT)
-      
-    elif status_left == 0 and status_middle == 1 and status_right == 0: #3
-      
-      #ne rien faire
-      set_angle(0,ANGLE_CENTER)
-      pass
-      
-    elif status_left == 0 and status_middle == 1 and status_right == 1: #4
-      
-      set_angle(0,ANGLE_LEFT)
-      
-    elif status_left == 1 and status_middle == 0 and status_right == 0: #5
-    
-      set_angle(0,ANGLE_SHARP_RIGHT)
-      
-    elif status_left == 1 and status_middle == 0 and status_right == 1: #6
-    
-      #tracking(status_left_before, status_middle_before, status_right_before)
-      pass
-    
-    elif status_left == 1 and status_middle == 1 and status_right == 0: #7
-    
-      set_angle(0, ANGLE_RIGHT)
-      
-    elif status_left == 1 and status_middle == 1 and status_right == 1: #8
-      
-      #tracking(status_left_before, status_middle_before, status_right_before)
-      set_angle(0,ANGLE_CENTER)
+    angle = decide((status_left, status_middle, status_right)).angle
+    if angle is not None:
+      set_angle(0, angle)
       
     return status_left, status_middle, status_right
 
+def create_control_loop(rate=100):
+    """Boucle a frequence fixe : capteurs -> angle -> servo et moteur"""
+    loop = ControlLoop(rate=rate, name="challenge1", batch=get_output().batch)
+    loop.add_phase("sense", read_sensors)
+    loop.add_phase("decide", decide)
+    loop.add_phase("act", act)
+    return loop
+
+def create_pid_control_loop(rate=100, speed=MOTOR_SPEED_PID):
+    """
+    Boucle a frequence fixe, direction continue : capteurs IR (ordre
+    physique) -> ecart pondere -> PID -> servo 0 a chaque tick.
+    Les angles fixes de la table font zigzaguer : le PID permet d'aller
+    plus vite sans perdre la ligne.
+    """
+    loop = ControlLoop(rate=rate, name="challenge1_pid", batch=get_output().batch)
+    line_error = IRLineError()
+    steering = SteeringController(actuator=set_angle)
+
+    def act(error):
+      steering.update(error)
+      Motor(1, 1, speed)
+
+    loop.add_phase("sense", ir_sensors.read)  # (gauche, milieu, droite) physiques
+    loop.add_phase("decide", line_error.update)
+    loop.add_phase("act", act)
+    return loop
+
 if __name__ == "__main__":
 
 
     servo_controller.initialize_servos()
     
-    status_right_before = 0
-    status_middle_before = 1
-    status_left_before = 0
-    
-    
-    
-    while True :
-
-        
-        status_left_before, status_middle_before, status_right_before = tracking(status_left_before, status_middle_before, status_right_before)
-        print("Past : ",status_left_before," +", status_middle_before, " + ", status_right_before)
-        
-        drive()
-        
-        #if(status_left_before==0 and status_middle_before==0 and status_right_before==0 ):
-        #  break
-        
\ No newline at end of file
+    # "python challenge1.py pid" : direction continue
+    if len(sys.argv) > 1 and sys.argv[1] == "pid":
+      loop = create_pid_control_loop()
+    else:
+      loop = create_control_loop()
+    try:
+      loop.run()
+    finally:
+      motorStop()
+      print(loop.get_status())
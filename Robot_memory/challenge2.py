@@ -1,20 +1,21 @@
 from servo_controller_improved import *
 from motor import *
 from servo_controller_improved import servo_controller
-from gpiozero import InputDevice
+from ir_sensors import get_ir_sensors
 from servo_controller import *
 
 from ultrasound import*
+from control_loop import ControlLoop
+from ir_state_machine import IRStateMachine, TRACKING_TABLE, VIRAGE_STATES
 
 # Configuration des pins des capteurs de ligne
 line_pin_left = 17
 line_pin_middle = 27
 line_pin_right = 22
 
-# Initialisation des capteurs (attention: assignation inversee dans le code original)
-left = InputDevice(pin=line_pin_right)    # Capteur gauche sur pin droite
-middle = InputDevice(pin=line_pin_middle) # Capteur milieu
-right = InputDevice(pin=line_pin_left)    # Capteur droit sur pin gauche
+# Capteurs IR sur callbacks de front (attention: assignation inversee dans le code original)
+ir_sensors = get_ir_sensors()
+IR_PINS = (line_pin_right, line_pin_middle, line_pin_left)  # Gauche sur pin droite, droit sur pin gauche
 
 # Configuration des angles du servo de direction
 ANGLE_CENTER = 90     # Position centrale
@@ -31,19 +32,39 @@ RIGHT_ANGLE_RIGHT = 0
 MOTOR_SPEED_NORMAL = 25   # Vitesse normale
 MOTOR_SPEED_SLOW = 15     # Vitesse reduite en virage
 MOTOR_SPEED_SEARCH = 10   # Vitesse de recherche
+MOTOR_SPEED_DRIVE = 20    # Vitesse de drive() (motor_25)
+LINE_SEARCH_TIMEOUT = 5.0  # Recherche de la ligne abandonnee au-dela (s)
 
+# Decision capteurs + dernier virage -> angle, vitesse, virage (ir_state_machine)
+ANGLES = {
+    'center': ANGLE_CENTER,
+    'left': ANGLE_LEFT,
+    'right': ANGLE_RIGHT,
+    'sharp_left': ANGLE_SHARP_LEFT,
+    'sharp_right': ANGLE_SHARP_RIGHT,
+}
+state_machine = IRStateMachine(TRACKING_TABLE, states=VIRAGE_STATES, angles=ANGLES,
+                               speeds={'normal': MOTOR_SPEED_DRIVE}, name="challenge2")
 
 
 
-def tracking(virage):
+
+def read_sensors():
+    """Etat des capteurs (gauche, milieu, droite)"""
+    return ir_sensors.read(IR_PINS)
+
+
+def tracking(virage, status=None):
     
-    status_right = right.value
-    status_middle = middle.value
-    status_left = left.value
+    if status is None:
+      status = read_sensors()
+    status_left, status_middle, status_right = status
 
     print("Current : ",status_left," +", status_middle, " + ", status_right,"\n")
 
-    if status_left == 0 and status_middle == 0 and status_right == 0: #1
+    decision = state_machine.decide(status, virage)
+
+    if decision.action == 'lost': #1
       
       
       motor_25()
@@ -54,10 +75,9 @@ def tracking(virage):
       print(virage)
     
     
-      if virage == -1:
-        set_angle(0,ANGLE_SHARP_RIGHT) 
-      elif virage == 1:
-        set_angle(0,ANGLE_SHARP_LEFT) 
+      # Braquage du recul selon le dernier virage
+      if decision.angle is not None:
+        set_angle(0, decision.angle)
           
       """ 
       elif status_left_before == 1 and status_middle_before == 1 and status_right_before == 0: 
@@ -70,11 +90,12 @@ def tracking(virage):
 
       #else:
       #motorStop()
-      while(status_left !=1 and status_middle !=1 and status_right !=1):
-        status_right = right.value
-        status_middle = middle.value
-        status_left = left.value
-        motor_25_negative()
+      # Recul jusqu'au premier front d'un capteur sur la ligne (sans boucle active)
+      motor_25_negative()
+      status = ir_sensors.wait_for(any, timeout=LINE_SEARCH_TIMEOUT, pins=IR_PINS)
+      if status is None:
+        print("Ligne non retrouvee")
+      status_left, status_middle, status_right = status or (0, 0, 0)
       motorStop()
       if virage == -1:
         set_angle(0,ANGLE_LEFT)
@@ -86,36 +107,10 @@ def tracking(virage):
       
 
     else :
-      drive()
-      if status_left == 0 and status_middle == 0 and status_right == 1: #2
-        set_angle(0,ANGLE_SHARP_RIGHT)
-        virage = 1
-        
-      elif status_left == 0 and status_middle == 1 and status_right == 0: #3
-        set_angle(0,ANGLE_CENTER)
-        virage = 0
-        
-      elif status_left == 0 and status_middle == 1 and status_right == 1: #4
-        set_angle(0,ANGLE_RIGHT)
-        virage = 1
-        
-      elif status_left == 1 and status_middle == 0 and status_right == 0: #5
-        set_angle(0,ANGLE_SHARP_LEFT)
-        virage = -1
-        
-      #elif status_left == 1 and status_middle == 0 and status_right == 1: #6
-      
-        #tracking(status_left_before, status_middle_before, status_right_before)
-        #pass
-      
-      elif status_left == 1 and status_middle == 1 and status_right == 0: #7
-        set_angle(0, ANGLE_LEFT)
-        virage = -1
-        
-      elif status_left == 1 and status_middle == 1 and status_right == 1: #8
-        #tracking(status_left_before, status_middle_before, status_right_before)
-        set_angle(0,ANGLE_CENTER)
-        virage = 0
+      Motor(1, 1, decision.speed)
+      if decision.angle is not None:
+        set_angle(0, decision.angle)
+      virage = decision.state
       
     return status_left, status_middle, status_right, virage
     
@@ -126,15 +121,17 @@ def evitement():
     sleep(1)
     set_angle(1, RIGHT_ANGLE_LEFT)
     sleep(2)
-    print(checkdist())
-    if checkdist() < 250:
+    distance = checkdist()
+    print(distance)
+    if distance < 250:
         tete = -1
         
     sleep(1)
     set_angle(1, RIGHT_ANGLE_RIGHT)
     sleep(2)
-    print(checkdist())
-    if checkdist() < 250:
+    distance = checkdist()
+    print(distance)
+    if distance < 250:
         tete = 1
       
     print(tete)
@@ -168,52 +165,51 @@ def evitement():
       
            
 
-    status_right = right.value
-    status_middle = middle.value
-    status_left = left.value
-      
-    
-    while status_left !=1 and status_middle !=1 and status_right !=1:
-    
-    
-      status_right = right.value
-      status_middle = middle.value
-      status_left = left.value
-      motor_25()
+    # Avance jusqu'a retrouver la ligne (reveil sur front des capteurs)
+    motor_25()
+    if ir_sensors.wait_for(any, timeout=LINE_SEARCH_TIMEOUT, pins=IR_PINS) is None:
+      print("Ligne non retrouvee")
+      motorStop()
       
     tete = 0 
       
     
     
 
+def create_control_loop(rate=100):
+    """
+    Boucle a frequence fixe : capteurs IR et distance, puis suivi de ligne
+    ou evitement. Le recul sur ligne perdue et l'evitement sont des
+    manoeuvres bloquantes : la boucle repart ensuite de maintenant.
+    """
+    loop = ControlLoop(rate=rate, name="challenge2")
+    state = {'virage': 0}  # -1=gauche ; 0=toutdroit ; 1=droit
+
+    def sense():
+      return read_sensors(), checkdist()
+
+    def act(data):
+      status, distance = data
+      a, b, c, state['virage'] = tracking(state['virage'], status)
+      if status == (0, 0, 0):
+        loop.resync()
+      if distance < 150:
+        evitement()
+        loop.resync()
+
+    loop.add_phase("sense", sense)
+    loop.add_phase("act", act)
+    return loop
+
+
 if __name__ == "__main__":
 
         
     servo_controller.initialize_servos()
     
-    status_right_before = 0
-    status_middle_before = 1
-    status_left_before = 0
-    
-    counter = 0
-    virage = 0 # -1=gauche ; 0=toutdroit ; 1=droit
-    
-    while True:
-        
-        #if counter == 5:
-          #status_left_before, status_middle_before, status_right_before = tracking(status_left_before, status_middle_before, status_right_before
-          #counter = 0
-        a,b,c,virage = tracking(virage)
-        print("Past : ",status_left_before," +", status_middle_before, " + ", status_right_before)
-        
-        if checkdist() < 150:
-          evitement()
-        
-        
-        #counter = counter +1
-        
-        #if(status_left_before==0 and status_middle_before==0 and status_right_before==0 ):
-        #  break
- 
-
-    
\ No newline at end of file
+    loop = create_control_loop()
+    try:
+      loop.run()
+    finally:
+      motorStop()
+      print(loop.get_status())
@@ -1,10 +1,11 @@
 from servo_controller_improved import *
 from motor import *
 from servo_controller_improved import servo_controller
-from gpiozero import InputDevice
+from ir_sensors import get_ir_sensors
 from servo_controller import *
 
 from back_light import *
+from ir_state_machine import IRStateMachine, TRACKING_TABLE, VIRAGE_STATES
 import threading
 
 
@@ -13,10 +14,9 @@ line_pin_left = 17
 line_pin_middle = 27
 line_pin_right = 22
 
-# Initialisation des capteurs (attention: assignation inversee dans le code original)
-left = InputDevice(pin=line_pin_right)    # Capteur gauche sur pin droite
-middle = InputDevice(pin=line_pin_middle) # Capteur milieu
-right = InputDevice(pin=line_pin_left)    # Capteur droit sur pin gauche
+# Capteurs IR sur callbacks de front (attention: assignation inversee dans le code original)
+ir_sensors = get_ir_sensors()
+IR_PINS = (line_pin_right, line_pin_middle, line_pin_left)  # Gauche sur pin droite, droit sur pin gauche
 
 # Configuration des angles du servo de direction
 ANGLE_CENTER = 90     # Position centrale
@@ -29,30 +29,49 @@ ANGLE_SHARP_RIGHT = 50   # Virage serre a droite
 MOTOR_SPEED_NORMAL = 25   # Vitesse normale
 MOTOR_SPEED_SLOW = 15     # Vitesse reduite en virage
 MOTOR_SPEED_SEARCH = 10   # Vitesse de recherche
+MOTOR_SPEED_DRIVE = 20    # Vitesse de drive() (motor_25)
+LINE_SEARCH_TIMEOUT = 5.0  # Recherche de la ligne abandonnee au-dela (s)
 
+# Decision capteurs + dernier virage -> angle, vitesse, virage (ir_state_machine)
+ANGLES = {
+    'center': ANGLE_CENTER,
+    'left': ANGLE_LEFT,
+    'right': ANGLE_RIGHT,
+    'sharp_left': ANGLE_SHARP_LEFT,
+    'sharp_right': ANGLE_SHARP_RIGHT,
+}
+state_machine = IRStateMachine(TRACKING_TABLE, states=VIRAGE_STATES, angles=ANGLES,
+                               speeds={'normal': MOTOR_SPEED_DRIVE}, name="challenge3")
 
 
 
+
+def read_sensors():
+    """Etat des capteurs (gauche, milieu, droite)"""
+    return ir_sensors.read(IR_PINS)
+
+
 def tracking(virage):
     
-    status_right = right.value
-    status_middle = middle.value
-    status_left = left.value
+    status_left, status_middle, status_right = read_sensors()
 
     print("Current : ",status_left," +", status_middle, " + ", status_right,"\n")
 
-    if status_left == 0 and status_middle == 0 and status_right == 0: #1
+    decision = state_machine.decide((status_left, status_middle, status_right), virage)
+
+    if decision.action == 'lost': #1
       motor_25()
       led_forward()
       sleep(0.5)
       motorStop()
       led_stop()
       print(virage)
+      # Braquage du recul selon le dernier virage
+      if decision.angle is not None:
+        set_angle(0, decision.angle)
       if virage == -1: 
-        set_angle(0,ANGLE_SHARP_RIGHT) 
         led_right()
       elif virage == 1:
-        set_angle(0,ANGLE_SHARP_LEFT) 
         led_left()
       """ 
       elif status_left_before == 1 and status_middle_before == 1 and status_right_before == 0: 
@@ -65,12 +84,13 @@ def tracking(virage):
 
       #else:
       #motorStop()
-      while(status_left !=1 and status_middle !=1 and status_right !=1):
-        status_right = right.value
-        status_middle = middle.value
-        status_left = left.value
-        motor_25_negative()
-        led_backward()
+      # Recul jusqu'au premier front d'un capteur sur la ligne (sans boucle active)
+      motor_25_negative()
+      led_backward()
+      status = ir_sensors.wait_for(any, timeout=LINE_SEARCH_TIMEOUT, pins=IR_PINS)
+      if status is None:
+        print("Ligne non retrouvee")
+      status_left, status_middle, status_right = status or (0, 0, 0)
       motorStop()
       led_stop()
       if virage == -1:
@@ -87,41 +107,15 @@ def tracking(virage):
       
 
     else :
-      drive()
+      Motor(1, 1, decision.speed)
       led_forward()
-      if status_left == 0 and status_middle == 0 and status_right == 1: #2
-        set_angle(0,ANGLE_SHARP_RIGHT)
-        led_right()
-        virage = 1
-        
-      elif status_left == 0 and status_middle == 1 and status_right == 0: #3
-        set_angle(0,ANGLE_CENTER)
-        virage = 0
-        
-      elif status_left == 0 and status_middle == 1 and status_right == 1: #4
-        set_angle(0,ANGLE_RIGHT)
+      if decision.angle is not None:
+        set_angle(0, decision.angle)
+      if decision.action in ('sharp_right', 'right'):
         led_right()
-        virage = 1
-        
-      elif status_left == 1 and status_middle == 0 and status_right == 0: #5
-        set_angle(0,ANGLE_SHARP_LEFT)
-        led_left()
-        virage = -1
-        
-      #elif status_left == 1 and status_middle == 0 and status_right == 1: #6
-      
-        #tracking(status_left_before, status_middle_before, status_right_before)
-        #pass
-      
-      elif status_left == 1 and status_middle == 1 and status_right == 0: #7
-        set_angle(0, ANGLE_LEFT)
+      elif decision.action in ('sharp_left', 'left'):
         led_left()
-        virage = -1
-        
-      elif status_left == 1 and status_middle == 1 and status_right == 1: #8
-        #tracking(status_left_before, status_middle_before, status_right_before)
-        set_angle(0,ANGLE_CENTER)
-        virage = 0
+      virage = decision.state
       
     return status_left, status_middle, status_right, virage
 
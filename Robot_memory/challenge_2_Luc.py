@@ -1,5 +1,5 @@
 import motor
-from gpiozero import InputDevice
+from ir_sensors import get_ir_sensors
 import servo_controller
 
 
@@ -8,10 +8,9 @@ line_pin_left = 17
 line_pin_middle = 27
 line_pin_right = 22
 
-# Initialisation des capteurs (attention: assignation inversee dans le code original)
-left = InputDevice(pin=line_pin_right)    # Capteur gauche sur pin droite
-middle = InputDevice(pin=line_pin_middle) # Capteur milieu
-right = InputDevice(pin=line_pin_left)    # Capteur droit sur pin gauche
+# Capteurs IR sur callbacks de front (attention: assignation inversee dans le code original)
+ir_sensors = get_ir_sensors()
+IR_PINS = (line_pin_right, line_pin_middle, line_pin_left)  # Gauche sur pin droite, droit sur pin gauche
 
 # Configuration des angles du servo de direction
 ANGLE_CENTER = 90     # Position centrale
@@ -33,7 +32,7 @@ def initialize_servos():
 
 # fonction de recuperation des valeurs des capteurs
 def convertIRtoList():
-    return [left.value, middle.value, right.value]
+    return list(ir_sensors.read(IR_PINS))
 
 
 # fonction de detection de position de la ligne par rapport au capteur
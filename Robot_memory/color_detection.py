@@ -26,25 +26,88 @@ class ColorDetector:
         self.detection_active = False
         self.min_area = 1500  # Seuil d'aire plus eleve
         self.max_detections = 3  # Limite le nombre de detections par couleur
+        
+        # Les seuils (aire, noyaux) sont regles pour une image de cette largeur
+        self.reference_width = 640
+        
+        # Table HSV -> etiquette pour la classification en une passe
+        self.build_label_lut()
+    
+    def build_label_lut(self):
+        """
+        Precalcule la table de correspondance HSV -> etiquette couleur a partir
+        de color_ranges (0 = aucune couleur, i = self.labels[i - 1]).
+        La table couvre toutes les valeurs (256 x 256 x 256, ~16 Mo) pour
+        donner exactement le meme resultat que cv2.inRange.
+        A rappeler apres toute modification de color_ranges.
+        """
+        self.labels = list(self.color_ranges.keys())
+        
+        # Indexee [V, S, H] : c'est l'ordre des octets d'un pixel HSV+alpha
+        # lu comme un entier 32 bits (voir classify_pixels)
+        lut = np.zeros((256, 256, 256), dtype=np.uint8)
+        for label, color_name in enumerate(self.labels, start=1):
+            ranges = self.color_ranges[color_name]
+            if 'lower1' in ranges:  # Pour le rouge qui a deux plages
+                bounds = [(ranges['lower1'], ranges['upper1']),
+                          (ranges['lower2'], ranges['upper2'])]
+            else:
+                bounds = [(ranges['lower'], ranges['upper'])]
+            for lower, upper in bounds:
+                lut[lower[2]:upper[2] + 1, lower[1]:upper[1] + 1, lower[0]:upper[0] + 1] = label
+        self.label_lut = lut.reshape(-1)
+    
+    def classify_pixels(self, hsv):
+        """
+        Classe chaque pixel HSV en une etiquette couleur en une seule passe
+        dans la table precalculee. Retourne une image d'etiquettes uint8.
+        """
+        # Ajouter un canal alpha permet de lire chaque pixel (H, S, V, A)
+        # comme un entier 32 bits : H + S << 8 + V << 16 une fois A masque
+        hsva = cv2.cvtColor(hsv, cv2.COLOR_BGR2BGRA)
+        index = hsva.view(np.uint32).reshape(hsv.shape[:2])
+        np.bitwise_and(index, 0x00FFFFFF, out=index)
+        return np.take(self.label_lut, index)
     
     def detect_colors(self, frame):
-        """Detecte les couleurs dans une image"""
+        """
+        Detecte les couleurs dans une image.
+        Les coordonnees retournees sont celles de l'image analysee ; l'aire
+        minimale et les noyaux sont adaptes a sa resolution (ex. flux lores).
+        
+        Tous les pixels sont classes en une passe (table HSV -> etiquette) ;
+        chaque couleur n'est ensuite filtree que sur la zone ou elle apparait.
+        """
         hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
         detected = []
         
+        scale = frame.shape[1] / self.reference_width
+        min_area = self.min_area * scale * scale
+        blur_size = max(3, int(round(5 * scale)) | 1)
+        kernel_size = max(3, int(round(7 * scale)) | 1)
+        
         # Appliquer un leger flou pour reduire le bruit
-        hsv = cv2.GaussianBlur(hsv, (5, 5), 0)
+        hsv = cv2.GaussianBlur(hsv, (blur_size, blur_size), 0)
         
-        for color_name, ranges in self.color_ranges.items():
-            if 'lower1' in ranges:  # Pour le rouge qui a deux plages
-                mask1 = cv2.inRange(hsv, ranges['lower1'], ranges['upper1'])
-                mask2 = cv2.inRange(hsv, ranges['lower2'], ranges['upper2'])
-                mask = cv2.bitwise_or(mask1, mask2)
-            else:
-                mask = cv2.inRange(hsv, ranges['lower'], ranges['upper'])
+        # Une etiquette par pixel
+        labels = self.classify_pixels(hsv)
+        
+        kernel = np.ones((kernel_size, kernel_size), np.uint8)  # Kernel plus grand
+        margin = 3 * kernel_size  # Portee cumulee des 6 operations morphologiques
+        
+        for label, color_name in enumerate(self.labels, start=1):
+            mask = cv2.compare(labels, label, cv2.CMP_EQ)
+            
+            # Le filtrage ne peut rien creer loin des pixels de la couleur : on
+            # se limite a leur boite englobante elargie de la portee du filtrage
+            # (resultat identique au calcul sur toute l'image)
+            x0, y0, w0, h0 = cv2.boundingRect(mask)
+            if w0 == 0 or h0 == 0:
+                continue
+            x1, y1 = max(0, x0 - margin), max(0, y0 - margin)
+            mask = mask[y1:y0 + h0 + margin, x1:x0 + w0 + margin]
             
             # Filtrage plus agressif du bruit
-            kernel = np.ones((7,7), np.uint8)  # Kernel plus grand
             mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
             mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
             
@@ -53,7 +116,8 @@ class ColorDetector:
             mask = cv2.dilate(mask, kernel, iterations=1)
             
             # Trouver les contours
-            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE,
+                                           offset=(x1, y1))
             
             # Trier les contours par aire (plus grand en premier)
             contours = sorted(contours, key=cv2.contourArea, reverse=True)
@@ -64,7 +128,7 @@ class ColorDetector:
                     break
                     
                 area = cv2.contourArea(contour)
-                if area > self.min_area:  # Seuil plus eleve
+                if area > min_area:  # Seuil plus eleve
                     # Verifier que la forme n'est pas trop allongee ou bizarre
                     x, y, w, h = cv2.boundingRect(contour)
                     aspect_ratio = float(w) / h
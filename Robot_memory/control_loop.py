@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+# control_loop.py - Boucle de controle a frequence fixe (sense / decide / act)
+import collections
+import contextlib
+import threading
+import time
+
+from robot_utils import summary
+
+
+class ControlLoop:
+    """
+    Execute un pas de controle a frequence fixe sur des echeances
+    time.monotonic() (pas de derive : l'echeance suivante est l'echeance
+    precedente + periode, pas "maintenant + periode").
+
+    Le pas est decoupe en phases enregistrees dans l'ordre (en general
+    sense, decide, act) : la premiere est appelee sans argument, chacune
+    des suivantes recoit le resultat de la precedente.
+
+    Mesures par tick : gigue (retard du debut du tick sur son echeance),
+    duree du pas et de chaque phase, depassements (pas plus long que la
+    periode, les ticks manques sont sautes sans rattrapage).
+    Apres une manoeuvre bloquante volontaire (recul, evitement...),
+    resync() repart de maintenant sans compter de depassement.
+
+    batch : contexte ouvert autour de chaque tick, par exemple
+    pca_output.get_output().batch (ecritures PCA9685 du tick regroupees).
+    Seulement pour des ticks non bloquants : les ecritures d'une
+    manoeuvre bloquante dans le tick ne partiraient qu'a la fin du tick.
+    """
+
+    def __init__(self, rate=100.0, name="controle", history=1000, stop_on_error=False,
+                 batch=None):
+        self.name = name
+        self.period = 1.0 / rate
+        self.stop_on_error = stop_on_error  # Sinon une erreur saute seulement le tick
+        self.batch = batch
+        self.phases = []
+
+        self.running = False
+        self.thread = None
+        self.deadline = None
+        self._resync = False
+
+        self.lock = threading.Lock()
+        self.jitters = collections.deque(maxlen=history)
+        self.durations = collections.deque(maxlen=history)
+        self.phase_times = {}
+        self.start_time = None
+
+        # Statistiques
+        self.stats = {
+            'ticks': 0,
+            'overruns': 0,
+            'missed_ticks': 0,
+            'resyncs': 0,
+            'errors': 0
+        }
+
+    def add_phase(self, name, func):
+        """Ajoute une phase au pas de controle (executees dans l'ordre d'ajout)"""
+        self.phases.append((name, func))
+        self.phase_times[name] = collections.deque(maxlen=self.jitters.maxlen)
+        return self
+
+    def set_rate(self, rate):
+        """Change la frequence (prise en compte au tick suivant)"""
+        self.period = 1.0 / rate
+
+    def resync(self):
+        """A appeler apres une manoeuvre bloquante : l'echeance repart de maintenant"""
+        self._resync = True
+
+    def tick(self):
+        """Execute une fois toutes les phases, retourne le resultat de la derniere"""
+        value = None
+        with self.batch() if self.batch else contextlib.nullcontext():
+            for index, (name, func) in enumerate(self.phases):
+                start = time.monotonic()
+                value = func() if index == 0 else func(value)
+                duration = time.monotonic() - start
+                with self.lock:
+                    self.phase_times[name].append(duration)
+        return value
+
+    def run(self, condition=None, max_ticks=None):
+        """
+        Boucle bloquante dans le thread courant, tant que condition() est
+        vraie (et running), ou pendant max_ticks ticks.
+        """
+        self.running = True
+        self.start_time = time.monotonic()
+        self.deadline = self.start_time
+        ticks = 0
+        try:
+            while self.running and (condition is None or condition()):
+                if max_ticks is not None and ticks >= max_ticks:
+                    break
+                ticks += 1
+
+                start = time.monotonic()
+                jitter = start - self.deadline
+                try:
+                    self.tick()
+                except Exception as e:
+                    print(f"Erreur boucle {self.name}: {e}")
+                    self.stats['errors'] += 1
+                    if self.stop_on_error:
+                        break
+                end = time.monotonic()
+
+                with self.lock:
+                    self.stats['ticks'] += 1
+                    self.jitters.append(jitter)
+                    self.durations.append(end - start)
+
+                self.deadline += self.period
+                if self._resync:
+                    # Manoeuvre bloquante volontaire : pas un depassement
+                    self._resync = False
+                    self.stats['resyncs'] += 1
+                    self.deadline = time.monotonic() + self.period
+                elif end > self.deadline:
+                    # Pas trop long : on saute les ticks manques
+                    missed = int((end - self.deadline) / self.period) + 1
+                    self.stats['overruns'] += 1
+                    self.stats['missed_ticks'] += missed
+                    self.deadline += missed * self.period
+
+                delay = self.deadline - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+        finally:
+            self.running = False
+
+    def start(self, condition=None):
+        """Lance la boucle dans un thread"""
+        if self.running:
+            return False
+        self.running = True
+        self.thread = threading.Thread(target=self.run, args=(condition,), daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self):
+        """Arrete la boucle (a la fin du tick en cours)"""
+        if not self.running:
+            return False
+        self.running = False
+        if self.thread and self.thread.is_alive() and threading.current_thread() is not self.thread:
+            self.thread.join(timeout=2.0)
+        return True
+
+    def get_status(self):
+        """Statistiques de temps (secondes) sur les derniers ticks"""
+        with self.lock:
+            jitters = list(self.jitters)
+            durations = list(self.durations)
+            stats = self.stats.copy()
+            phase_times = {name: list(times) for name, times in self.phase_times.items()}
+        elapsed = time.monotonic() - self.start_time if self.start_time else 0.0
+        return {
+            'name': self.name,
+            'running': self.running,
+            'rate': 1.0 / self.period,
+            'actual_rate': stats['ticks'] / elapsed if elapsed > 0 else None,
+            'jitter': summary(jitters),
+            'duration': summary(durations),
+            'phases': {name: summary(times) for name, times in phase_times.items()},
+            'stats': stats
+        }
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+# detector_scheduler.py - Cadencement des detecteurs sur le flux camera
+import threading
+import time
+
+
+class DetectorScheduler:
+    """
+    Lance chaque detecteur (ligne, couleur, fleche...) a sa propre cadence
+    sur le flux de frames partage, par ordre de priorite.
+
+    A chaque nouvelle frame, les detecteurs dus sont lances du plus
+    prioritaire (priority la plus petite) au moins prioritaire. Un detecteur
+    dont la duree moyenne depasserait l'arrivee de la frame suivante est
+    reporte (compte dans 'dropped') : le plus prioritaire, lui, tourne
+    toujours. Apres max_drops reports consecutifs, le detecteur est lance
+    quand meme (compte dans 'forced') : sa duree moyenne n'est mise a jour
+    qu'en tournant, une seule execution lente ne doit pas l'affamer pour
+    toujours. Les derniers resultats sont gardes en cache.
+    """
+
+    def __init__(self, camera, stream="lores", max_drops=5):
+        self.camera = camera
+        self.stream = stream
+        self.max_drops = max_drops  # Reports consecutifs avant execution forcee
+
+        self.condition = threading.Condition()
+        self.detectors = {}
+        self.frame_period = 1.0 / 30  # Estime sur les frames recues
+
+        self.thread = None
+        self.running = False
+
+    def register(self, name, func, rate, priority, enabled=None):
+        """
+        Ajoute un detecteur.
+        func(frame) retourne le resultat ; rate en Hz ; priority 0 = la plus
+        haute ; enabled() indique si le detecteur doit tourner (toujours sinon).
+        """
+        with self.condition:
+            self.detectors[name] = {
+                'func': func,
+                'period': 1.0 / rate,
+                'priority': priority,
+                'enabled': enabled,
+                'next_due': 0.0,
+                'avg_duration': 0.0,
+                'result': None,
+                'seq': 0,
+                'timestamp': None,
+                'drops': 0,  # Reports consecutifs
+                'stats': {'runs': 0, 'dropped': 0, 'forced': 0, 'errors': 0}
+            }
+
+    def set_rate(self, name, rate):
+        """Change la cadence d'un detecteur"""
+        with self.condition:
+            self.detectors[name]['period'] = 1.0 / rate
+
+    def _due(self, now):
+        """Detecteurs actifs dont l'echeance est passee, par priorite"""
+        due = []
+        for name, det in self.detectors.items():
+            if det['enabled'] is not None and not det['enabled']():
+                continue
+            # Tolerance d'une demi-frame : a 30 Hz sur un flux a 30 fps, une
+            # frame un peu en avance ne doit pas faire sauter une echeance
+            if now + self.frame_period / 2 >= det['next_due']:
+                due.append((det['priority'], name, det))
+        due.sort(key=lambda item: item[0])
+        return due
+
+    def _loop(self):
+        """Boucle du thread : une frame = les detecteurs dus a cet instant"""
+        last_seq = 0
+        last_time = None
+        while self.running:
+            entry = self.camera.wait_for_frame(last_seq, timeout=1.0, stream=self.stream)
+            if entry is None:
+                continue
+            seq, timestamp, frame = entry
+            last_seq = seq
+
+            # Periode camera lissee, pour estimer l'arrivee de la frame suivante
+            if last_time is not None and timestamp > last_time:
+                self.frame_period += 0.1 * ((timestamp - last_time) - self.frame_period)
+            last_time = timestamp
+            deadline = timestamp + self.frame_period
+
+            with self.condition:
+                due = self._due(time.monotonic())
+
+            for rank, (_, name, det) in enumerate(due):
+                start = time.monotonic()
+                if rank > 0 and start + det['avg_duration'] > deadline:
+                    if det['drops'] < self.max_drops:
+                        # Pas le temps avant la prochaine frame : reporte
+                        det['drops'] += 1
+                        det['stats']['dropped'] += 1
+                        continue
+                    # Trop de reports : execution forcee, qui remet l'estimation a jour
+                    det['stats']['forced'] += 1
+
+                try:
+                    result = det['func'](frame)
+                except Exception as e:
+                    print(f"Erreur detecteur {name}: {e}")
+                    det['stats']['errors'] += 1
+                    result = None
+                end = time.monotonic()
+
+                with self.condition:
+                    det['avg_duration'] += 0.2 * ((end - start) - det['avg_duration'])
+                    det['drops'] = 0
+                    det['next_due'] += det['period']
+                    if det['next_due'] <= start:
+                        # En retard d'une periode ou plus : on repart de maintenant
+                        det['next_due'] = start + det['period']
+                    det['result'] = result
+                    det['seq'] = seq
+                    det['timestamp'] = timestamp
+                    det['stats']['runs'] += 1
+                    self.condition.notify_all()
+
+    def get_result(self, name):
+        """Dernier resultat en cache d'un detecteur (None si jamais lance)"""
+        with self.condition:
+            return self.detectors[name]['result']
+
+    def get_latest(self, name):
+        """Dernier resultat et horodatage (monotonic) de sa frame, (None, None) si jamais lance"""
+        with self.condition:
+            det = self.detectors[name]
+            return det['result'], det['timestamp']
+
+    def wait_result(self, name, after_seq=0, timeout=1.0):
+        """
+        Attend un resultat calcule sur une frame de numero > after_seq.
+        Retourne (seq, resultat) ou None en cas de timeout.
+        """
+        with self.condition:
+            det = self.detectors[name]
+            if not self.condition.wait_for(lambda: det['seq'] > after_seq, timeout):
+                return None
+            return det['seq'], det['result']
+
+    def start(self):
+        """Demarre le thread de cadencement"""
+        if self.running:
+            return False
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self):
+        """Arrete le thread de cadencement"""
+        if not self.running:
+            return False
+        self.running = False
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=2.0)
+        return True
+
+    def get_status(self):
+        """Retourne le statut de chaque detecteur"""
+        with self.condition:
+            return {
+                'running': self.running,
+                'frame_period': self.frame_period,
+                'detectors': {
+                    name: {
+                        'rate': 1.0 / det['period'],
+                        'priority': det['priority'],
+                        'avg_duration': det['avg_duration'],
+                        'age': (time.monotonic() - det['timestamp']
+                                if det['timestamp'] else None),
+                        'stats': det['stats'].copy()
+                    }
+                    for name, det in self.detectors.items()
+                }
+            }
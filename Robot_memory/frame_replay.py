@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# frame_replay.py - Rejeu de frames enregistrees a la place de la camera
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from camera import PiCameraStream
+
+
+def record_frames(camera, path, count, stream="main"):
+    """
+    Enregistre count frames consecutives de la camera dans un fichier .npy
+    (tableau N x H x W x 3 en BGR), relisible en memoire partagee par
+    ReplayCameraStream.
+    """
+    entry = camera.get_latest_frame(stream)
+    if entry is None:
+        raise RuntimeError("aucune frame disponible")
+    shape = (count,) + entry[2].shape
+    out = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint8, shape=shape)
+
+    last_seq = 0
+    for i in range(count):
+        entry = camera.wait_for_frame(last_seq, timeout=1.0, stream=stream)
+        if entry is None:
+            raise RuntimeError("camera muette pendant l'enregistrement")
+        last_seq = entry[0]
+        out[i] = entry[2]
+    out.flush()
+    del out
+    return path
+
+
+class ReplayCameraStream(PiCameraStream):
+    """
+    Source de frames enregistrees avec la meme interface que PiCameraStream
+    (get_frame, get_frame_for_processing, wait_for_frame, detecteurs...).
+
+    Le fichier .npy est ouvert en memmap : les frames sont lues a la demande
+    sans charger tout le fichier. fps=0 rejoue aussi vite que possible ;
+    le flux lores est obtenu par redimensionnement de chaque frame.
+    """
+
+    def __init__(self, path, fps=30.0, loop=True, buffer_size=4,
+                 lores_size=(320, 240), vision_process=False):
+        self.path = path
+        self.replay_frames = np.load(path, mmap_mode='r')
+        if self.replay_frames.ndim != 4 or self.replay_frames.shape[3] != 3:
+            raise ValueError(f"{path}: attendu un tableau N x H x W x 3")
+        self.fps = fps
+        self.loop = loop
+        self.replay_index = 0
+        self.replay_done = threading.Event()  # Fin du fichier (loop=False)
+
+        self.picam2 = None
+        self.vision_worker = None
+        count, height, width, _ = self.replay_frames.shape
+        self._init_pipeline((width, height), lores_size, buffer_size, vision_process)
+
+    def _next_frame(self):
+        """Frame suivante du fichier, ou None a la fin (loop=False)"""
+        if self.replay_index >= len(self.replay_frames):
+            if not self.loop:
+                return None
+            self.replay_index = 0
+        frame = self.replay_frames[self.replay_index]
+        self.replay_index += 1
+        return frame
+
+    def _capture_loop(self):
+        """Publie les frames a la cadence demandee"""
+        period = 1.0 / self.fps if self.fps else 0.0
+        next_time = time.monotonic()
+        while self.capture_running:
+            frame = self._next_frame()
+            if frame is None:
+                self.replay_done.set()
+                return
+
+            np.copyto(self.frames.next_buffer(), frame)
+            if self.lores_frames:
+                cv2.resize(frame, self.lores_size, dst=self.lores_frames.next_buffer(),
+                           interpolation=cv2.INTER_AREA)
+                self.lores_frames.publish()
+            self.frames.publish()
+
+            if period:
+                next_time += period
+                delay = next_time - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_time = time.monotonic()  # En retard : on ne rattrape pas
+
+    def wait_until_done(self, timeout=None):
+        """Attend la fin du rejeu (loop=False)"""
+        return self.replay_done.wait(timeout)
+
+
+class SimCameraStream(ReplayCameraStream):
+    """
+    Camera simulee (ROBOT_HARDWARE=sim, voir hardware.create_camera).
+    Chaque frame vient de hardware.sim.frame_source() si elle est definie
+    (simulateur de piste...), sinon d'un sol gris uni.
+    """
+
+    def __init__(self, buffer_size=4, lores_size=(320, 240), vision_process=False,
+                 main_size=(640, 480), fps=30.0):
+        self.fps = fps
+        self.loop = True
+        self.replay_done = threading.Event()
+        width, height = main_size
+        self.blank_frame = np.full((height, width, 3), 200, dtype=np.uint8)
+
+        self.picam2 = None
+        self.vision_worker = None
+        self._init_pipeline(main_size, lores_size, buffer_size, vision_process)
+
+    def _next_frame(self):
+        from hardware import sim
+        if sim.frame_source is None:
+            return self.blank_frame
+        return sim.frame_source()
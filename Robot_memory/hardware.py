@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+# hardware.py - Couche d'abstraction materielle (drivers reels ou simules)
+"""
+Point d'entree unique vers le materiel du robot : PCA9685 (moteur et
+servos), entrees GPIO (capteurs IR, avec ou sans callbacks de front), capteur ultrason, LEDs (SPI, GPIO)
+et camera.
+
+Le backend est choisi par la variable d'environnement ROBOT_HARDWARE :
+  - "real" (defaut) : drivers Adafruit / gpiozero / spidev / Picamera2
+  - "sim" : objets en memoire qui enregistrent les commandes (throttle,
+    angles, sorties) dans hardware.sim et renvoient des valeurs de capteurs
+    scriptees. Permet de lancer et profiler les challenges et le serveur
+    web sur un PC sans le robot.
+
+Exemple (simulation) :
+    ROBOT_HARDWARE=sim python webserver.py
+
+    from hardware import sim
+    sim.set_input(17, 1)                        # Capteur IR gauche sur la ligne
+    sim.set_distance(lambda: 0.3)               # Obstacle a 30 cm
+    print(sim.throttles, sim.angles)
+"""
+import collections
+import collections.abc
+import os
+import threading
+import time
+
+BACKEND = os.environ.get("ROBOT_HARDWARE", "real").strip().lower()
+if BACKEND not in ("real", "sim"):
+    raise ValueError(f"ROBOT_HARDWARE={BACKEND!r} : attendu 'real' ou 'sim'")
+
+SIMULATED = BACKEND == "sim"
+
+
+class SimState:
+    """
+    Etat partage des peripheriques simules.
+
+    Commandes enregistrees : throttles (par moteur), angles (par canal
+    servo du PCA9685), duty_cycles (par (adresse, canal)), outputs (sorties
+    GPIO), spi_writes. Chaque commande est aussi ajoutee a history avec son
+    horodatage (monotonic).
+
+    Valeurs de capteurs scriptees : une constante, une fonction sans
+    argument (appelee a chaque lecture) ou un iterable (une valeur par
+    lecture, la derniere est gardee a la fin).
+
+    Entrees a fronts (DigitalInputDevice) : il n'y a pas d'interruption en
+    simulation. Une constante passee a set_input() declenche tout de suite
+    les callbacks when_activated / when_deactivated ; les fonctions et
+    sequences sont relues par poll_inputs().
+    """
+
+    def __init__(self, history_size=10000):
+        self.lock = threading.Lock()
+        self.throttles = {}
+        self.angles = {}
+        self.duty_cycles = {}
+        self.outputs = {}
+        self.spi_writes = 0
+        self.history = collections.deque(maxlen=history_size)
+
+        self.distance = 2.0       # Distance ultrason scriptee (m)
+        self.frame_source = None  # Fonction -> frame BGR (camera simulee)
+
+        self._scripts = {}        # Valeurs scriptees (entrees GPIO, distance)
+        self._last = {}
+        self._edge_inputs = collections.defaultdict(list)  # Entrees a fronts par pin
+
+    def record(self, kind, key, value):
+        """Enregistre une commande envoyee a un peripherique simule"""
+        with self.lock:
+            getattr(self, kind)[key] = value
+            self.history.append((time.monotonic(), kind, key, value))
+
+    def _script(self, key, source):
+        """Prepare une valeur scriptee (constante, fonction ou iterable)"""
+        if not callable(source) and not isinstance(source, (int, float, str, bytes)):
+            try:
+                source = iter(source)
+            except TypeError:
+                pass
+        self._scripts[key] = source
+
+    def _read(self, key, default):
+        """Lit la valeur scriptee suivante"""
+        source = self._scripts.get(key, default)
+        if callable(source):
+            value = source()
+        elif isinstance(source, collections.abc.Iterator):
+            value = next(source, self._last.get(key, default))
+        else:
+            value = source
+        self._last[key] = value
+        return value
+
+    def set_input(self, pin, source):
+        """Valeur lue sur une entree GPIO (0/1, fonction ou sequence)"""
+        self._script(('input', pin), source)
+        if isinstance(source, (int, float)):
+            self.poll_inputs((pin,))
+
+    def read_input(self, pin):
+        return self._read(('input', pin), 0)
+
+    def register_input(self, device):
+        """Entree a fronts a prevenir quand la valeur de son pin change"""
+        self._edge_inputs[device.pin].append(device)
+
+    def unregister_input(self, device):
+        devices = self._edge_inputs.get(device.pin, [])
+        if device in devices:
+            devices.remove(device)
+
+    def poll_inputs(self, pins=None):
+        """
+        Relit les entrees scriptees des pins donnes (toutes par defaut) et
+        declenche les callbacks des entrees a fronts dont la valeur change.
+        """
+        for pin in list(self._edge_inputs) if pins is None else pins:
+            devices = self._edge_inputs.get(pin)
+            if devices:
+                value = int(self.read_input(pin))
+                for device in list(devices):
+                    device._set_state(value)
+
+    def set_distance(self, source):
+        """Distance ultrason en metres (constante, fonction ou sequence)"""
+        self._script('distance', source)
+
+    def read_distance(self):
+        return self._read('distance', self.distance)
+
+    def reset(self):
+        """Oublie les commandes enregistrees et les scripts"""
+        with self.lock:
+            self.throttles.clear()
+            self.angles.clear()
+            self.duty_cycles.clear()
+            self.outputs.clear()
+            self.spi_writes = 0
+            self.history.clear()
+        self._scripts.clear()
+        self._last.clear()
+
+
+sim = SimState()
+
+
+# --- PCA9685, servos et moteur DC simules ---------------------------------
+
+class SimPWMChannel:
+    """Canal PWM du PCA9685 : retient le rapport cyclique (16 bits)"""
+
+    def __init__(self, pca, index):
+        self.pca = pca
+        self.index = index
+        self._duty_cycle = 0
+
+    @property
+    def frequency(self):
+        return self.pca.frequency
+
+    @property
+    def duty_cycle(self):
+        return self._duty_cycle
+
+    @duty_cycle.setter
+    def duty_cycle(self, value):
+        if not 0 <= value <= 0xFFFF:
+            raise ValueError("Out of range")
+        self._duty_cycle = value
+        sim.record('duty_cycles', (self.pca.address, self.index), value)
+
+
+class SimPCA9685:
+    """PCA9685 simule : 16 canaux, meme interface que adafruit_pca9685"""
+
+    def __init__(self, i2c_bus=None, *, address=0x40, reference_clock_speed=25000000):
+        self.address = address
+        self.frequency = 50
+        self.channels = [SimPWMChannel(self, i) for i in range(16)]
+
+    def deinit(self):
+        for channel in self.channels:
+            channel._duty_cycle = 0
+
+
+class SimServo:
+    """Servo simule (meme calcul de rapport cyclique que adafruit_motor)"""
+
+    def __init__(self, pwm_out, *, actuation_range=180, min_pulse=750, max_pulse=2250):
+        self._pwm_out = pwm_out
+        self.actuation_range = actuation_range
+        self.set_pulse_width_range(min_pulse, max_pulse)
+        self._angle = None
+
+    def set_pulse_width_range(self, min_pulse=750, max_pulse=2250):
+        period = 1000000 / self._pwm_out.frequency
+        self._min_duty = int(min_pulse / period * 0xFFFF)
+        self._duty_range = int(max_pulse / period * 0xFFFF) - self._min_duty
+
+    @property
+    def angle(self):
+        return self._angle
+
+    @angle.setter
+    def angle(self, new_angle):
+        if new_angle is None:
+            self._pwm_out.duty_cycle = 0
+        else:
+            if not 0 <= new_angle <= self.actuation_range:
+                raise ValueError("Angle out of range")
+            fraction = new_angle / self.actuation_range
+            self._pwm_out.duty_cycle = self._min_duty + int(fraction * self._duty_range)
+        self._angle = new_angle
+        sim.record('angles', self._pwm_out.index, new_angle)
+
+
+FAST_DECAY = 0
+SLOW_DECAY = 1
+
+
+class SimDCMotor:
+    """Moteur DC simule (pont en H sur deux canaux PWM)"""
+
+    def __init__(self, positive_pwm, negative_pwm):
+        self._positive = positive_pwm
+        self._negative = negative_pwm
+        self._throttle = None
+        self.decay_mode = FAST_DECAY
+
+    @property
+    def throttle(self):
+        return self._throttle
+
+    @throttle.setter
+    def throttle(self, value):
+        if value is not None and not -1.0 <= value <= 1.0:
+            raise ValueError("Throttle must be None or between -1.0 and +1.0")
+        self._throttle = value
+        duty = 0 if value is None else int(abs(value) * 0xFFFF)
+        self._positive.duty_cycle = duty if value and value > 0 else 0
+        self._negative.duty_cycle = duty if value and value < 0 else 0
+        sim.record('throttles', (self._positive.index, self._negative.index), value)
+
+
+# --- GPIO, ultrason et LEDs simules ---------------------------------------
+
+class SimInputDevice:
+    """Entree GPIO simulee (interface gpiozero.InputDevice)"""
+
+    def __init__(self, pin=None, *, pull_up=False, active_state=None, pin_factory=None):
+        self.pin = pin
+        self.pull_up = pull_up
+
+    @property
+    def value(self):
+        return int(sim.read_input(self.pin))
+
+    @property
+    def is_active(self):
+        return bool(self.value)
+
+    def close(self):
+        pass
+
+
+class SimDigitalInputDevice(SimInputDevice):
+    """Entree GPIO a fronts simulee (interface gpiozero.DigitalInputDevice)"""
+
+    def __init__(self, pin=None, *, pull_up=False, active_state=None, bounce_time=None,
+                 pin_factory=None):
+        super().__init__(pin, pull_up=pull_up, active_state=active_state)
+        self.bounce_time = bounce_time
+        self.when_activated = None
+        self.when_deactivated = None
+        self._state = int(sim.read_input(pin))
+        sim.register_input(self)
+
+    def _set_state(self, value):
+        """Nouvelle valeur du pin : appelle le callback du front s'il y en a un"""
+        if value == self._state:
+            return
+        self._state = value
+        callback = self.when_activated if value else self.when_deactivated
+        if callback:
+            callback()
+
+    def close(self):
+        sim.unregister_input(self)
+
+
+class SimDistanceSensor:
+    """Capteur ultrason simule (interface gpiozero.DistanceSensor, metres)"""
+
+    def __init__(self, echo=None, trigger=None, *, max_distance=1, **kwargs):
+        self.echo = echo
+        self.trigger = trigger
+        self.max_distance = max_distance
+
+    @property
+    def distance(self):
+        return min(max(float(sim.read_distance()), 0.0), self.max_distance)
+
+    def close(self):
+        pass
+
+
+class SimSpiDev:
+    """Bus SPI simule (LEDs WS2812) : compte les trames envoyees"""
+
+    def __init__(self):
+        self.mode = 0
+        self.max_speed_hz = 0
+
+    def open(self, bus, device):
+        self.bus, self.device = bus, device
+
+    def xfer(self, data, speed_hz=0, *args):
+        with sim.lock:
+            sim.spi_writes += 1
+        return [0] * len(data)
+
+    xfer2 = xfer
+
+    def writebytes(self, data):
+        self.xfer(data)
+
+    def close(self):
+        pass
+
+
+class SimGPIO:
+    """Module RPi.GPIO simule (sorties seulement, pour les LEDs)"""
+
+    BCM = 11
+    BOARD = 10
+    OUT = 0
+    IN = 1
+    HIGH = 1
+    LOW = 0
+
+    @staticmethod
+    def setwarnings(flag):
+        pass
+
+    @staticmethod
+    def setmode(mode):
+        pass
+
+    @staticmethod
+    def setup(pin, mode, *args, **kwargs):
+        pass
+
+    @staticmethod
+    def output(pin, value):
+        sim.record('outputs', pin, value)
+
+    @staticmethod
+    def input(pin):
+        return int(sim.read_input(pin))
+
+    @staticmethod
+    def cleanup(*args):
+        pass
+
+
+class SimSpidevModule:
+    """Remplace le module spidev"""
+    __version__ = "sim"
+    SpiDev = SimSpiDev
+
+
+# --- Selection du backend -------------------------------------------------
+
+if SIMULATED:
+    PCA9685 = SimPCA9685
+    Servo = SimServo
+    DCMotor = SimDCMotor
+    InputDevice = SimInputDevice
+    DigitalInputDevice = SimDigitalInputDevice
+    DistanceSensor = SimDistanceSensor
+    GPIO = SimGPIO
+    spidev = SimSpidevModule
+
+    def create_i2c():
+        """Bus I2C (aucun en simulation)"""
+        return None
+else:
+    from board import SCL, SDA
+    import busio
+    from adafruit_pca9685 import PCA9685
+    from adafruit_motor.servo import Servo
+    from adafruit_motor.motor import DCMotor, FAST_DECAY, SLOW_DECAY
+    from gpiozero import InputDevice, DigitalInputDevice, DistanceSensor
+    import RPi.GPIO as GPIO
+    import spidev
+
+    def create_i2c():
+        """Bus I2C materiel du Raspberry Pi"""
+        return busio.I2C(SCL, SDA)
+
+
+def create_camera(**kwargs):
+    """
+    Camera du robot : PiCameraStream sur le robot, SimCameraStream
+    (frames de sim.frame_source ou sol uni) en simulation.
+    """
+    if SIMULATED:
+        from frame_replay import SimCameraStream
+        return SimCameraStream(**kwargs)
+    from camera import PiCameraStream
+    return PiCameraStream(**kwargs)
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+# i2c_bus.py - Gestionnaire unique du bus I2C et du PCA9685 partage (0x5f)
+import collections
+import itertools
+import queue
+import threading
+import time
+
+from hardware import create_i2c, PCA9685
+from robot_utils import shared_instance, summary
+
+# Priorites des transactions (plus petit = servi en premier)
+PRIORITY_STOP = 0       # Arret moteur
+PRIORITY_STEERING = 1   # Servo de direction (voie 0)
+PRIORITY_MOTOR = 2      # Throttle moteur
+PRIORITY_HEAD = 3       # Servos de tete (voies 1 et 2)
+PRIORITY_DEFAULT = 4
+
+PRIORITY_NAMES = {
+    PRIORITY_STOP: 'stop',
+    PRIORITY_STEERING: 'direction',
+    PRIORITY_MOTOR: 'moteur',
+    PRIORITY_HEAD: 'tete',
+    PRIORITY_DEFAULT: 'autre'
+}
+
+STEERING_CHANNEL = 0
+
+
+def servo_priority(channel):
+    """Priorite d'une ecriture servo : la direction passe avant la tete"""
+    return PRIORITY_STEERING if channel == STEERING_CHANNEL else PRIORITY_HEAD
+
+
+class Transaction:
+    """Transaction en file : func(*args) executee par le thread du bus"""
+
+    __slots__ = ('func', 'args', 'priority', 'name', 'submitted', 'started', 'finished',
+                 'result', 'error', 'event')
+
+    def __init__(self, func, args, priority, name):
+        self.func = func
+        self.args = args
+        self.priority = priority
+        self.name = name
+        self.submitted = time.monotonic()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.event = threading.Event()
+
+    def wait(self, timeout=None):
+        """Attend la fin de la transaction, retourne son resultat (ou leve son erreur)"""
+        if not self.event.wait(timeout):
+            raise TimeoutError(f"Transaction I2C '{self.name}' non executee en {timeout}s")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class I2CBusManager:
+    """
+    Seul proprietaire du bus I2C et du PCA9685 (moteur + servos) : une
+    seule instance, frequence ecrite une seule fois, et toutes les
+    ecritures passent par une file de priorite videe par un thread unique.
+
+    Un arret moteur ou une commande de direction en attente passe donc
+    devant les mouvements de tete, et deux threads (serveur web,
+    planificateur de servos, boucles de controle) ne s'entrelacent plus
+    sur le bus. A egalite de priorite, l'ordre d'arrivee est conserve.
+
+    Mesures par priorite : attente en file et duree de chaque
+    transaction ; taux d'occupation du bus (temps de transaction / temps
+    ecoule) depuis le demarrage et sur la derniere fenetre.
+    """
+
+    def __init__(self, address=0x5f, frequency=50, i2c=None, history=1000, window=1.0):
+        self.address = address
+        self.i2c = create_i2c() if i2c is None else i2c
+        self.pca = PCA9685(self.i2c, address=address)
+        self.pca.frequency = frequency
+        self.window = window  # Fenetre du taux d'occupation recent (s)
+
+        self.queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self.running = False
+        self.thread = None
+        self.inline_lock = threading.Lock()  # Execution directe quand le thread est arrete
+
+        self.lock = threading.Lock()
+        self.waits = {p: collections.deque(maxlen=history) for p in PRIORITY_NAMES}
+        self.durations = {p: collections.deque(maxlen=history) for p in PRIORITY_NAMES}
+        self.recent = collections.deque(maxlen=history)  # (fin, duree)
+        self.busy_time = 0.0
+        self.start_time = time.monotonic()
+
+        # Statistiques
+        self.stats = {
+            'transactions': 0,
+            'errors': 0,
+            'inline': 0,
+            'max_queue': 0,
+            'by_priority': dict.fromkeys(PRIORITY_NAMES.values(), 0)
+        }
+
+        self.start()
+
+    def submit(self, func, *args, priority=PRIORITY_DEFAULT, name=None):
+        """Met func(*args) en file sans attendre, retourne la Transaction"""
+        transaction = Transaction(func, args, priority, name or getattr(func, '__name__', 'i2c'))
+        if not self.running:
+            self._execute(transaction)
+            with self.lock:
+                self.stats['inline'] += 1
+            return transaction
+        self.queue.put((priority, next(self._seq), transaction))
+        size = self.queue.qsize()
+        if size > self.stats['max_queue']:
+            self.stats['max_queue'] = size
+        return transaction
+
+    def execute(self, func, *args, priority=PRIORITY_DEFAULT, name=None, timeout=None):
+        """Execute func(*args) sur le bus et attend le resultat"""
+        if threading.current_thread() is self.thread:
+            # Appel depuis une transaction : deja seul sur le bus
+            return func(*args)
+        return self.submit(func, *args, priority=priority, name=name).wait(timeout)
+
+    def _execute(self, transaction):
+        with self.inline_lock:
+            transaction.started = time.monotonic()
+            try:
+                transaction.result = transaction.func(*transaction.args)
+            except Exception as e:
+                transaction.error = e
+            transaction.finished = time.monotonic()
+        self._record(transaction)
+        transaction.event.set()
+
+    def _record(self, transaction):
+        wait = transaction.started - transaction.submitted
+        duration = transaction.finished - transaction.started
+        priority = transaction.priority if transaction.priority in PRIORITY_NAMES else PRIORITY_DEFAULT
+        with self.lock:
+            self.waits[priority].append(wait)
+            self.durations[priority].append(duration)
+            self.recent.append((transaction.finished, duration))
+            self.busy_time += duration
+            self.stats['transactions'] += 1
+            self.stats['by_priority'][PRIORITY_NAMES[priority]] += 1
+            if transaction.error is not None:
+                self.stats['errors'] += 1
+
+    def _run(self):
+        while True:
+            _, _, transaction = self.queue.get()
+            if transaction is None:
+                break
+            self._execute(transaction)
+
+    def start(self):
+        """Lance le thread du bus"""
+        if self.running:
+            return False
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self):
+        """Arrete le thread apres les transactions deja en file"""
+        if not self.running:
+            return False
+        self.running = False
+        self.queue.put((float('inf'), next(self._seq), None))
+        if self.thread and self.thread.is_alive() and threading.current_thread() is not self.thread:
+            self.thread.join(timeout=2.0)
+        return True
+
+    def get_status(self):
+        """Latences par priorite (secondes) et taux d'occupation du bus"""
+        now = time.monotonic()
+        with self.lock:
+            waits = {PRIORITY_NAMES[p]: list(v) for p, v in self.waits.items()}
+            durations = {PRIORITY_NAMES[p]: list(v) for p, v in self.durations.items()}
+            recent = sum(d for end, d in self.recent if end >= now - self.window)
+            busy_time = self.busy_time
+            stats = self.stats.copy()
+            stats['by_priority'] = self.stats['by_priority'].copy()
+        elapsed = now - self.start_time
+        return {
+            'address': hex(self.address),
+            'running': self.running,
+            'queue_size': self.queue.qsize(),
+            'utilisation': busy_time / elapsed if elapsed > 0 else None,
+            'recent_utilisation': min(1.0, recent / self.window),
+            'wait': {name: summary(values) for name, values in waits.items()},
+            'duration': {name: summary(values) for name, values in durations.items()},
+            'stats': stats
+        }
+
+
+# Moteur, servos et scripts d'evitement passent tous par le meme bus et le
+# meme objet PCA9685
+@shared_instance
+def get_bus():
+    """Gestionnaire du bus partage (cree au premier appel)"""
+    return I2CBusManager()
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+# ir_sensors.py - Capteurs IR de suivi de ligne sur callbacks de front
+import collections
+import threading
+import time
+
+import hardware
+from hardware import DigitalInputDevice
+from robot_utils import shared_instance
+
+
+class IRSensors:
+    """
+    Service des trois capteurs IR (1 = sur la ligne noire).
+
+    Chaque capteur est un DigitalInputDevice dont les callbacks de front
+    (when_activated / when_deactivated) mettent a jour l'etat courant : une
+    lecture ne touche plus au GPIO et ne bloque jamais, et une attente de
+    changement se reveille des le front (plus de boucle qui tourne a vide
+    pendant une recherche de ligne).
+
+    Les valeurs sont rendues dans l'ordre de pins demande par l'appelant :
+    les scripts n'ont pas tous la meme convention gauche / droite.
+    En simulation (pas d'interruption), lectures et attentes relisent les
+    entrees scriptees (hardware.sim.poll_inputs).
+    """
+
+    PINS = (22, 27, 17)  # Gauche, milieu, droite (cote physique du robot)
+
+    def __init__(self, pins=PINS, bounce_time=None, history=1000, rate_window=1.0,
+                 sim_poll=0.001):
+        self.pins = tuple(pins)
+        self.rate_window = rate_window  # Fenetre du taux de transitions (s)
+        self.sim_poll = sim_poll        # Periode de relecture en simulation (s)
+
+        self.condition = threading.Condition()
+        self.closed = False
+        self.seq = 0                    # Incremente a chaque changement de motif
+        self.timestamp = time.monotonic()
+        self.transitions = collections.deque(maxlen=history)  # Horodatages des changements
+
+        # Statistiques
+        self.stats = {
+            'transitions': 0,
+            'edges': dict.fromkeys(self.pins, 0),
+            'waits': 0,
+            'wait_timeouts': 0
+        }
+
+        self.devices = {}
+        self.values = {}
+        for pin in self.pins:
+            device = DigitalInputDevice(pin, bounce_time=bounce_time)
+            self.devices[pin] = device
+            self.values[pin] = int(device.value)
+            device.when_activated = lambda pin=pin: self._on_edge(pin, 1)
+            device.when_deactivated = lambda pin=pin: self._on_edge(pin, 0)
+
+    def _on_edge(self, pin, value):
+        """Callback de front (thread gpiozero) : nouveau motif, reveille les attentes"""
+        with self.condition:
+            self.stats['edges'][pin] += 1
+            if self.values[pin] == value:
+                return
+            self.values[pin] = value
+            self.seq += 1
+            self.timestamp = time.monotonic()
+            self.transitions.append(self.timestamp)
+            self.stats['transitions'] += 1
+            self.condition.notify_all()
+
+    def _poll(self):
+        """Relit les entrees scriptees (simulation seulement)"""
+        if hardware.SIMULATED:
+            hardware.sim.poll_inputs(self.pins)
+
+    def _values(self, pins):
+        return tuple(self.values[pin] for pin in pins or self.pins)
+
+    def read(self, pins=None):
+        """Valeurs courantes (0/1) dans l'ordre de pins, sans bloquer"""
+        self._poll()
+        with self.condition:
+            return self._values(pins)
+
+    def get_pattern(self, pins=None):
+        """
+        Motif courant sur 3 bits (premier pin = bit de poids fort), son
+        horodatage (monotonic) et son numero de sequence.
+        """
+        self._poll()
+        with self.condition:
+            pattern = 0
+            for value in self._values(pins):
+                pattern = (pattern << 1) | value
+            return pattern, self.timestamp, self.seq
+
+    def _wait(self, ready, timeout):
+        """Attend que ready() (appele sous verrou) soit vrai, au plus timeout secondes"""
+        with self.condition:
+            self.stats['waits'] += 1
+            if not hardware.SIMULATED:
+                done = self.condition.wait_for(lambda: ready() or self.closed, timeout)
+                done = done and not self.closed
+                if not done:
+                    self.stats['wait_timeouts'] += 1
+                return done
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self._poll()
+            with self.condition:
+                if self.closed:
+                    return False
+                if ready():
+                    return True
+                if deadline is not None and time.monotonic() >= deadline:
+                    self.stats['wait_timeouts'] += 1
+                    return False
+            time.sleep(self.sim_poll)
+
+    def wait_for_change(self, seq=None, timeout=None, pins=None):
+        """
+        Attend un changement de motif apres la sequence seq (la sequence
+        courante par defaut). Retourne (seq, valeurs), ou None si timeout.
+        """
+        if seq is None:
+            with self.condition:
+                seq = self.seq
+        if not self._wait(lambda: self.seq != seq, timeout):
+            return None
+        with self.condition:
+            return self.seq, self._values(pins)
+
+    def wait_for(self, predicate, timeout=None, pins=None):
+        """
+        Attend que predicate(valeurs) soit vrai, par exemple any pour
+        retrouver la ligne. Retourne les valeurs, ou None si timeout.
+        """
+        result = []
+
+        def ready():
+            values = self._values(pins)
+            if predicate(values):
+                result.append(values)
+                return True
+            return False
+
+        if not self._wait(ready, timeout):
+            return None
+        return result[-1]
+
+    def transition_rate(self):
+        """Changements de motif par seconde sur la derniere fenetre"""
+        with self.condition:
+            since = time.monotonic() - self.rate_window
+            recent = sum(1 for t in self.transitions if t >= since)
+        return recent / self.rate_window
+
+    def get_status(self):
+        """Retourne l'etat des capteurs et les statistiques de transitions"""
+        rate = self.transition_rate()
+        with self.condition:
+            stats = self.stats.copy()
+            stats['edges'] = self.stats['edges'].copy()
+            return {
+                'pins': self.pins,
+                'values': self._values(None),
+                'seq': self.seq,
+                'age': time.monotonic() - self.timestamp,
+                'transition_rate': rate,
+                'closed': self.closed,
+                'stats': stats
+            }
+
+    def close(self):
+        """Libere les GPIO et reveille les attentes en cours"""
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.condition.notify_all()
+        for device in self.devices.values():
+            device.close()
+
+
+# gpiozero refuse deux objets sur le meme pin : tous les modes de suivi de
+# ligne passent par le meme service (recree apres close())
+@shared_instance(valid=lambda sensors: not sensors.closed)
+def get_ir_sensors():
+    """Service IR partage (cree au premier appel)"""
+    return IRSensors()
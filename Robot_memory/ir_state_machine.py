@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# ir_state_machine.py - Machine a etats des capteurs IR compilee en table
+"""
+Decision de suivi de ligne commune a tous les modes : une table
+declarative (motif des 3 capteurs, etat precedent) -> (action, angle,
+vitesse, etat suivant), compilee une fois en tableau plat. Une decision
+est un seul acces indexe, sans chaine de if.
+
+Format d'une table : motif '010' (gauche, milieu, droite dans l'ordre de
+lecture du mode) -> (action, angle, vitesse, etat suivant), ou bien un
+dict {etat precedent: (action, angle, vitesse, etat suivant)} quand la
+decision depend de l'etat. Angle et vitesse sont des noms resolus a la
+compilation par les dicts angles / speeds du mode ; None = ne pas
+commander (garder l'angle, vitesse geree par le mode). Etat suivant None
+= garder l'etat precedent.
+
+    machine = IRStateMachine(TRACKING_TABLE, states=VIRAGE_STATES,
+                             angles=ANGLES, speeds={'normal': 20})
+    decision = machine.decide((0, 1, 1), virage)
+    decision.angle, decision.speed, decision.state
+"""
+import collections
+
+Decision = collections.namedtuple('Decision', 'action angle speed state')
+
+
+# challenge1 : capteurs (gauche, milieu, droite) sur les pins (17, 27, 22),
+# pas d'etat, ligne perdue = on garde l'angle et on avance
+CHALLENGE1_TABLE = {
+    '000': ('lost', None, 'normal', None),
+    '001': ('sharp_left', 'sharp_left', 'normal', None),
+    '010': ('forward', 'center', 'normal', None),
+    '011': ('left', 'left', 'normal', None),
+    '100': ('sharp_right', 'sharp_right', 'normal', None),
+    '101': ('keep', None, 'normal', None),
+    '110': ('right', 'right', 'normal', None),
+    '111': ('forward', 'center', 'normal', None),
+}
+
+# challenge2 / challenge3 / Challenge2V2 : pins (22, 27, 17), l'etat est
+# le dernier virage (-1=gauche ; 0=toutdroit ; 1=droit). Ligne perdue :
+# angle de braquage pour le recul de recherche, selon le dernier virage
+VIRAGE_STATES = (-1, 0, 1)
+TRACKING_TABLE = {
+    '000': {-1: ('lost', 'sharp_right', None, None),
+            0: ('lost', None, None, None),
+            1: ('lost', 'sharp_left', None, None)},
+    '001': ('sharp_right', 'sharp_right', 'normal', 1),
+    '010': ('forward', 'center', 'normal', 0),
+    '011': ('right', 'right', 'normal', 1),
+    '100': ('sharp_left', 'sharp_left', 'normal', -1),
+    '101': ('keep', None, 'normal', None),
+    '110': ('left', 'left', 'normal', -1),
+    '111': ('forward', 'center', 'normal', 0),
+}
+
+# LineFollowerImproved / LineFollowerCamera : pins (17, 27, 22), pas
+# d'etat, la recherche de ligne perdue est geree par le mode
+FOLLOWER_TABLE = {
+    '000': ('lost', None, None, None),
+    '001': ('turn_left', 'turn_left', 'turn', None),
+    '010': ('forward', 'center', 'normal', None),
+    '011': ('slight_left', 'slight_left', 'turn', None),
+    '100': ('turn_right', 'turn_right', 'turn', None),
+    '101': ('forward', 'center', 'normal', None),  # Cas rare : continuer
+    '110': ('slight_right', 'slight_right', 'turn', None),
+    '111': ('forward', 'center', 'normal', None),
+}
+
+
+def pattern_of(status):
+    """Motif sur 3 bits d'un tuple (gauche, milieu, droite)"""
+    left, middle, right = status
+    return (left << 2) | (middle << 1) | right
+
+
+class IRStateMachine:
+    """
+    Table (motif, etat) -> Decision compilee en tuple plat indexe par
+    motif * nombre d'etats + index de l'etat (step), et en dict indexe
+    par tuple (gauche, milieu, droite) puis etat (decide).
+
+    La table est verifiee a la compilation : les 8 motifs doivent etre
+    couverts pour chaque etat, et les noms d'angles / vitesses et les
+    etats suivants doivent exister (ValueError sinon).
+    """
+
+    def __init__(self, table, states=(None,), angles=None, speeds=None, name="ir"):
+        self.name = name
+        self.states = tuple(states)
+        self.angles = dict(angles or {})
+        self.speeds = dict(speeds or {})
+        self._index = {state: i for i, state in enumerate(self.states)}
+        self._table = self._compile(table)
+        # Meme table indexee directement par tuple des capteurs puis etat :
+        # deux acces de dict, sans calcul du motif
+        self._by_status = {
+            ((pattern >> 2) & 1, (pattern >> 1) & 1, pattern & 1):
+                {state: self.step(pattern, state) for state in self.states}
+            for pattern in range(8)}
+
+    def _resolve(self, kind, names, value, key):
+        if value is None:
+            return None
+        if value not in names:
+            raise ValueError(f"{self.name}: {kind} '{value}' inconnu(e) pour {key}")
+        return names[value]
+
+    def _compile(self, table):
+        """Construit le tuple plat des decisions"""
+        count = len(self.states)
+        compiled = [None] * (8 * count)
+        for key, rows in table.items():
+            if len(key) != 3 or set(key) - {'0', '1'}:
+                raise ValueError(f"{self.name}: motif invalide {key!r}")
+            pattern = int(key, 2)
+            if not isinstance(rows, dict):
+                rows = dict.fromkeys(self.states, rows)
+            for state, (action, angle, speed, next_state) in rows.items():
+                if state not in self._index:
+                    raise ValueError(f"{self.name}: etat {state!r} inconnu pour {key}")
+                if next_state is not None and next_state not in self._index:
+                    raise ValueError(f"{self.name}: etat suivant {next_state!r} inconnu pour {key}")
+                compiled[pattern * count + self._index[state]] = Decision(
+                    action,
+                    self._resolve('angle', self.angles, angle, key),
+                    self._resolve('vitesse', self.speeds, speed, key),
+                    state if next_state is None else next_state)
+
+        missing = [(f"{i // count:03b}", self.states[i % count])
+                   for i, decision in enumerate(compiled) if decision is None]
+        if missing:
+            raise ValueError(f"{self.name}: (motif, etat) non couverts : {missing}")
+        return tuple(compiled)
+
+    def step(self, pattern, state=None):
+        """Decision pour un motif sur 3 bits et l'etat precedent"""
+        return self._table[pattern * len(self.states) + self._index[state]]
+
+    def decide(self, status, state=None):
+        """Decision pour un tuple (gauche, milieu, droite) et l'etat precedent"""
+        return self._by_status[status][state]
+
+    def as_dict(self):
+        """Table compilee {(motif, etat): Decision}, pour affichage ou verification"""
+        count = len(self.states)
+        return {(f"{i // count:03b}", self.states[i % count]): decision
+                for i, decision in enumerate(self._table)}
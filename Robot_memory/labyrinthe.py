@@ -3,13 +3,14 @@
 from servo_controller_improved import *
 from motor import *
 from servo_controller_improved import servo_controller
-from gpiozero import InputDevice
+from hardware import InputDevice
 from servo_controller import *
 
 from ultrasound import*
 
 from arrow_detection import *
 from camera import * 
+from hardware import create_camera
 
 
 ANGLE_CENTER = 90     # Position centrale
@@ -21,7 +22,7 @@ ANGLE_SHARP_RIGHT = 50   # Virage serre a droite
 RIGHT_ANGLE_LEFT = 180
 RIGHT_ANGLE_RIGHT = 0
 
-camera = PiCameraStream()
+camera = create_camera()
 camera.toggle_arrow_detection()
 
 
@@ -9,7 +9,8 @@ import time
 from motor import Motor, motorStop, drive, backward
 from servo_controller_improved import servo_controller
 from servo_controller import set_angle
-from ultrasound import checkdist
+from ultrasound import ultrasonic
+from arrow_voting import ArrowVoter
 from time import sleep
 
 class LabyrintheMode:
@@ -33,6 +34,11 @@ class LabyrintheMode:
         
         # Distance obstacle (mm)
         self.obstacle_distance = 300
+        self.brake_horizon = 0.3  # Freinage anticipe : distance prevue dans 0.3 s
+        
+        # Vote continu sur les flches (toutes les frames camra)
+        self.arrow_voter = ArrowVoter(camera) if camera else None
+        self.decision_timeout = 2.0  # Attente max d'une dcision  l'arrt (s)
         
         # Statistiques
         self.stats = {
@@ -44,47 +50,33 @@ class LabyrintheMode:
         }
         
     def get_direction(self):
-        """Rcupre la direction de la flche dtecte"""
-        if not self.camera:
+        """Direction dcide par le vote des flches, sans bloquer ('none' si pas encore)"""
+        if not self.arrow_voter:
             return "none"
-            
-        # S'assurer que la dtection de flches est active
-        if not self.camera.arrow_detection_enabled:
-            self.camera.toggle_arrow_detection()
-            
-        # Capturer une frame et analyser
-        self.camera.get_frame()
-        direction = self.camera.get_arrow_direction()
-        return direction
+        direction, _ = self.arrow_voter.get_decision()
+        return direction or "none"
         
     def chose(self):
-        """Dtermine la direction  prendre en analysant plusieurs images"""
-        directions = {"left": 0, "right": 0, "none": 0}
+        """
+        Dtermine la direction  prendre.
+        Le vote tourne en continu sur toutes les frames : une flche vue
+        pendant l'approche est utilise immdiatement. Sinon le vote repart
+        des frames prises  l'arrt, au plus decision_timeout secondes.
+        """
+        if not self.arrow_voter or not self.running:
+            return "none"
         
         print("Analyse des flches...")
+        direction, confidence = self.arrow_voter.get_decision()
+        if direction not in ("left", "right"):
+            self.arrow_voter.reset()
+            direction = self.arrow_voter.wait_decision(self.decision_timeout)
+            confidence = self.arrow_voter.get_leader()[1]
+        print(f"Vote flches: {direction} (confiance {confidence:.2f})")
         
-        # Analyser 5 images
-        for j in range(5):
-            if not self.running:
-                return "none"
-                
-            direction = self.get_direction()
-            print(f"Dtection {j+1}: {direction}")
-            
-            if direction in directions:
-                directions[direction] += 1
-                
-            sleep(1)
-        
-        # Prendre la direction majoritaire
-        max_count = max(directions.values())
-        for direction, count in directions.items():
-            if count == max_count:
-                if direction != "none":
-                    self.stats['fleches_detectees'] += 1
-                return direction
-        
-        return "none"
+        if direction != "none":
+            self.stats['fleches_detectees'] += 1
+        return direction
     
     def moov(self):
         """Mouvement principal du robot dans le labyrinthe"""
@@ -92,21 +84,27 @@ class LabyrintheMode:
         set_angle(1, 100)
         set_angle(2, 100)
         
+        # Nouveau couloir : le vote repart de zro
+        if self.arrow_voter:
+            self.arrow_voter.reset()
+        
         # Avancer jusqu' l'obstacle
         print("Avance jusqu' l'obstacle...")
         if self.back_light_controller:
             self.back_light_controller.on_move_forward()
             
-        while checkdist() > self.obstacle_distance and self.running:
+        # Une commande par nouvelle mesure ultrason, arret des que l'obstacle
+        # est (ou sera, a la vitesse d'approche mesuree) trop proche
+        while self.running and not ultrasonic.obstacle_within(self.obstacle_distance,
+                                                              self.brake_horizon):
             drive()
+            ultrasonic.wait_update(timeout=0.2)
             
         motorStop()
         self.stats['obstacles_detectes'] += 1
         
         if not self.running:
             return
-            
-        sleep(1)
         
         # Analyser la direction
         direction = self.chose()
@@ -193,6 +191,10 @@ class LabyrintheMode:
             self.camera.toggle_arrow_detection()
             print("Dtection de flches active")
         
+        # Dmarrer le vote continu sur les flches
+        if self.arrow_voter:
+            self.arrow_voter.start()
+        
         # Mettre les LEDs en blanc pour le mode labyrinthe
         if self.led_controller:
             self.led_controller.set_front_leds(255, 255, 255)
@@ -211,6 +213,8 @@ class LabyrintheMode:
         finally:
             # Arrt propre
             motorStop()
+            if self.arrow_voter:
+                self.arrow_voter.stop()
             if self.back_light_controller:
                 self.back_light_controller.on_stop()
             print("Mode labyrinthe arrt")
@@ -271,6 +275,7 @@ class LabyrintheMode:
         return {
             'running': self.running,
             'obstacle_distance': self.obstacle_distance,
+            'arrow_vote': self.arrow_voter.get_status() if self.arrow_voter else None,
             'stats': self.stats.copy()
         }
     
@@ -1,7 +1,7 @@
 # -*- coding: Windows-1252 -*-
 # led_controller_improved.py - Version am?lior?e avec contr?le des LEDs avant
 
-import RPi.GPIO as GPIO
+from hardware import GPIO
 import time
 import threading
 
@@ -1,4 +1,4 @@
-import spidev
+from hardware import spidev
 import threading  
 import numpy
 from numpy import sin, cos, pi
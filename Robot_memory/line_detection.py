@@ -12,29 +12,55 @@ class LineDetector:
         self.min_area = 1500       # Aire minimale pour considrer une ligne
         self.roi_height_ratio = 0.6  # Proportion de l'image  analyser (partie basse)
         
-        # Zones de l'image pour analyser la direction
-        self.zone_width = 80  # Largeur de chaque zone
+        # Estimation continue de la position de la ligne
+        self.scanline_count = 8       # Bandes horizontales analyses dans la ROI
+        self.min_line_width = 6       # Largeur minimale de ligne par bande (pixels)
+        self.max_steering = 30        # Braquage max autour de 90 (60..120)
+        self.offset_gain = 0.8        # Poids du dcalage latral (bas de l'image)
+        self.heading_gain = 0.6       # Poids du cap de la ligne
+        self.min_confidence = 0.3     # Confiance minimale pour suivre la ligne
         
-    def preprocess_frame(self, frame):
-        """Prtraite l'image pour la dtection de ligne"""
+        # Suivi fentr : une fois la ligne trouve, seule une bande de colonnes
+        # autour de sa dernire position est analyse
+        self.track_margin = 60        # Marge de la fentre de part et d'autre de la ligne
+        self.track_growth = 2.0       # largissement de la marge si la confiance baisse
+        self.track_range = None       # Colonnes (min, max) de la ligne  la dernire frame
+        self.track_margin_now = None  # Marge courante (pixels de l'image analyse)
+        
+        # Les seuils en pixels sont regles pour une image de cette largeur ;
+        # ils sont mis a l'echelle pour le flux basse resolution (lores)
+        self.reference_width = 640
+        
+    def _scale(self, width):
+        """Facteur d'echelle entre la largeur analysee et la reference"""
+        return width / self.reference_width
+        
+    def preprocess_frame(self, frame, window=None):
+        """
+        Prtraite l'image pour la dtection de ligne.
+        window=(x0, x1) limite le traitement  ces colonnes de la ROI.
+        """
         if frame is None:
             return None, None
-            
-        # Convertir en niveaux de gris
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         
         # Dfinir la ROI (Region of Interest) - partie basse de l'image
-        height, width = gray.shape
+        height, width = frame.shape[:2]
         roi_height = int(height * self.roi_height_ratio)
-        roi = gray[height - roi_height:height, :]
+        x0, x1 = window if window else (0, width)
+        
+        # Convertir en niveaux de gris (ROI seulement)
+        roi = cv2.cvtColor(frame[height - roi_height:height, x0:x1], cv2.COLOR_BGR2GRAY)
         
         # Seuillage pour isoler les parties noires (ligne)
         _, thresh = cv2.threshold(roi, self.threshold_value, 255, cv2.THRESH_BINARY_INV)
         
         return roi, thresh
     
-    def detect_line_contours(self, thresh_image):
-        """Dtecte les contours de ligne dans l'image seuille"""
+    def detect_line_contours(self, thresh_image, full_width=None):
+        """
+        Dtecte les contours de ligne dans l'image seuille.
+        full_width : largeur de l'image entire si thresh_image est une fentre.
+        """
         if thresh_image is None:
             return []
             
@@ -42,57 +68,145 @@ class LineDetector:
         contours, _ = cv2.findContours(thresh_image, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
         # Filtrer les contours par aire
+        scale = self._scale(full_width or thresh_image.shape[1])
+        min_area = self.min_area * scale * scale
         valid_contours = []
         for contour in contours:
             area = cv2.contourArea(contour)
-            if area > self.min_area:
+            if area > min_area:
                 valid_contours.append(contour)
                 
         return valid_contours
     
+    def estimate_line_position(self, thresh_image, x_offset=0, full_width=None):
+        """
+        Estime la position de la ligne de faon continue.
+        
+        La ROI seuille est dcoupe en bandes horizontales ; l'histogramme
+        des colonnes de chaque bande donne le centre de la ligne au sous-pixel.
+        Une droite ajuste sur ces centres donne le dcalage latral (en bas de
+        l'image, -1 = bord gauche, 1 = bord droit) et le cap (variation du
+        dcalage sur la hauteur de la ROI, > 0 si la ligne part  droite).
+        
+        Si thresh_image n'est qu'une fentre de colonnes, x_offset est sa
+        premire colonne et full_width la largeur de l'image entire.
+        
+        Retourne un dict (offset, heading, angle, confidence, points) ou None
+        si moins de deux bandes contiennent la ligne.
+        """
+        if thresh_image is None:
+            return None
+            
+        height, window_width = thresh_image.shape
+        width = full_width or window_width
+        bands = min(self.scanline_count, height)
+        band_height = height // bands
+        top = height - bands * band_height
+        
+        # Histogramme des colonnes de chaque bande, en une opration
+        hist = thresh_image[top:].reshape(bands, band_height, window_width).sum(axis=1, dtype=np.float32)
+        mass = hist.sum(axis=1)
+        
+        # Une bande contient la ligne si elle couvre assez de pixels
+        min_mass = 255.0 * band_height * max(2.0, self.min_line_width * self._scale(width))
+        valid = mass >= min_mass
+        if np.count_nonzero(valid) < 2:
+            return None
+        
+        # Centre de la ligne par bande (sous-pixel) et dispersion autour
+        columns = np.arange(x_offset, x_offset + window_width, dtype=np.float32)
+        centers = (hist[valid] @ columns) / mass[valid]
+        spread = np.sqrt(np.maximum((hist[valid] @ (columns * columns)) / mass[valid] - centers * centers, 0))
+        
+        # Position des bandes : 0 en bas de la ROI, 1 en haut
+        rows = top + (np.arange(bands, dtype=np.float32) + 0.5) * band_height
+        y = (height - rows[valid]) / height
+        x = (centers - width / 2) / (width / 2)
+        
+        # Droite x = offset + heading * y (moindres carrs)
+        heading, offset = np.polyfit(y, x, 1)
+        residual = float(np.sqrt(np.mean((offset + heading * y - x) ** 2)))
+        
+        # Confiance : part des bandes o la ligne est vue, pnalise par
+        # l'cart  la droite et par une ligne trop tale (croisement, bruit)
+        coverage = np.count_nonzero(valid) / bands
+        straightness = max(0.0, 1.0 - residual / 0.2)
+        thinness = float(np.clip(1.0 - np.mean(spread) / (width / 4), 0.0, 1.0))
+        confidence = coverage * straightness * thinness
+        
+        # Angle de braquage continu : ligne  gauche => angle > 90
+        correction = np.clip(self.offset_gain * offset + self.heading_gain * heading, -1.0, 1.0)
+        angle = 90.0 - self.max_steering * float(correction)
+        
+        return {
+            'offset': float(offset),
+            'heading': float(heading),
+            'angle': angle,
+            'confidence': float(confidence),
+            'points': [(float(cx), float(r)) for cx, r in zip(centers, rows[valid])]
+        }
+    
+    def direction_from_angle(self, angle):
+        """Nom de direction correspondant  un angle de braquage continu"""
+        if angle is None:
+            return "no_line"
+        delta = angle - 90
+        if abs(delta) < 5:
+            return "forward"
+        if abs(delta) < 15:
+            return "slight_left" if delta > 0 else "slight_right"
+        return "turn_left" if delta > 0 else "turn_right"
+    
     def analyze_line_direction(self, thresh_image):
         """Analyse la direction de la ligne et retourne l'angle de correction"""
         if thresh_image is None:
             return None, "no_image"
-            
-        height, width = thresh_image.shape
-        
-        # Diviser l'image en 3 zones: gauche, centre, droite
-        zone_left = thresh_image[:, 0:self.zone_width]
-        zone_center = thresh_image[:, (width//2 - self.zone_width//2):(width//2 + self.zone_width//2)]
-        zone_right = thresh_image[:, (width - self.zone_width):width]
-        
-        # Compter les pixels blancs (ligne dtecte) dans chaque zone
-        pixels_left = cv2.countNonZero(zone_left)
-        pixels_center = cv2.countNonZero(zone_center)
-        pixels_right = cv2.countNonZero(zone_right)
-        
-        print(f"Pixels dtects - Gauche: {pixels_left}, Centre: {pixels_center}, Droite: {pixels_right}")
-        
-        # Seuils pour dcider de la direction
-        min_pixels = 100  # Seuil minimum pour considrer qu'il y a une ligne
-        
-        # Analyser la direction
-        if pixels_center > min_pixels:
-            if pixels_left > pixels_right + 50:
-                return 110, "slight_left"  # Ligne vers la gauche
-            elif pixels_right > pixels_left + 50:
-                return 70, "slight_right"  # Ligne vers la droite
-            else:
-                return 90, "forward"  # Ligne au centre
-                
-        elif pixels_left > min_pixels:
-            return 120, "turn_left"  # Ligne trs  gauche
-        elif pixels_right > min_pixels:
-            return 60, "turn_right"  # Ligne trs  droite
-        else:
+        
+        estimate = self.estimate_line_position(thresh_image)
+        if estimate is None or estimate['confidence'] < self.min_confidence:
             return None, "no_line"  # Pas de ligne dtecte
+        
+        angle = estimate['angle']
+        return angle, self.direction_from_angle(angle)
+    
+    def reset_tracking(self):
+        """Abandonne le suivi fentr : la prochaine frame est analyse en entier"""
+        self.track_range = None
+        self.track_margin_now = None
+    
+    def tracking_window(self, width):
+        """Colonnes (x0, x1)  analyser, ou None pour toute l'image"""
+        if self.track_range is None:
+            return None
+        x0 = int(self.track_range[0] - self.track_margin_now)
+        x1 = int(np.ceil(self.track_range[1] + self.track_margin_now))
+        if x0 <= 0 and x1 >= width:
+            return None
+        return max(0, x0), min(width, x1)
+    
+    def update_tracking(self, estimate, width):
+        """Met  jour la fentre de suivi aprs l'analyse d'une frame"""
+        base_margin = self.track_margin * self._scale(width)
+        if estimate is not None and estimate['confidence'] >= self.min_confidence:
+            # Ligne sre : fentre resserre autour des centres trouvs
+            columns = [cx for cx, _ in estimate['points']]
+            self.track_range = (min(columns), max(columns))
+            self.track_margin_now = base_margin
+        elif self.track_range is not None:
+            # Ligne incertaine ou absente : on largit la recherche, jusqu'
+            # revenir  l'image entire
+            self.track_margin_now *= self.track_growth
+            if self.track_margin_now >= width:
+                self.reset_tracking()
     
     def find_line_with_scanning(self, camera, max_attempts=8):
         """Recherche la ligne en balayant avec la camra"""
         # Angles de scan de gauche  droite
         scan_angles = [120, 110, 100, 90, 80, 70, 60, 50]
         
+        # La camra bouge : l'ancienne position de la ligne ne vaut plus rien
+        self.reset_tracking()
+        
         for attempt, angle in enumerate(scan_angles):
             print(f"Scan tentative {attempt + 1}/8 - Angle: {angle}")
             
@@ -116,74 +230,127 @@ class LineDetector:
         print("Aucune ligne trouve aprs scan complet")
         return None, "not_found"
     
-    def create_debug_image(self, original_frame, thresh_image, direction_info):
-        """Cre une image de debug avec les informations de dtection"""
-        if original_frame is None or thresh_image is None:
-            return None
-            
-        # Redimensionner l'image seuille pour correspondre  l'original
-        height_orig = original_frame.shape[0]
-        roi_height = int(height_orig * self.roi_height_ratio)
-        
-        # Crer une image colore pour le debug
-        debug_image = original_frame.copy()
-        
-        # Convertir l'image seuille en couleur pour l'affichage
-        thresh_colored = cv2.cvtColor(thresh_image, cv2.COLOR_GRAY2BGR)
-        thresh_colored = cv2.resize(thresh_colored, (original_frame.shape[1], roi_height))
-        
-        # Superposer la zone d'analyse
-        debug_image[height_orig - roi_height:height_orig, :] = thresh_colored
+    def draw_result(self, image, result, scale_x=1.0, scale_y=1.0):
+        """
+        Dessine un rsultat de detect_line_in_frame() sur image (overlay du
+        flux vido ou image de debug), sans rien recalculer.
+        scale_x / scale_y : rapport entre image et la frame analyse.
+        """
+        height, width = image.shape[:2]
+        roi_start = height - int(result['roi_height'] * scale_y)
+        x0, x1 = result['window'] if result['window'] else (0, width / scale_x)
         
         # Ajouter les informations de direction
-        angle, direction = direction_info
+        angle = result['angle']
         if angle is not None:
-            cv2.putText(debug_image, f"Direction: {direction}", (10, 30), 
+            cv2.putText(image, f"Direction: {result['direction']}", (10, 30), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-            cv2.putText(debug_image, f"Angle: {angle}", (10, 60), 
+            cv2.putText(image, f"Angle: {angle:.1f}", (10, 60), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
         else:
-            cv2.putText(debug_image, "Ligne non dtecte", (10, 30), 
+            cv2.putText(image, "Ligne non dtecte", (10, 30), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
         
-        # Dessiner les zones d'analyse
-        height, width = debug_image.shape[:2]
-        roi_start = height - roi_height
+        # Dessiner la zone d'analyse (fentre de suivi ou ROI) et l'axe central
+        cv2.rectangle(image, (int(x0 * scale_x), roi_start), (int(x1 * scale_x) - 1, height - 1), (255, 0, 0), 2)
+        cv2.line(image, (width // 2, roi_start), (width // 2, height), (0, 255, 0), 1)
         
-        # Zone gauche (rouge)
-        cv2.rectangle(debug_image, (0, roi_start), (self.zone_width, height), (0, 0, 255), 2)
-        cv2.putText(debug_image, "L", (10, roi_start + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+        if result['offset'] is not None:
+            # Centres de ligne par bande (jaune) et droite ajuste (rouge)
+            for cx, cy in result['points']:
+                cv2.circle(image, (int(cx * scale_x), roi_start + int(cy * scale_y)), 4, (0, 255, 255), -1)
+            
+            half = width / 2
+            x_bottom = int(half + result['offset'] * half)
+            x_top = int(half + (result['offset'] + result['heading']) * half)
+            cv2.line(image, (x_bottom, height - 1), (x_top, roi_start), (0, 0, 255), 2)
+            cv2.putText(image, f"Confiance: {result['confidence']:.2f}", (10, 90), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
         
-        # Zone centre (vert)
-        center_start = width//2 - self.zone_width//2
-        center_end = width//2 + self.zone_width//2
-        cv2.rectangle(debug_image, (center_start, roi_start), (center_end, height), (0, 255, 0), 2)
-        cv2.putText(debug_image, "C", (center_start + 10, roi_start + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+        return image
+    
+    def create_debug_image(self, original_frame, thresh_image, result):
+        """Cre une image de debug avec les informations de dtection"""
+        if original_frame is None or thresh_image is None:
+            return None
+            
+        height_orig = original_frame.shape[0]
+        x0, x1 = result['window'] if result['window'] else (0, original_frame.shape[1])
         
-        # Zone droite (bleu)
-        cv2.rectangle(debug_image, (width - self.zone_width, roi_start), (width, height), (255, 0, 0), 2)
-        cv2.putText(debug_image, "R", (width - self.zone_width + 10, roi_start + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
+        # Crer une image colore pour le debug
+        debug_image = original_frame.copy()
+        
+        # Superposer la zone d'analyse seuille (fentre de suivi ou ROI entire)
+        thresh_colored = cv2.cvtColor(thresh_image, cv2.COLOR_GRAY2BGR)
+        debug_image[height_orig - result['roi_height']:height_orig, x0:x1] = thresh_colored
         
-        return debug_image
+        return self.draw_result(debug_image, result)
     
-    def detect_line_in_frame(self, frame):
-        """Fonction principale pour dtecter une ligne dans une image"""
-        # Prtraitement
-        roi, thresh = self.preprocess_frame(frame)
+    def detect_line_in_frame(self, frame, debug=False):
+        """
+        Fonction principale pour dtecter une ligne dans une image.
+        Une fois la ligne trouve, seule une fentre autour de sa dernire
+        position est traite ; la fentre s'largit quand la confiance baisse
+        et l'image entire est de nouveau analyse quand la ligne est perdue.
+        Le rsultat ne contient que des donnes (dessin : draw_result) ;
+        debug=True y ajoute une image de debug (copie annote de la frame).
+        """
+        if frame is None:
+            return {
+                'angle': None,
+                'direction': "no_image",
+                'offset': None,
+                'heading': None,
+                'confidence': 0.0,
+                'points': [],
+                'window': None,
+                'roi_height': 0,
+                'contours_found': 0,
+                'line_detected': False,
+                'debug_image': None
+            }
+        
+        width = frame.shape[1]
+        window = self.tracking_window(width)
+        
+        # Prtraitement (fentre de suivi seulement si la ligne est connue)
+        roi, thresh = self.preprocess_frame(frame, window)
         
         # Dtection des contours
-        contours = self.detect_line_contours(thresh)
+        contours = self.detect_line_contours(thresh, full_width=width)
         
-        # Analyse de la direction
-        angle, direction = self.analyze_line_direction(thresh)
+        # Position continue de la ligne
+        x_offset = window[0] if window else 0
+        estimate = self.estimate_line_position(thresh, x_offset, width)
         
-        # Crer l'image de debug
-        debug_image = self.create_debug_image(frame, thresh, (angle, direction))
+        # Fentre largie jusqu' l'image entire sans retrouver la ligne :
+        # nouvelle recherche sur l'image entire
+        self.update_tracking(estimate, width)
+        if window is not None and self.track_range is None:
+            return self.detect_line_in_frame(frame, debug)
         
-        return {
+        if estimate is not None and estimate['confidence'] >= self.min_confidence:
+            angle = estimate['angle']
+        else:
+            angle = None
+        direction = self.direction_from_angle(angle)
+        
+        result = {
             'angle': angle,
             'direction': direction,
+            'offset': estimate['offset'] if estimate else None,
+            'heading': estimate['heading'] if estimate else None,
+            'confidence': estimate['confidence'] if estimate else 0.0,
+            'points': estimate['points'] if estimate else [],
+            'window': window,
+            'roi_height': thresh.shape[0],
             'contours_found': len(contours),
             'line_detected': len(contours) > 0,
-            'debug_image': debug_image
-        }
\ No newline at end of file
+            'debug_image': None
+        }
+        
+        # Crer l'image de debug (seulement sur demande)
+        if debug:
+            result['debug_image'] = self.create_debug_image(frame, thresh, result)
+        
+        return result
\ No newline at end of file
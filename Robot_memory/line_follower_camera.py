@@ -11,6 +11,8 @@ class LineFollowerCamera:
     def __init__(self, camera_instance=None, led_controller=None, back_light_controller=None):
         # Camera instance
         self.camera = camera_instance
+        # Le dtecteur de la camra est cadenc par son detector_scheduler (son
+        # thread est seul  y toucher) ; le balayage de recherche a le sien
         self.line_detector = LineDetector()
         
         # Contrleurs
@@ -41,6 +43,7 @@ class LineFollowerCamera:
         self.thread = None
         self.last_arrow_direction = None
         self.last_dominant_color = None
+        self.last_frame_seq = 0
         
         # Statistiques
         self.stats = {
@@ -51,19 +54,21 @@ class LineFollowerCamera:
 
     def analyze_frame(self):
         """Analyse une frame pour la dtection de ligne et flches"""
-        frame = self.camera.get_frame_for_processing()
-        if frame is None:
+        # Attendre le rsultat ligne de la prochaine frame : le dtecteur est
+        # cadenc  30 Hz par la camra, la boucle suit ce rythme
+        entry = self.camera.detector_scheduler.wait_result('line', self.last_frame_seq, timeout=0.5)
+        if entry is None:
             return None, None
+        self.last_frame_seq, line_result = entry
         
         self.stats['frames_analyzed'] += 1
         
-        # Dtection de ligne
-        line_result = self.line_detector.detect_line_in_frame(frame)
-        
-        # Dtection de flche (si active)
+        # Flche : dernier rsultat du dtecteur cadenc (si activ)
         arrow_direction = None
-        if self.camera.arrow_detector and self.camera.show_arrow_detection:
-            arrow_direction, _ = self.camera.arrow_detector.detect_arrow_advanced(frame)
+        if self.camera.arrow_detector and self.camera.arrow_detection_enabled:
+            arrow_direction = self.camera.get_arrow_direction()
+            if arrow_direction == 'none':
+                arrow_direction = None
             if arrow_direction and arrow_direction != self.last_arrow_direction:
                 self.stats['arrows_detected'] += 1
                 self.last_arrow_direction = arrow_direction
@@ -127,7 +132,10 @@ class LineFollowerCamera:
         if angle_name in self.wheel_angles:
             angle = self.wheel_angles[angle_name]
             servo_controller.move_to_angle(0, angle, blocking=False)
-            time.sleep(0.03)
+
+    def steer_to_angle(self, angle):
+        """Oriente les roues vers un angle continu (sans attente)"""
+        servo_controller.move_to_angle(0, angle, blocking=False)
 
     def move_motor(self, forward=True, speed_name='normal'):
         """Contrle le moteur"""
@@ -146,31 +154,24 @@ class LineFollowerCamera:
             return 'lost'
             
         angle = line_result.get('angle')
-        direction = line_result.get('direction')
+        if angle is None:
+            return 'lost'
+        
+        # Braquage continu donn par l'estimateur de ligne
+        self.steer_to_angle(angle)
         
-        # Convertir la direction en action
-        if direction == 'forward':
-            self.steer_wheels('center')
+        # Vitesse : ralentir avec le braquage, et au plus lent si la ligne est peu sre
+        if line_result.get('confidence', 1.0) < 0.5:
+            self.move_motor(forward=True, speed_name='slow')
+        elif abs(angle - 90) < 5:
             self.move_motor(forward=True, speed_name='normal')
-            return 'forward'
-        elif direction == 'slight_left':
-            self.steer_wheels('slight_left')
-            self.move_motor(forward=True, speed_name='turn')
-            return 'left'
-        elif direction == 'slight_right':
-            self.steer_wheels('slight_right')
-            self.move_motor(forward=True, speed_name='turn')
-            return 'right'
-        elif direction == 'turn_left':
-            self.steer_wheels('turn_left')
-            self.move_motor(forward=True, speed_name='turn')
-            return 'left'
-        elif direction == 'turn_right':
-            self.steer_wheels('turn_right')
-            self.move_motor(forward=True, speed_name='turn')
-            return 'right'
         else:
-            return 'lost'
+            self.move_motor(forward=True, speed_name='turn')
+        
+        # Convertir l'angle en action
+        if abs(angle - 90) < 5:
+            return 'forward'
+        return 'left' if angle > 90 else 'right'
 
     def _main_loop(self):
         """Boucle principale du mode camra"""
@@ -180,9 +181,9 @@ class LineFollowerCamera:
         servo_controller.initialize_servos()
         time.sleep(1)
         
-        # Activer les overlays ncessaires
+        # Activer les dtecteurs et overlays ncessaires
         self.camera.show_line_detection = True
-        self.camera.show_arrow_detection = True
+        self.camera.arrow_detection_enabled = True
         self.camera.show_color_detection = True
         
         lost_count = 0
@@ -225,15 +226,27 @@ class LineFollowerCamera:
                         if self.led_controller:
                             self.led_controller.set_front_leds(255, 255, 0)
                         
-                        # Balayage simple
-                        self.steer_wheels('turn_left')
-                        self.move_motor(forward=True, speed_name='slow')
-                        time.sleep(0.5)
+                        # Balayage de la tte camra pour retrouver la ligne
+                        found_angle, result = self.line_detector.find_line_with_scanning(self.camera)
+                        servo_controller.return_to_center(1, blocking=True)
                         
-                        self.steer_wheels('turn_right')
-                        time.sleep(1.0)
+                        if result == "found":
+                            # Orienter les roues du ct o la tte a vu la ligne
+                            offset = found_angle - servo_controller.default_positions[1]
+                            self.steer_to_angle(max(60, min(120, 90 + offset)))
+                            self.move_motor(forward=True, speed_name='slow')
+                            time.sleep(0.5)
+                        else:
+                            # Balayage simple
+                            self.steer_wheels('turn_left')
+                            self.move_motor(forward=True, speed_name='slow')
+                            time.sleep(0.5)
+                            
+                            self.steer_wheels('turn_right')
+                            time.sleep(1.0)
                         
                         self.steer_wheels('center')
+                        self.reset_line_tracking()
                         lost_count = 0
                     else:
                         self.stop_all_motors()
@@ -241,8 +254,6 @@ class LineFollowerCamera:
                 else:
                     lost_count = 0
                 
-                time.sleep(0.05)  # 20Hz pour l'analyse camra
-                
             except Exception as e:
                 print(f"Erreur dans la boucle principale camra: {e}")
                 break
@@ -252,9 +263,9 @@ class LineFollowerCamera:
         self.stop_all_motors()
         servo_controller.initialize_servos()
         
-        # Dsactiver les overlays
+        # Dsactiver les dtecteurs et overlays
         self.camera.show_line_detection = False
-        self.camera.show_arrow_detection = False
+        self.camera.arrow_detection_enabled = False
         self.camera.show_color_detection = False
         
         # teindre les LEDs
@@ -263,6 +274,12 @@ class LineFollowerCamera:
         if self.back_light_controller:
             self.back_light_controller.on_stop()
 
+    def reset_line_tracking(self):
+        """Remise  zro du suivi de ligne, par le thread du scheduler de la camra"""
+        if hasattr(self.camera, 'request_line_reset'):
+            self.camera.request_line_reset()
+        self.line_detector.reset_tracking()
+
     def start(self):
         """Dmarre le suivi par camra"""
         if self.running:
@@ -275,6 +292,8 @@ class LineFollowerCamera:
         self.running = True
         self.last_arrow_direction = None
         self.last_dominant_color = None
+        self.last_frame_seq = 0
+        self.reset_line_tracking()
         
         # Rinitialiser les stats
         for key in self.stats:
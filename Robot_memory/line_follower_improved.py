@@ -3,39 +3,29 @@
 
 import time
 import threading
-from gpiozero import InputDevice
+from ir_sensors import get_ir_sensors
 from motor import Motor, motorStop
 from servo_controller_improved import servo_controller
 # PAS D'IMPORT DE CAMERA - on utilisera celle passe en paramtre
 from line_detection import LineDetector
+from control_loop import ControlLoop
+from ir_state_machine import IRStateMachine, FOLLOWER_TABLE
+from steering_pid import IRLineError, SteeringController, camera_line_error
 
 class LineFollowerImproved:
-    # Mappage des actions base sur les capteurs IR (gauche, centre, droite)
-    ACTION_MAP = {
-        (0,0,0): "lost",           # Aucun capteur ne detecte - VRAIMENT PERDU
-        (1,1,1): "forward",        # Tous les capteurs detectent
-        (0,1,0): "forward",        # Seul le centre detecte
-        (1,1,0): "slight_right",   # Gauche et centre detectent
-        (0,1,1): "slight_left",    # Centre et droite detectent
-        (1,0,0): "turn_right",     # Seule la gauche detecte - RESTAUR turn au lieu de sharp
-        (0,0,1): "turn_left",      # Seule la droite detecte - RESTAUR turn au lieu de sharp
-        (1,0,1): "forward"         # Gauche et droite detectent (cas rare) - continuer
-    }
+    IR_PINS = (17, 27, 22)  # Pins des capteurs 'left', 'middle', 'right'
 
-    def __init__(self, camera_instance=None):
-        # Capteurs IR pour suivi de ligne
-        self.sensors = {
-            'left':   InputDevice(17),
-            'middle': InputDevice(27),
-            'right':  InputDevice(22),
-        }
+    def __init__(self, camera_instance=None, steering='table'):
+        # Capteurs IR pour suivi de ligne (service partag, callbacks de front)
+        self.ir_sensors = get_ir_sensors()
         
         # Vitesses de moteur
         self.speeds = {
             'normal': 20,      # Vitesse normale
             'turn': 18,        # Vitesse en virage
             'search': 8,       # Vitesse de recherche (RDUITE pour plus de contrle)
-            'recovery': 10     # Vitesse de rcupration (RDUITE)
+            'recovery': 10,    # Vitesse de rcupration (RDUITE)
+            'pid': 30          # Vitesse avec la direction continue (PID)
         }
         
         # Angles de direction pour les roues
@@ -51,6 +41,18 @@ class LineFollowerImproved:
             'extreme_right': 45,   # Nouveau : angle extrme pour rcupration difficile
         }
         
+        # Dcision capteurs IR -> action, angle, vitesse (table partage, ir_state_machine)
+        self.state_machine = IRStateMachine(FOLLOWER_TABLE, angles=self.wheel_angles,
+                                            speeds=self.speeds, name="line_follower")
+        
+        # Direction : 'table' (angles fixes de la table IR) ou 'pid' (angle
+        # continu sur l'cart  la ligne, camra si son rsultat est rcent,
+        # capteurs IR sinon)
+        self.steering_mode = steering
+        self.line_error = IRLineError()
+        self.steering = SteeringController(actuator=self._send_wheel_angle)
+        self.camera_max_age = 0.15  # ge max d'un rsultat de ligne camra (s)
+        
         # Positions de la tte de camra
         self.head_positions = {
             'normal': 90,      # Position normale
@@ -77,8 +79,15 @@ class LineFollowerImproved:
             'ir_detections': 0,
             'camera_recoveries': 0,
             'successful_recoveries': 0,
-            'failed_recoveries': 0
+            'failed_recoveries': 0,
+            'camera_steering': 0
         }
+        
+        # Boucle de contrle  frquence fixe : capteurs -> action -> moteurs
+        self.control_loop = ControlLoop(rate=100, name="line_follower", stop_on_error=True)
+        self.control_loop.add_phase("sense", self.read_ir_sensors)
+        self.control_loop.add_phase("decide", self.decide)
+        self.control_loop.add_phase("act", self.act)
 
     def set_camera(self, camera_instance):
         """Dfinit l'instance de camra  utiliser"""
@@ -86,19 +95,48 @@ class LineFollowerImproved:
 
     def read_ir_sensors(self):
         """Lit les capteurs IR et retourne un tuple (gauche, centre, droite)"""
-        return tuple(int(self.sensors[k].value) for k in ('left', 'middle', 'right'))
+        return self.ir_sensors.read(self.IR_PINS)
 
     def get_action_from_sensors(self, sensor_pattern):
         """Dtermine l'action  prendre base sur les capteurs IR"""
-        return self.ACTION_MAP.get(sensor_pattern, 'stop')
+        return self.state_machine.decide(sensor_pattern).action
 
     def steer_wheels(self, angle_name):
         """Oriente les roues selon l'angle spcifi"""
         if angle_name in self.wheel_angles:
-            angle = self.wheel_angles[angle_name]
-            servo_controller.move_to_angle(0, angle, blocking=False)
-            self.last_wheel_angle = angle
-            time.sleep(0.03)
+            self.set_wheel_angle(self.wheel_angles[angle_name])
+
+    def set_wheel_angle(self, angle):
+        """Oriente les roues  l'angle donn (degrs)"""
+        if angle == self.last_wheel_angle:
+            return  # Dj orientes : pas de nouvelle commande  chaque tick
+        servo_controller.move_to_angle(0, angle, blocking=False)
+        self.last_wheel_angle = angle
+
+    def _send_wheel_angle(self, channel, angle):
+        """Sortie du PID de direction : commande sans pause,  chaque tick"""
+        servo_controller.move_to_angle(channel, angle, blocking=False)
+        self.last_wheel_angle = angle
+
+    def camera_line_error(self):
+        """cart  la ligne vu par la camra, None si pas de rsultat rcent et fiable"""
+        scheduler = getattr(self.camera, 'detector_scheduler', None)
+        if scheduler is None:
+            return None
+        result, timestamp = scheduler.get_latest('line')
+        if timestamp is None or time.monotonic() - timestamp > self.camera_max_age:
+            return None
+        return camera_line_error(result)
+
+    def steer_pid(self, sensor_pattern):
+        """Direction continue : cart camra ou IR -> PID -> servo 0"""
+        # Capteurs remis dans l'ordre physique : 'left' (pin 17) est  droite
+        error = self.line_error.update(sensor_pattern[::-1])
+        camera_error = self.camera_line_error()
+        if camera_error is not None:
+            error = camera_error
+            self.stats['camera_steering'] += 1
+        return self.steering.update(error)
 
     def move_motor(self, forward=True, speed_name='normal'):
         """Contrle le moteur avec la vitesse spcifie"""
@@ -142,6 +180,7 @@ class LineFollowerImproved:
         try:
             # Servo 0: Roues au centre
             servo_controller.move_to_angle(0, 90, blocking=True)
+            self.last_wheel_angle = 90
             time.sleep(0.3)
             
             # Servo 1: Tte gauche/droite au centre
@@ -481,30 +520,76 @@ class LineFollowerImproved:
             print(f"Erreur durant la recuperation extreme: {e}")
             return False
 
-    def handle_ir_action(self, action):
-        """Gre les actions bases sur les capteurs IR"""
-        if action == 'forward':
-            self.steer_wheels('center')
-            self.move_motor(forward=True, speed_name='normal')
-            
-        elif action == 'slight_left':
-            self.steer_wheels('slight_left')
-            self.move_motor(forward=True, speed_name='turn')
-            
-        elif action == 'slight_right':
-            self.steer_wheels('slight_right')
-            self.move_motor(forward=True, speed_name='turn')
-            
-        elif action == 'turn_left':
-            self.steer_wheels('turn_left')
-            self.move_motor(forward=True, speed_name='turn')
+    def handle_ir_action(self, decision, sensor_pattern=None):
+        """Applique la dcision IR : angle des roues et vitesse, arrt si pas de vitesse"""
+        if decision.speed is None:  # Perdu ou action sans mouvement
+            self.stop_all_motors()
+            return
+        if self.steering_mode == 'pid' and sensor_pattern is not None:
+            self.steer_pid(sensor_pattern)
+            Motor(1, 1, self.speeds['pid'])
+            return
+        if decision.angle is not None:
+            self.set_wheel_angle(decision.angle)
+        Motor(1, 1, decision.speed)
+
+    def decide(self, sensor_pattern):
+        """Phase dcision : dcision de la table IR pour les capteurs"""
+        return sensor_pattern, self.state_machine.decide(sensor_pattern)
+
+    def act(self, decision):
+        """Phase action : suivi IR, ou recherche / rcupration si ligne perdue"""
+        sensor_pattern, ir_decision = decision
+        
+        # CONDITION AMELIOREE ET TOLERANTE
+        if sensor_pattern == (0,0,0):  # Vraiment perdu
+            self.lost_line_count += 1
+            print(f"Ligne completement perdue (tentative {self.lost_line_count}/{self.max_lost_attempts})")
+            
+            if self.lost_line_count >= self.max_lost_attempts:
+                # Tenter une recuperation par camera
+                print("Declenchement de la recuperation camera...")
+                recovery_success = self.camera_line_recovery()
+                
+                # FORCER LA REPRISE DU SUIVI IR dans tous les cas
+                print("REPRISE IMMEDIATE du suivi IR apres recuperation")
+                self.lost_line_count = 0  # Reset force
+                
+                # TEST: Lire immdiatement les capteurs pour vrifier la reprise
+                time.sleep(0.1)
+                test_sensors = self.read_ir_sensors()
+                print(f"TEST REPRISE: Capteurs apres recuperation: {test_sensors}")
+                
+                if not recovery_success:
+                    print("Recuperation partiellement echouee mais reprise du suivi IR")
+                
+            else:
+                # Arret temporaire et nouvelle tentative AVEC MOUVEMENT DE RECHERCHE
+                self.stop_all_motors()
+                # Petit mouvement de recherche pour essayer de retrouver la ligne
+                search_direction = 'slight_left' if self.lost_line_count % 2 == 1 else 'slight_right'
+                self.steer_wheels(search_direction)
+                self.move_motor(forward=True, speed_name='search')
+                time.sleep(0.3)  # Mouvement court de recherche
+                self.stop_all_motors()
+                time.sleep(0.1)
+            
+            # Manoeuvre bloquante : la boucle repart de maintenant, et le
+            # PID de direction repart de l'angle laiss par la manoeuvre
+            self.control_loop.resync()
+            self.steering.reset()
+        else:
+            # Ligne detectee par IR (au moins un capteur), traitement normal
+            if self.lost_line_count > 0:
+                print(f"Ligne retrouvee par capteurs IR: {sensor_pattern}")
+                self.lost_line_count = 0
             
-        elif action == 'turn_right':
-            self.steer_wheels('turn_right')
-            self.move_motor(forward=True, speed_name='turn')
+            self.stats['ir_detections'] += 1
+            # DEBUG: Afficher l'action pour comprendre le comportement
+            if self.stats['ir_detections'] % 50 == 0:  # Tous les 50 dtections
+                print(f"DEBUG: Capteurs {sensor_pattern} -> Action: {ir_decision.action}")
             
-        else:  # stop ou action inconnue
-            self.stop_all_motors()
+            self.handle_ir_action(ir_decision, sensor_pattern)
 
     def _main_loop(self):
         """Boucle principale de suivi de ligne"""
@@ -550,62 +635,14 @@ class LineFollowerImproved:
         except Exception as e:
             print(f"ATTENTION: Problme avec les servos: {e}")
         
-        while self.running:
-            try:
-                # Lecture des capteurs IR
-                sensor_pattern = self.read_ir_sensors()
-                action = self.get_action_from_sensors(sensor_pattern)
-                
-                # CONDITION AMELIOREE ET TOLERANTE
-                if sensor_pattern == (0,0,0):  # Vraiment perdu
-                    self.lost_line_count += 1
-                    print(f"Ligne completement perdue (tentative {self.lost_line_count}/{self.max_lost_attempts})")
-                    
-                    if self.lost_line_count >= self.max_lost_attempts:
-                        # Tenter une recuperation par camera
-                        print("Declenchement de la recuperation camera...")
-                        recovery_success = self.camera_line_recovery()
-                        
-                        # FORCER LA REPRISE DU SUIVI IR dans tous les cas
-                        print("REPRISE IMMEDIATE du suivi IR apres recuperation")
-                        self.lost_line_count = 0  # Reset force
-                        
-                        # TEST: Lire immdiatement les capteurs pour vrifier la reprise
-                        time.sleep(0.1)
-                        test_sensors = self.read_ir_sensors()
-                        print(f"TEST REPRISE: Capteurs apres recuperation: {test_sensors}")
-                        
-                        if not recovery_success:
-                            print("Recuperation partiellement echouee mais reprise du suivi IR")
-                        
-                    else:
-                        # Arret temporaire et nouvelle tentative AVEC MOUVEMENT DE RECHERCHE
-                        self.stop_all_motors()
-                        # Petit mouvement de recherche pour essayer de retrouver la ligne
-                        search_direction = 'slight_left' if self.lost_line_count % 2 == 1 else 'slight_right'
-                        self.steer_wheels(search_direction)
-                        self.move_motor(forward=True, speed_name='search')
-                        time.sleep(0.3)  # Mouvement court de recherche
-                        self.stop_all_motors()
-                        time.sleep(0.1)
-                else:
-                    # Ligne detectee par IR (au moins un capteur), traitement normal
-                    if self.lost_line_count > 0:
-                        print(f"Ligne retrouvee par capteurs IR: {sensor_pattern}")
-                        self.lost_line_count = 0
-                    
-                    self.stats['ir_detections'] += 1
-                    # DEBUG: Afficher l'action pour comprendre le comportement
-                    if self.stats['ir_detections'] % 50 == 0:  # Tous les 50 dtections
-                        print(f"DEBUG: Capteurs {sensor_pattern} -> Action: {action}")
-                    
-                    self.handle_ir_action(action)
-                
-                time.sleep(0.02)  # Frquence de 50Hz
-                
-            except Exception as e:
-                print(f"Erreur dans la boucle principale: {e}")
-                break
+        # Direction PID : dtection de ligne camra active pendant le suivi
+        if self.steering_mode == 'pid':
+            self.steering.reset()
+            self.line_error.reset()
+            self.camera.show_line_detection = True
+        
+        # Boucle  100 Hz jusqu' stop()
+        self.control_loop.run(condition=lambda: self.running)
         
         # Nettoyage final
         print("Nettoyage final...")
@@ -678,7 +715,10 @@ class LineFollowerImproved:
             'lost_count': self.lost_line_count,
             'stats': self.stats.copy(),
             'last_wheel_angle': self.last_wheel_angle,
-            'camera_available': self.camera is not None
+            'camera_available': self.camera is not None,
+            'steering_mode': self.steering_mode,
+            'steering': self.steering.get_status(),
+            'control_loop': self.control_loop.get_status()
         }
 
 # Instance globale qui sera initialise dans webserver.py
@@ -3,29 +3,20 @@
 
 import time
 import threading
-from gpiozero import InputDevice
+from ir_sensors import get_ir_sensors
 from motor import Motor, motorStop
 from servo_controller_improved import servo_controller
-from camera import PiCameraStream
+from hardware import create_camera
+from ir_state_machine import IRStateMachine, FOLLOWER_TABLE
 import cv2
 import numpy as np
 
 class LineFollowerCamera:
-    ACTION_MAP = {
-        (0,0,0): "lost",
-        (1,1,1): "forward", (0,1,0): "forward",
-        (1,1,0): "slight_right", (0,1,1): "slight_left",
-        (1,0,0): "turn_right",  (0,0,1): "turn_left",
-        (1,0,1): "forward"
-    }
+    IR_PINS = (17, 27, 22)  # Pins des capteurs 'left', 'middle', 'right'
 
     def __init__(self):
-        # capteurs IR
-        self.sensors = {
-            'left':   InputDevice(17),
-            'middle': InputDevice(27),
-            'right':  InputDevice(22),
-        }
+        # capteurs IR (service partag, callbacks de front)
+        self.ir_sensors = get_ir_sensors()
         # vitesses
         self.v_norm    = 20
         self.v_turn    = 18
@@ -40,8 +31,17 @@ class LineFollowerCamera:
         }
         self.last_angle = self.angles['center']
 
+        # dcision IR partage (ir_state_machine) : slight = left/right, turn = sharp
+        self.state_machine = IRStateMachine(
+            FOLLOWER_TABLE,
+            angles={'center': self.angles['center'],
+                    'slight_left': self.angles['left'], 'slight_right': self.angles['right'],
+                    'turn_left': self.angles['sharp_left'], 'turn_right': self.angles['sharp_right']},
+            speeds={'normal': self.v_norm, 'turn': self.v_turn},
+            name="line_tracking")
+
         # camra
-        self.camera = PiCameraStream()
+        self.camera = create_camera()
         self.head_down_angle = 60  
         self.head_up_angle   = 90  
 
@@ -50,15 +50,17 @@ class LineFollowerCamera:
         self.thread  = None
 
     def read_sensors(self):
-        return tuple(int(self.sensors[k].value) for k in ('left','middle','right'))
+        return self.ir_sensors.read(self.IR_PINS)
 
     def decide(self, pattern):
-        return self.ACTION_MAP.get(pattern, 'stop')
+        return self.state_machine.decide(pattern)
 
     def steer(self, name):
-        servo_controller.move_to_angle(0, self.angles[name], blocking=False)
-        self.last_angle = self.angles[name]
-        time.sleep(0.03)
+        self.steer_to(self.angles[name])
+
+    def steer_to(self, angle):
+        servo_controller.move_to_angle(0, angle, blocking=False)
+        self.last_angle = angle
 
     def drive(self, forward, speed):
         Motor(1, 1 if forward else -1, speed)
@@ -113,21 +115,15 @@ class LineFollowerCamera:
 
     def _run_loop(self):
         while self.running:
+            _, _, seq = self.ir_sensors.get_pattern()
             pat    = self.read_sensors()
-            action = self.decide(pat)
-
-            if action == 'forward':
-                self.steer('center')
-                self.drive(True, self.v_norm)
+            decision = self.decide(pat)
 
-            elif action.endswith('left') or action.endswith('right'):
-                name = 'left' if 'left' in action else 'right'
-                if not action.startswith('slight'):
-                    name = 'sharp_' + name
-                self.steer(name)
-                self.drive(True, self.v_turn)
+            if decision.speed is not None:
+                self.steer_to(decision.angle)
+                self.drive(True, decision.speed)
 
-            elif action == 'lost':
+            elif decision.action == 'lost':
                 self.stop_motors()
                 print("Ligne IR perdue ? rcupration camra")
                 if not self.recover_with_camera():
@@ -137,7 +133,8 @@ class LineFollowerCamera:
             else:
                 self.stop_motors()
 
-            time.sleep(0.02)
+            # Rveil au prochain front des capteurs (0.1 s max pour surveiller running)
+            self.ir_sensors.wait_for_change(seq, timeout=0.1)
 
         # Fin de boucle, on stoppe moteurs
         self.stop_motors()
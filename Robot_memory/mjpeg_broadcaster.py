@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# mjpeg_broadcaster.py - Diffusion MJPEG unique pour tous les clients /video_feed
+import threading
+
+
+class MjpegBroadcaster:
+    """
+    Encode chaque frame camera une seule fois en JPEG et diffuse les memes
+    octets a tous les clients connectes.
+
+    Un thread d'encodage tourne tant qu'au moins un client est connecte.
+    Chaque client recoit toujours la derniere image disponible : un client
+    lent saute des images au lieu d'accumuler du retard. Un nouveau client
+    attend la prochaine image encodee : le JPEG en cache peut dater d'une
+    session precedente (encodage arrete faute de clients).
+    """
+
+    def __init__(self, camera, client_timeout=2.0):
+        self.camera = camera
+        self.client_timeout = client_timeout  # Attente max d'une image par client
+
+        self.condition = threading.Condition()
+        self.jpeg = None
+        self.seq = 0
+        self.clients = 0
+
+        self.thread = None
+        self.running = False
+
+        # Statistiques
+        self.stats = {
+            'frames_encoded': 0,
+            'frames_sent': 0,
+            'frames_skipped': 0
+        }
+
+    def _encode_loop(self):
+        """Boucle du thread d'encodage : une frame capturee = un encodage"""
+        last_seq = 0
+        while True:
+            # La decision d'arreter est prise sous verrou pour ne pas rater
+            # un client qui se connecte pendant l'arret du thread
+            with self.condition:
+                if self.clients == 0:
+                    self.running = False
+                    return
+
+            entry = self.camera.wait_for_frame(last_seq, timeout=1.0)
+            if entry is None:
+                continue
+            last_seq = entry[0]
+
+            try:
+                jpeg = self.camera.encode_frame(entry[2], entry[0])
+            except Exception as e:
+                print(f"Erreur encodage MJPEG: {e}")
+                continue
+
+            with self.condition:
+                self.jpeg = jpeg
+                self.seq += 1
+                self.stats['frames_encoded'] += 1
+                self.condition.notify_all()
+
+    def _add_client(self):
+        """Enregistre un client, demarre l'encodage si besoin, retourne la sequence courante"""
+        with self.condition:
+            self.clients += 1
+            if not self.running:
+                self.running = True
+                self.thread = threading.Thread(target=self._encode_loop, daemon=True)
+                self.thread.start()
+            return self.seq
+
+    def _remove_client(self):
+        """Retire un client (le thread d'encodage s'arrete quand il n'en reste plus)"""
+        with self.condition:
+            self.clients = max(0, self.clients - 1)
+
+    def stream(self):
+        """Generateur multipart/x-mixed-replace pour un client"""
+        last_seq = self._add_client()
+        try:
+            while True:
+                with self.condition:
+                    if not self.condition.wait_for(lambda: self.seq > last_seq,
+                                                   self.client_timeout):
+                        continue
+                    self.stats['frames_skipped'] += self.seq - last_seq - 1
+                    last_seq = self.seq
+                    jpeg = self.jpeg
+                    self.stats['frames_sent'] += 1
+
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+        finally:
+            self._remove_client()
+
+    def get_status(self):
+        """Retourne le statut de la diffusion"""
+        with self.condition:
+            return {
+                'clients': self.clients,
+                'running': self.running,
+                'stats': self.stats.copy()
+            }
@@ -3,11 +3,10 @@
 
 #!/usr/bin/env python3
 import time
-from board import SCL, SDA
-import busio
-from adafruit_pca9685 import PCA9685
-from adafruit_motor import motor
-import keyboard 
+from hardware import DCMotor, SLOW_DECAY
+from i2c_bus import get_bus, PRIORITY_STOP, PRIORITY_MOTOR
+from pca_output import get_output
+from motor_ramp import MotorRamp
 from servo_controller import *
 from ultrasound import * 
 from servo_reboot import * 
@@ -19,37 +18,67 @@ MOTOR_M1_IN2 = 14
 def map(x, in_min, in_max, out_min, out_max):
     return (x - in_min)/(in_max - in_min)*(out_max - out_min) + out_min
 
-i2c = busio.I2C(SCL, SDA)
-pwm_motor = PCA9685(i2c, address=0x5f)
-pwm_motor.frequency = 50
+# PCA9685 partage (0x5f) : les ecritures passent par l'etage de sortie
+# (regroupees par tick, rien si inchange) puis la file du bus, un arret
+# moteur passe devant tout le reste
+bus = get_bus()
+pwm_motor = bus.pca
+output = get_output()
 
-motor1 = motor.DCMotor(pwm_motor.channels[MOTOR_M1_IN1], pwm_motor.channels[MOTOR_M1_IN2])
-motor1.decay_mode = motor.SLOW_DECAY
+motor1 = DCMotor(output.channel(MOTOR_M1_IN1, PRIORITY_MOTOR),
+                output.channel(MOTOR_M1_IN2, PRIORITY_MOTOR))
+motor1.decay_mode = SLOW_DECAY
 
 
 init = 90
 
 
+# Dernier throttle commande (le getter de DCMotor le recalcule depuis les
+# rapports cycliques arrondis, il ne sert pas a la comparaison)
+last_throttle = None
+
+def _set_speed(speed):
+  # Vitesse signee en % (-100 a 100) -> throttle, appele par la rampe
+  global last_throttle
+  throttle = map(speed, -100, 100, -1.0, 1.0)
+  if throttle == last_throttle:
+    return  # Throttle inchange : aucune ecriture
+  last_throttle = throttle
+  # Les deux canaux du pont en H partent ensemble (lot du tick en cours
+  # s'il y en a un) ; un arret est envoye tout de suite
+  with output.batch(PRIORITY_STOP if speed == 0 else PRIORITY_MOTOR):
+    motor1.throttle = throttle
+    if speed == 0:
+      output.flush()
+
+# Rampe non bloquante : toutes les commandes du moteur 1 passent par elle
+motor_ramp = MotorRamp(_set_speed)
+
+
 def Motor(channel,direction,motor_speed):
   if motor_speed > 100:
     motor_speed = 100
   elif motor_speed < 0:
     motor_speed = 0
-  speed = map(motor_speed, 0, 100, 0, 1.0)
   if direction == -1:
-    speed = -speed
+    motor_speed = -motor_speed
 
   if channel == 1:
-    motor1.throttle = speed
+    # Commande directe : remplace la rampe en cours
+    motor_ramp.set_now(motor_speed)
     # print("1111")
 
 
 def motorStop():
-    motor1.throttle = 0
+    motor_ramp.set_now(0)
 
 def destroy():
+    global last_throttle
     motorStop()
-    pwm_motor.deinit()
+    motor_ramp.stop()
+    bus.execute(pwm_motor.deinit, priority=PRIORITY_STOP)
+    last_throttle = None
+    output.invalidate()
 
 # 1
 def motor_25():
@@ -76,13 +105,12 @@ def ramp(sens):
     motorStop()
 
 # 3
-def motor_drive(speed, sens, pente):
-    steps = 30
-    delay = pente / steps
-    for i in range(steps):
-      s = (i / steps) * speed 
-      Motor(1, sens, s)
-      time.sleep(delay)
+def motor_drive(speed, sens, pente, wait=False):
+    # Rejoint speed en pente secondes depuis la vitesse actuelle, sans
+    # bloquer (wait=True : attend la fin de la rampe)
+    motor_ramp.set_target(sens * max(0, min(100, speed)), duration=pente)
+    if wait:
+      motor_ramp.wait()
 #------
 # functions to move the robots and the head 
 # robots
@@ -135,6 +163,7 @@ def head_right():
     slow_angle(1, init_GD, init_GD - 30)
 # 4 
 def control():
+    import keyboard  # Seulement pour le pilotage clavier (droits root)
     reboot()
     init = 90
     init_GD = 90
@@ -144,12 +173,12 @@ def control():
         while True:
             
             if keyboard.is_pressed("z"):
-                motor_drive(25, 1, 1)
+                motor_drive(25, 1, 1, wait=True)
                 time.sleep(2)
                 motorStop()
                 
             elif keyboard.is_pressed("s"):
-                motor_drive(25, -1, 1)
+                motor_drive(25, -1, 1, wait=True)
                 time.sleep(2)
                 motorStop()
             elif keyboard.is_pressed("q"):
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+# motor_ramp.py - Rampe de vitesse moteur non bloquante sur son propre timer
+import math
+import threading
+import time
+
+
+class MotorRamp:
+    """
+    Moteur de rampe : l'appelant donne une vitesse cible et repart tout de
+    suite, un thread fait converger le throttle vers la cible a
+    acceleration limitee (en % de vitesse par seconde).
+
+    Vitesses signees en % : -100 (recul) a 100 (avance). La cible peut
+    etre changee en pleine rampe (on repart de la vitesse atteinte), la
+    rampe annulee (cancel : on garde la vitesse atteinte) ou court-
+    circuitee (set_now : vitesse appliquee immediatement, arret d'urgence
+    compris).
+
+    Toutes les ecritures passent par apply(vitesse) sous le verrou de la
+    rampe : une commande directe ne peut pas etre ecrasee par un pas de
+    rampe en retard. Au repos le thread dort sur la condition, il ne se
+    reveille qu'a la commande suivante.
+    """
+
+    def __init__(self, apply, accel=100.0, max_accel=250.0, rate=50.0, name="rampe"):
+        self.apply = apply
+        self.accel = accel          # Acceleration par defaut (%/s)
+        self.max_accel = max_accel  # Limite de toute commande (%/s)
+        self.period = 1.0 / rate
+        self.name = name
+
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread = None
+
+        self.current = 0.0          # Derniere vitesse appliquee
+        self.target = 0.0
+        self.ramp_accel = accel     # Acceleration de la rampe en cours
+        self.last_step = None
+
+        # Statistiques
+        self.stats = {
+            'commands': 0,
+            'retargets': 0,
+            'cancels': 0,
+            'immediate': 0,
+            'steps': 0,
+            'completed': 0,
+            'errors': 0
+        }
+
+    @staticmethod
+    def _clamp(speed):
+        return max(-100.0, min(100.0, float(speed)))
+
+    def _write(self, speed):
+        """Ecrit la vitesse (sous verrou)"""
+        try:
+            self.apply(speed)
+        except Exception as e:
+            print(f"Erreur {self.name}: {e}")
+            self.stats['errors'] += 1
+        self.current = speed
+
+    def set_target(self, speed, accel=None, duration=None):
+        """
+        Nouvelle vitesse cible, retourne immediatement.
+
+        accel : acceleration de cette rampe (%/s), par defaut self.accel ;
+        duration : rejoindre la cible en duration secondes depuis la
+        vitesse actuelle (remplace accel). Toujours limite a max_accel.
+        La meme cible renvoyee pendant sa rampe ne change rien.
+        """
+        speed = self._clamp(speed)
+        with self.condition:
+            if speed == self.target and self.target != self.current:
+                # Meme cible renvoyee en pleine rampe : on garde l'acceleration
+                # en cours (duration recalculee sur l'ecart restant ralentirait
+                # la rampe a chaque renvoi)
+                self.stats['commands'] += 1
+                return
+            delta = abs(speed - self.current)
+            if duration is not None:
+                accel = delta / duration if duration > 0 else self.max_accel
+            elif accel is None:
+                accel = self.accel
+            self.stats['commands'] += 1
+            if self.target != self.current and speed != self.target:
+                self.stats['retargets'] += 1
+            self.target = speed
+            self.ramp_accel = min(max(accel, 1e-6), self.max_accel)
+            if delta == 0:
+                self.stats['completed'] += 1
+            self.condition.notify_all()
+        self.start()
+
+    def set_now(self, speed):
+        """Vitesse appliquee tout de suite, la rampe en cours est abandonnee"""
+        speed = self._clamp(speed)
+        with self.condition:
+            self.stats['immediate'] += 1
+            self.target = speed
+            self.last_step = None
+            self._write(speed)
+            self.condition.notify_all()
+
+    def cancel(self):
+        """Abandonne la rampe en cours, garde la vitesse atteinte"""
+        with self.condition:
+            if self.target != self.current:
+                self.stats['cancels'] += 1
+                self.target = self.current
+            self.condition.notify_all()
+
+    def is_ramping(self):
+        with self.condition:
+            return self.target != self.current
+
+    def wait(self, timeout=None):
+        """Attend la fin de la rampe (scripts qui veulent l'ancien comportement bloquant)"""
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: self.target == self.current or not self.running, timeout)
+
+    def _step(self, now):
+        """Un pas de rampe vers la cible (sous verrou)"""
+        dt = self.period if self.last_step is None else now - self.last_step
+        self.last_step = now
+        delta = self.target - self.current
+        step = self.ramp_accel * dt
+        speed = self.target if abs(delta) <= step else self.current + math.copysign(step, delta)
+        self._write(speed)
+        self.stats['steps'] += 1
+        if speed == self.target:
+            self.stats['completed'] += 1
+            self.condition.notify_all()
+
+    def _run(self):
+        with self.condition:
+            while self.running:
+                if self.target == self.current:
+                    # Au repos : pas de reveil periodique
+                    self.last_step = None
+                    self.condition.wait()
+                    continue
+                self._step(time.monotonic())
+                if self.target != self.current:
+                    # Une nouvelle commande reveille avant la fin de la periode
+                    self.condition.wait(self.period)
+
+    def start(self):
+        """Lance le thread de rampe (appele automatiquement a la premiere cible)"""
+        with self.condition:
+            if self.running:
+                return False
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+            return True
+
+    def stop(self):
+        """Arrete le thread ; la vitesse atteinte n'est pas modifiee"""
+        with self.condition:
+            if not self.running:
+                return False
+            self.running = False
+            self.condition.notify_all()
+        if self.thread and self.thread.is_alive() and threading.current_thread() is not self.thread:
+            self.thread.join(timeout=1.0)
+        return True
+
+    def get_status(self):
+        """Retourne l'etat de la rampe et les statistiques"""
+        with self.condition:
+            return {
+                'name': self.name,
+                'running': self.running,
+                'current': self.current,
+                'target': self.target,
+                'ramping': self.target != self.current,
+                'accel': self.ramp_accel,
+                'stats': self.stats.copy()
+            }
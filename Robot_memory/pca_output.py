@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+# pca_output.py - Etage de sortie du PCA9685 : ecritures regroupees par tick
+import contextlib
+import struct
+import threading
+
+from i2c_bus import get_bus, PRIORITY_DEFAULT
+from robot_utils import shared_instance
+
+LED0_ON_L = 0x06      # Premier registre de canal (4 octets par canal : ON_L, ON_H, OFF_L, OFF_H)
+MODE1_AI = 0x20       # Auto-increment : un burst ecrit des canaux consecutifs
+
+
+def registers(duty):
+    """Rapport cyclique 16 bits -> (ON, OFF) 12 bits, comme adafruit_pca9685"""
+    if duty == 0xFFFF:
+        return 0x1000, 0      # Toujours allume
+    if duty < 0x0010:
+        return 0, 0x1000      # Toujours eteint
+    return 0, duty >> 4
+
+
+class OutputChannel:
+    """Canal PWM vu par adafruit_motor (DCMotor, Servo) : ecrit via l'etage de sortie"""
+
+    def __init__(self, output, index, priority=PRIORITY_DEFAULT):
+        self.output = output
+        self.index = index
+        self.priority = priority
+
+    @property
+    def frequency(self):
+        return self.output.frequency
+
+    @property
+    def duty_cycle(self):
+        return self.output.get_duty(self.index)
+
+    @duty_cycle.setter
+    def duty_cycle(self, value):
+        if not 0 <= value <= 0xFFFF:
+            raise ValueError("Out of range")
+        self.output.set_duty(self.index, value, self.priority)
+
+
+class PCA9685Output:
+    """
+    Etage de sortie du PCA9685 partage.
+
+    Garde une copie des rapports cycliques ecrits : une commande qui ne
+    change rien est abandonnee sans transaction. Dans un lot (batch(),
+    en general un tick de boucle de controle), les commandes du thread
+    sont retenues puis envoyees ensemble a la sortie du lot : les canaux
+    consecutifs modifies partent en un seul burst I2C (auto-increment),
+    soit une transaction pour direction + tete (canaux 0 a 2) et une pour
+    le moteur (canaux 14 et 15), a la priorite la plus haute du lot.
+    Hors lot, une commande part tout de suite (un canal).
+
+    coalesce=False : ancien comportement (une transaction par ecriture,
+    sans filtrage), pour comparer les compteurs.
+
+    Compteurs : commandes, ecritures abandonnees, transactions, canaux
+    ecrits, octets et temps de bus estime a i2c_clock (adresse + registre
+    + 4 octets par canal, 9 bits par octet, plus start / stop).
+    """
+
+    def __init__(self, pca, bus=None, coalesce=True, i2c_clock=100000):
+        self.pca = pca
+        self.bus = bus
+        self.coalesce = coalesce
+        self.i2c_clock = i2c_clock
+        self.frequency = self._execute(getattr, pca, 'frequency')
+
+        self.lock = threading.Lock()
+        self.shadow = {}                 # Canal -> dernier rapport cyclique ecrit
+        self._local = threading.local()  # Lot en cours, par thread
+
+        # Statistiques
+        self.stats = {
+            'commands': 0,
+            'dropped': 0,
+            'batches': 0,
+            'transactions': 0,
+            'channel_writes': 0,
+            'bytes': 0
+        }
+
+        # Les bursts supposent l'auto-increment (deja mis par adafruit_pca9685
+        # quand la frequence est reglee ; le PCA9685 simule n'a pas de registres)
+        if hasattr(pca, 'mode1_reg'):
+            self._execute(self._enable_auto_increment)
+
+    def _enable_auto_increment(self):
+        mode1 = self.pca.mode1_reg
+        if not mode1 & MODE1_AI:
+            self.pca.mode1_reg = mode1 | MODE1_AI
+
+    def _execute(self, func, *args, priority=PRIORITY_DEFAULT):
+        if self.bus is None:
+            return func(*args)
+        return self.bus.execute(func, *args, priority=priority, name="pca9685")
+
+    def channel(self, index, priority=PRIORITY_DEFAULT):
+        """Canal a passer a DCMotor / Servo a la place de pca.channels[index]"""
+        return OutputChannel(self, index, priority)
+
+    def _pending(self):
+        return getattr(self._local, 'pending', None)
+
+    def get_duty(self, channel):
+        """Rapport cyclique en attente dans le lot du thread, sinon le dernier ecrit"""
+        pending = self._pending()
+        if pending and channel in pending:
+            return pending[channel][0]
+        with self.lock:
+            return self.shadow.get(channel, 0)
+
+    def set_duty(self, channel, duty, priority=PRIORITY_DEFAULT):
+        """
+        Nouveau rapport cyclique. Retourne False si la commande ne change
+        rien (abandonnee), True si elle est ecrite ou retenue dans le lot.
+        """
+        if not self.coalesce:
+            with self.lock:
+                self.stats['commands'] += 1
+            self._write_runs([(channel, [duty])], priority)
+            return True
+
+        forced = getattr(self._local, 'priority', None)
+        if forced is not None:
+            priority = min(priority, forced)
+        pending = self._pending()
+        with self.lock:
+            self.stats['commands'] += 1
+            current = self.shadow.get(channel)
+            if pending is not None and channel in pending:
+                current = pending[channel][0]
+            if duty == current:
+                self.stats['dropped'] += 1
+                return False
+        if pending is not None:
+            previous = pending.get(channel)
+            if previous is not None:
+                priority = min(priority, previous[1])
+            pending[channel] = (duty, priority)
+            return True
+        self._write_runs([(channel, [duty])], priority)
+        return True
+
+    @contextlib.contextmanager
+    def batch(self, priority=None):
+        """
+        Lot d'ecritures du thread courant, envoye a la sortie (lots
+        imbriques : un seul envoi, a la sortie du lot exterieur).
+        priority : priorite minimale des ecritures faites dans le lot.
+        """
+        outer = self._pending() is not None
+        previous = getattr(self._local, 'priority', None)
+        if priority is not None:
+            self._local.priority = priority if previous is None else min(previous, priority)
+        if not outer:
+            self._local.pending = {}
+        try:
+            yield self
+        finally:
+            self._local.priority = previous
+            if not outer:
+                try:
+                    self.flush()
+                finally:
+                    self._local.pending = None
+
+    def flush(self):
+        """Envoie tout de suite les ecritures retenues dans le lot du thread"""
+        pending = self._pending()
+        if not pending:
+            return
+        with self.lock:
+            self.stats['batches'] += 1
+            changed = {channel: value for channel, value in pending.items()
+                       if self.shadow.get(channel) != value[0]}
+            self.stats['dropped'] += len(pending) - len(changed)
+        pending.clear()
+        if not changed:
+            return
+
+        # Canaux consecutifs -> un burst par suite
+        runs = []
+        for channel in sorted(changed):
+            duty = changed[channel][0]
+            if runs and runs[-1][0] + len(runs[-1][1]) == channel:
+                runs[-1][1].append(duty)
+            else:
+                runs.append((channel, [duty]))
+        self._write_runs(runs, min(priority for _, priority in changed.values()))
+
+    def _write_runs(self, runs, priority):
+        for start, duties in runs:
+            self._execute(self._write_run, start, duties, priority=priority)
+
+    def _write_run(self, start, duties):
+        """Transaction I2C : canaux start, start + 1... en un burst"""
+        device = getattr(self.pca, 'i2c_device', None)
+        if device is None:
+            # PCA9685 simule (ou sans acces registres) : canal par canal
+            for offset, duty in enumerate(duties):
+                self.pca.channels[start + offset].duty_cycle = duty
+        else:
+            buffer = bytearray(1 + 4 * len(duties))
+            buffer[0] = LED0_ON_L + 4 * start
+            for offset, duty in enumerate(duties):
+                struct.pack_into('<HH', buffer, 1 + 4 * offset, *registers(duty))
+            with device as i2c:
+                i2c.write(buffer)
+        with self.lock:
+            for offset, duty in enumerate(duties):
+                self.shadow[start + offset] = duty
+            self.stats['transactions'] += 1
+            self.stats['channel_writes'] += len(duties)
+            self.stats['bytes'] += 2 + 4 * len(duties)  # Adresse + registre + donnees
+
+    def invalidate(self, channels=None):
+        """Oublie les rapports ecrits (apres un deinit du PCA9685...)"""
+        with self.lock:
+            if channels is None:
+                self.shadow.clear()
+            else:
+                for channel in channels:
+                    self.shadow.pop(channel, None)
+
+    def reset_stats(self):
+        with self.lock:
+            for key in self.stats:
+                self.stats[key] = 0
+
+    def get_status(self):
+        """Compteurs d'ecriture et temps de bus estime (s)"""
+        with self.lock:
+            stats = self.stats.copy()
+        bits = stats['bytes'] * 9 + stats['transactions'] * 2  # Start et stop
+        return {
+            'coalesce': self.coalesce,
+            'i2c_clock': self.i2c_clock,
+            'bus_time': bits / self.i2c_clock,
+            'stats': stats
+        }
+
+
+# Sur le PCA9685 du gestionnaire de bus
+@shared_instance
+def get_output():
+    """Etage de sortie partage (cree au premier appel)"""
+    bus = get_bus()
+    return PCA9685Output(bus.pca, bus)
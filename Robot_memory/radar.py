@@ -1,40 +1,61 @@
 from servo_controller import *
-#from gpiozero import DistanceSensor
 from time import sleep
+from radar_scanner import get_radar
 """import matplotlib.pyplot as plt
 import numpy as np"""
-"""
-Tr = 23
-Ec = 24
-sensor = DistanceSensor(echo=Ec, trigger=Tr,max_distance=2) # Maximum detection distance 2m.
-"""
-# Get the distance of ultrasonic detection.
-def checkdist():
-    return (sensor.distance) *100 # Unit: cm
+
+# Balayage continu de la tete en tache de fond (aller-retour, 18 secteurs) :
+# la carte se lit sans attendre. Le balayage prend la tete (voie 1) : il
+# est lance et arrete par celui qui l'utilise (stopRobot, radar(), __main__)
+radar_scanner = get_radar()
+
 
 def servo_initialisation(angle):
     set_angle(2, 90)
     set_angle(1, angle)
 
+
+def carte_radar(max_age=None):
+    """
+    Carte des 18 secteurs (10 a 180 degres) du dernier balayage, sans
+    attendre (cm). None : secteur pas encore mesure, ou mesure plus
+    ancienne que max_age secondes.
+    Lecture seule : le balayage doit avoir ete lance (radar_scanner.start()).
+    """
+    scan = radar_scanner.get_scan()
+    return [None if d is None or (max_age is not None and age > max_age) else round(d / 10, 1)
+            for d, age in zip(scan['distances'], scan['ages'])]
+
+
+def balayage_complet():
+    """
+    Attend une carte complete. Si personne ne fait tourner le radar, un
+    balayage est lance le temps de la mesure puis arrete (tete liberee).
+    """
+    started = radar_scanner.start()
+    try:
+        radar_scanner.wait_complete(timeout=5)
+    finally:
+        if started:
+            radar_scanner.stop()
+
+
 def detection(angle):
-    if angle >= 10 or angle <= 180:
-        set_angle(1, angle)
-        sleep(0.1)
-        return round(checkdist(), 1)
+    """Distance du secteur angle dans le dernier balayage (attend le premier)"""
+    balayage_complet()
+    return carte_radar()[(angle//10)-1]
+
 
 if __name__ == "__main__":
-    angle = 100
-    servo_initialisation(angle)
     try:
-        detection_map = [0]*18
-        direction = 1
+        radar_scanner.start()
         while True:
-            # mise a jour de la map de detection
-            detection_map[(angle//10)-1] = detection(angle)
+            # carte publiee par le balayage continu (aller-retour)
+            detection_map = carte_radar()
             print("\n", detection_map)
 
-            """# affichage graphique
-            fig = plt.figure(figsize=(10, 10))
+            # affichage graphique
+            """fig = plt.figure(figsize=(10, 10))
             ax = fig.add_subplot(111, polar=True)
 
             N = len(detection_map)
@@ -47,19 +68,10 @@ if __name__ == "__main__":
             ax.yaxis.grid(True)
             plt.show()"""
 
-            # mise a jour du sens de direction
-            if angle >= 180 and direction == 1:
-                direction = 0
-            elif angle <= 10 and direction == 0:
-                direction = 1
-            
-            # mise a jour de l'angle
-            if direction:
-                angle += 10
-            else:
-                angle -= 10
+            sleep(0.5)
     except KeyboardInterrupt:
         print("\nArret")
     finally:
         print("Reinitialisation des servomoteurs")
-        servo_initialisation(100)
\ No newline at end of file
+        radar_scanner.stop()
+        servo_initialisation(100)
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+# radar_scanner.py - Balayage radar continu (tete + ultrason) en tache de fond
+import threading
+import time
+
+from servo_controller_improved import servo_controller
+from robot_utils import shared_instance
+from ultrasonic_sampler import get_ultrasonic
+
+ANGLES = tuple(range(10, 181, 10))  # 18 secteurs, secteur i = angle (i + 1) * 10
+
+
+class RadarScanner:
+    """
+    Radar : la tete (voie 1) balaie les secteurs en continu, aller puis
+    retour (les extremites ne sont pas mesurees deux fois de suite), et
+    chaque secteur garde sa derniere distance (mm) et son horodatage.
+
+    Les consommateurs lisent la carte publiee sans attendre : chaque
+    secteur a son age, le plus ancien a au plus un aller-retour.
+
+    Par secteur : la tete tourne, attente de stabilisation (settle), puis
+    samples mesures du service ultrason, filtre remis a zero (pas de
+    melange avec le secteur precedent, pas de saut pris pour un parasite).
+    Pendant le balayage, la tete appartient au radar : start() reserve la
+    voie aupres du controleur de servos (claim : mouvement en cours arrete,
+    positions du controleur tenues a jour, autres commandes refusees),
+    stop() la remet a rest_angle et la libere.
+    """
+
+    def __init__(self, sampler=None, controller=None, channel=1, angles=ANGLES, settle=0.05,
+                 samples=1, tilt_channel=2, tilt=90, rest_angle=90):
+        self.sampler = sampler or get_ultrasonic()
+        self.controller = controller or servo_controller
+        self.channel = channel
+        self.angles = tuple(angles)
+        self.settle = settle
+        self.samples = samples
+        self.tilt_channel = tilt_channel
+        self.tilt = tilt
+        self.rest_angle = rest_angle
+
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread = None
+        self.token = None  # Jeton de la voie reservee
+
+        self.distances = [None] * len(self.angles)   # Derniere distance par secteur (mm)
+        self.timestamps = [None] * len(self.angles)  # Horodatage de la mesure
+        self.direction = 1                           # 1 : angles croissants, -1 : retour
+        self.seq = 0                                 # Incremente a chaque secteur mesure
+        self.sweeps = 0                              # Allers et retours termines
+
+        # Statistiques
+        self.stats = {
+            'bins': 0,
+            'misses': 0,
+            'errors': 0
+        }
+
+    def _wait_stop(self, delay):
+        """Attend delay secondes, True si stop() a ete appele entre temps"""
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.running, delay)
+
+    def _measure(self, index):
+        """Un secteur : tete, stabilisation, mesure"""
+        self.controller.set_angle_direct(self.channel, self.angles[index], token=self.token)
+        if self._wait_stop(self.settle):
+            return
+        self.sampler.reset_filter()
+        reading = self.sampler.get_reading()
+        for _ in range(self.samples):
+            reading = self.sampler.wait_update(reading['seq'], timeout=3 * self.sampler.period)
+            if reading is None:
+                break
+        with self.condition:
+            if reading is None:
+                self.stats['misses'] += 1
+                return
+            self.distances[index] = reading['distance']
+            self.timestamps[index] = reading['timestamp']
+            self.seq += 1
+            self.stats['bins'] += 1
+            self.condition.notify_all()
+
+    def _run(self):
+        index = 0
+        while self.running:
+            try:
+                self._measure(index)
+            except Exception as e:
+                print(f"Erreur radar: {e}")
+                with self.condition:
+                    self.stats['errors'] += 1
+                if self._wait_stop(self.settle):
+                    break
+            with self.condition:
+                if not 0 <= index + self.direction < len(self.angles):
+                    self.direction = -self.direction
+                    self.sweeps += 1
+                index += self.direction
+
+    def start(self):
+        """Lance le balayage (la tete est prise par le radar)"""
+        with self.condition:
+            if self.running:
+                return False
+            self.token = self.controller.claim(self.channel,
+                                               (min(self.angles), max(self.angles)))
+            if self.token is None:
+                print(f"Radar: voie {self.channel} deja reservee")
+                return False
+            self.running = True
+        self.controller.set_angle_direct(self.tilt_channel, self.tilt)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self):
+        """Arrete le balayage et remet la tete au repos ; la carte reste lisible"""
+        with self.condition:
+            if not self.running:
+                return False
+            self.running = False
+            self.condition.notify_all()
+        if self.thread and self.thread.is_alive() and threading.current_thread() is not self.thread:
+            self.thread.join(timeout=2.0)
+        self.controller.set_angle_direct(self.channel, self.rest_angle, token=self.token)
+        self.controller.release(self.channel, self.token)
+        self.token = None
+        return True
+
+    def get_scan(self):
+        """
+        Derniere carte polaire, sans attendre : angles, distances (mm, None
+        si le secteur n'a pas encore ete mesure), horodatages et ages.
+        """
+        now = time.monotonic()
+        with self.condition:
+            measured = [t for t in self.timestamps if t is not None]
+            return {
+                'angles': self.angles,
+                'distances': list(self.distances),
+                'timestamps': list(self.timestamps),
+                'ages': [None if t is None else now - t for t in self.timestamps],
+                'timestamp': max(measured) if measured else None,
+                'complete': len(measured) == len(self.angles),
+                'direction': self.direction,
+                'sweeps': self.sweeps,
+                'seq': self.seq
+            }
+
+    def wait_complete(self, timeout=None):
+        """Attend que tous les secteurs aient une mesure (premier balayage)"""
+        with self.condition:
+            self.condition.wait_for(lambda: None not in self.timestamps or not self.running,
+                                    timeout)
+            return None not in self.timestamps
+
+    def get_status(self):
+        """Retourne la carte et les statistiques du balayage"""
+        scan = self.get_scan()
+        with self.condition:
+            return {
+                'running': self.running,
+                'settle': self.settle,
+                'scan': scan,
+                'stats': self.stats.copy()
+            }
+
+
+# Un seul balayage pour tous les consommateurs
+@shared_instance
+def get_radar():
+    """Radar partage (cree au premier appel, balayage lance par start())"""
+    return RadarScanner()
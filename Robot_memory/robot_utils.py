@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+# robot_utils.py - Petits outils communs aux services du robot
+import functools
+import threading
+
+
+def shared_instance(factory=None, *, valid=None):
+    """
+    Decorateur : la fabrique devient l'accesseur d'une instance partagee,
+    creee au premier appel (sous verrou). valid(instance) faux (service
+    ferme...) la fait recreer a l'appel suivant.
+    """
+    if factory is None:
+        return functools.partial(shared_instance, valid=valid)
+    lock = threading.Lock()
+    instance = None
+
+    @functools.wraps(factory)
+    def get():
+        nonlocal instance
+        with lock:
+            if instance is None or (valid is not None and not valid(instance)):
+                instance = factory()
+            return instance
+    return get
+
+
+def summary(values):
+    """Moyenne, p99 et max d'une serie de mesures (None si vide)"""
+    if not values:
+        return {'mean': None, 'p99': None, 'max': None}
+    values = sorted(values)
+    return {
+        'mean': sum(values) / len(values),
+        'p99': values[min(len(values) - 1, int(0.99 * len(values)))],
+        'max': values[-1]
+    }
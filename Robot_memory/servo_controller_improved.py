@@ -3,16 +3,31 @@
 
 import time
 import threading
-from board import SCL, SDA
-import busio
-from adafruit_motor import servo
-from adafruit_pca9685 import PCA9685
+from i2c_bus import get_bus
+from servo_driver import get_servo_driver
 
 class ServoController:
-    def __init__(self):
-        self.i2c = busio.I2C(SCL, SDA)
-        self.pca = PCA9685(self.i2c, address=0x5f)
-        self.pca.frequency = 50
+    """
+    Controleur des servos du PCA9685 avec un seul planificateur de
+    mouvement : un thread unique possede toutes les voies et rapproche
+    chaque servo actif de sa cible a chaque tick (vitesse en secondes par
+    degre, self.speeds).
+
+    Une nouvelle cible remplace l'ancienne sans join ni nouveau thread :
+    move_to_angle(blocking=False) ne fait que noter la cible (O(1)).
+    Au repos (aucune cible active) le thread dort sur la condition.
+
+    Une voie peut etre reservee par un proprietaire (radar...) : claim()
+    arrete son mouvement, move_to_angle la refuse et set_angle_direct ne
+    l'accepte qu'avec le jeton du proprietaire, jusqu'a release().
+    """
+
+    def __init__(self, tick=0.01):
+        # PCA9685 partage du gestionnaire de bus (0x5f, frequence reglee)
+        self.bus = get_bus()
+        self.i2c = self.bus.i2c
+        self.pca = self.bus.pca
+        self.driver = get_servo_driver()  # Voies en cache, tables angle -> rapport cyclique
         
         # Positions actuelles des servos
         self.current_positions = {
@@ -42,9 +57,31 @@ class ServoController:
             2: 0.010   # Tete haut-bas - moyen
         }
         
-        # Threads pour mouvements non-bloquants
-        self.movement_threads = {}
-        self.stop_flags = {}
+        # Les limites et positions par defaut doivent etre dans la table du driver
+        for servo_id, limit in self.limits.items():
+            self.driver.check_range(servo_id, limit['min'], limit['max'],
+                                    self.default_positions[servo_id])
+        
+        # Planificateur de mouvement : cibles actives, un seul thread
+        self.tick = tick                     # Periode du planificateur (s)
+        self.targets = {}                    # servo_id -> angle cible
+        self.claims = {}                     # servo_id -> (jeton, limites) du proprietaire
+        self.generations = dict.fromkeys(self.current_positions, 0)  # Invalide les pas en cours
+        self.condition = threading.Condition()
+        self.write_lock = threading.RLock()  # Une ecriture (ou un lot du planificateur) a la fois
+        self.running = False
+        self.thread = None
+        
+        # Statistiques
+        self.stats = {
+            'moves': 0,
+            'retargets': 0,
+            'completed': 0,
+            'ticks': 0,
+            'writes': 0,
+            'skipped': 0,
+            'errors': 0
+        }
         
         # Initialiser tous les servos a leur position par defaut
         self.initialize_servos()
@@ -55,83 +92,184 @@ class ServoController:
             self.set_angle_direct(servo_id, self.default_positions[servo_id])
             time.sleep(0.1)
     
-    def set_angle_direct(self, servo_id, angle):
-        """Definit directement l'angle d'un servo sans animation"""
+    def _clamp(self, servo_id, angle):
+        """Limite l'angle selon les contraintes du servo (ou du proprietaire de la voie)"""
+        claim = self.claims.get(servo_id)
+        if claim is not None and claim[1] is not None:
+            min_angle, max_angle = claim[1]
+        else:
+            min_angle = self.limits[servo_id]['min']
+            max_angle = self.limits[servo_id]['max']
+        return max(min_angle, min(max_angle, angle))
+    
+    def _write(self, servo_id, angle, generation=None):
+        """
+        Ecrit l'angle sur la voie. Un pas du planificateur (generation
+        donnee) est abandonne si la voie a ete recommandee entre-temps.
+        """
+        with self.write_lock:
+            if generation is not None and self.generations[servo_id] != generation:
+                return False
+            try:
+                written = self.driver.set_angle(servo_id, angle)
+                self.current_positions[servo_id] = angle
+                self.stats['writes' if written else 'skipped'] += 1
+                return True
+            except:
+                self.stats['errors'] += 1
+                return False
+    
+    def set_angle_direct(self, servo_id, angle, token=None):
+        """
+        Definit directement l'angle d'un servo sans animation (voie
+        reservee : seulement avec le jeton de claim())
+        """
         if servo_id not in self.current_positions:
             return False
         
-        # Limiter l'angle selon les contraintes
-        min_angle = self.limits[servo_id]['min']
-        max_angle = self.limits[servo_id]['max']
-        angle = max(min_angle, min(max_angle, angle))
-        
-        try:
-            servo_obj = servo.Servo(self.pca.channels[servo_id], 
-                                  min_pulse=500, max_pulse=2400, 
-                                  actuation_range=180)
-            servo_obj.angle = angle
-            self.current_positions[servo_id] = angle
-            return True
-        except:
-            return False
+        with self.condition:
+            claim = self.claims.get(servo_id)
+            if claim is not None and claim[0] is not token:
+                return False
+            angle = self._clamp(servo_id, angle)
+            # Annule le mouvement en cours sur cette voie
+            self.targets.pop(servo_id, None)
+            self.generations[servo_id] += 1
+            self.condition.notify_all()
+        return self._write(servo_id, angle)
     
     def move_to_angle(self, servo_id, target_angle, blocking=True):
         """Deplace un servo vers un angle avec animation fluide"""
         if servo_id not in self.current_positions:
             return False
         
-        # Arreter le mouvement precedent s'il existe
-        self.stop_movement(servo_id)
-        
-        if blocking:
-            return self._smooth_move(servo_id, target_angle)
-        else:
-            # Mouvement non-bloquant dans un thread
-            self.stop_flags[servo_id] = False
-            thread = threading.Thread(target=self._smooth_move, 
-                                    args=(servo_id, target_angle))
-            thread.daemon = True
-            thread.start()
-            self.movement_threads[servo_id] = thread
-            return True
-    
-    def _smooth_move(self, servo_id, target_angle):
-        """Mouvement fluide d'un servo"""
-        # Limiter l'angle
-        min_angle = self.limits[servo_id]['min']
-        max_angle = self.limits[servo_id]['max']
-        target_angle = max(min_angle, min(max_angle, target_angle))
-        
-        current = self.current_positions[servo_id]
-        speed = self.speeds[servo_id]
-        
-        if target_angle > current:
-            # Mouvement vers le haut
-            for angle in range(int(current), int(target_angle) + 1):
-                if self.stop_flags.get(servo_id, False):
-                    break
-                self.set_angle_direct(servo_id, angle)
-                time.sleep(speed)
-        else:
-            # Mouvement vers le bas
-            for angle in range(int(current), int(target_angle) - 1, -1):
-                if self.stop_flags.get(servo_id, False):
-                    break
-                self.set_angle_direct(servo_id, angle)
-                time.sleep(speed)
-        
+        target_angle = self._clamp(servo_id, target_angle)
+        with self.condition:
+            if servo_id in self.claims:
+                return False  # Voie reservee (radar...)
+            previous = self.targets.get(servo_id)
+            if previous == target_angle:
+                pass  # Deja en route vers cette cible
+            elif previous is None and self.current_positions[servo_id] == target_angle:
+                return True  # Deja en position
+            else:
+                if previous is not None:
+                    self.stats['retargets'] += 1
+                self.stats['moves'] += 1
+                self.targets[servo_id] = target_angle
+                self.condition.notify_all()
+            
+            if not self.running:
+                self._start()
+            if blocking:
+                # Fin du mouvement, ou cible remplacee par un autre appelant
+                self.condition.wait_for(
+                    lambda: self.targets.get(servo_id) != target_angle or not self.running)
         return True
     
+    def _plan(self, dt):
+        """
+        Pas de chaque servo actif vers sa cible (sous verrou), retourne les
+        ecritures. La cible atteinte reste active jusqu'a son ecriture
+        (_complete) : un move_to_angle bloquant ne rend la main qu'une fois
+        le servo a sa position finale.
+        """
+        writes = []
+        for servo_id, target in self.targets.items():
+            current = self.current_positions[servo_id]
+            step = dt / self.speeds[servo_id]
+            final = abs(target - current) <= step
+            if final:
+                angle = target
+            else:
+                angle = current + step if target > current else current - step
+            writes.append((servo_id, angle, self.generations[servo_id], final))
+        return writes
+    
+    def _complete(self, writes):
+        """Retire les cibles dont le dernier pas est ecrit (sous verrou)"""
+        for servo_id, angle, generation, final in writes:
+            # Cible remplacee ou mouvement annule entre-temps : rien a retirer
+            if (final and self.targets.get(servo_id) == angle
+                    and self.generations[servo_id] == generation):
+                del self.targets[servo_id]
+                self.stats['completed'] += 1
+    
+    def _run(self):
+        """Thread planificateur : un tick a periode fixe tant qu'un servo bouge"""
+        last = None
+        while True:
+            with self.condition:
+                while self.running and not self.targets:
+                    last = None
+                    self.condition.wait()
+                if not self.running:
+                    return
+                now = time.monotonic()
+                if last is None or now <= last:
+                    dt = self.tick  # Premier pas, ou horloge figee (horloge virtuelle de track_sim)
+                else:
+                    dt = min(now - last, 5 * self.tick)
+                last = now
+                writes = self._plan(dt)
+                self.stats['ticks'] += 1
+            
+            # Ecritures I2C hors du verrou : move_to_angle ne bloque jamais.
+            # Tous les servos du tick partent en un seul burst
+            with self.write_lock, self.driver.output.batch():
+                for servo_id, angle, generation, final in writes:
+                    self._write(servo_id, angle, generation)
+            
+            with self.condition:
+                self._complete(writes)
+                self.condition.notify_all()  # Reveille les mouvements bloquants termines
+            time.sleep(max(0.0, last + self.tick - time.monotonic()))
+    
+    def _start(self):
+        """Lance le planificateur (sous verrou)"""
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
     def stop_movement(self, servo_id):
-        """Arrete le mouvement d'un servo"""
-        if servo_id in self.stop_flags:
-            self.stop_flags[servo_id] = True
-        
-        if servo_id in self.movement_threads:
-            thread = self.movement_threads[servo_id]
-            if thread.is_alive():
-                thread.join(timeout=1.0)
-            del self.movement_threads[servo_id]
+        """Arrete le mouvement d'un servo (il reste a la position atteinte)"""
+        with self.condition:
+            if self.targets.pop(servo_id, None) is not None:
+                self.generations[servo_id] += 1
+                self.condition.notify_all()
+    
+    def claim(self, servo_id, limits=None):
+        """
+        Reserve une voie : son mouvement est arrete, les autres appelants
+        sont refuses jusqu'a release(). limits (min, max) remplace les
+        limites de la voie pour le proprietaire. Retourne le jeton a passer
+        a set_angle_direct, ou None si la voie est deja reservee.
+        """
+        if limits is not None:
+            self.driver.check_range(servo_id, *limits)
+        with self.condition:
+            if servo_id in self.claims:
+                return None
+            token = object()
+            self.claims[servo_id] = (token, limits)
+            if self.targets.pop(servo_id, None) is not None:
+                self.generations[servo_id] += 1
+            self.condition.notify_all()  # Reveille les mouvements bloquants annules
+            return token
+    
+    def release(self, servo_id, token):
+        """Libere une voie reservee par claim()"""
+        with self.condition:
+            claim = self.claims.get(servo_id)
+            if claim is None or claim[0] is not token:
+                return False
+            del self.claims[servo_id]
+            return True
+    
+    def is_moving(self, servo_id):
+        """Vrai si le servo a une cible en cours"""
+        with self.condition:
+            return servo_id in self.targets
     
     def return_to_center(self, servo_id, blocking=False):
         """Retourne un servo a sa position centrale"""
@@ -147,18 +285,38 @@ class ServoController:
         if servo_id in self.speeds:
             self.speeds[servo_id] = max(0.001, min(0.1, speed))
     
+    def get_status(self):
+        """Retourne les positions, les cibles actives et les statistiques"""
+        with self.condition:
+            return {
+                'running': self.running,
+                'positions': dict(self.current_positions),
+                'targets': dict(self.targets),
+                'claimed': list(self.claims),
+                'tick': self.tick,
+                'stats': self.stats.copy()
+            }
+    
     def cleanup(self):
         """Nettoie les ressources"""
         # Arreter tous les mouvements
-        for servo_id in list(self.movement_threads.keys()):
+        for servo_id in list(self.targets.keys()):
             self.stop_movement(servo_id)
         
         # Retourner tous les servos au centre
         for servo_id in self.current_positions:
             self.return_to_center(servo_id, blocking=True)
         
+        # Arreter le planificateur
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=1.0)
+        
         time.sleep(0.5)
-        self.pca.deinit()
+        self.bus.execute(self.pca.deinit)
+        self.driver.invalidate()
 
 # Instance globale pour utilisation dans d'autres modules
 servo_controller = ServoController()
\ No newline at end of file
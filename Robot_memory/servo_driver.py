@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# servo_driver.py - Voies servo en cache et tables angle -> rapport cyclique
+import threading
+
+import hardware
+from i2c_bus import servo_priority
+from pca_output import PCA9685Output, get_output
+from robot_utils import shared_instance
+
+# Calibration par voie : (impulsion min (us), impulsion max (us), course (degres))
+CALIBRATION = {
+    0: (500, 2400, 180),  # Direction roues
+    1: (500, 2400, 180),  # Tete gauche-droite
+    2: (500, 2400, 180)   # Tete haut-bas
+}
+
+
+class ServoDriver:
+    """
+    Couche d'ecriture des servos du PCA9685.
+
+    Une voie gardee par servo (plus d'objet Servo cree a chaque
+    commande) et une table precalculee angle -> rapport cyclique par voie,
+    sur toute la course calibree, au pas de resolution degre : une
+    commande = un acces de table. Les ecritures passent par l'etage de
+    sortie du PCA9685 (pca_output) : pas d'ecriture I2C si le rapport
+    cyclique ne change pas (commande comptee comme sautee), regroupement
+    dans un lot (tick) avec les autres canaux.
+
+    Meme calcul que adafruit_motor.servo (rapport cyclique identique aux
+    angles multiples de la resolution). La frequence du PCA9685 n'est lue
+    qu'une fois, par l'etage de sortie.
+    """
+
+    def __init__(self, pca, bus=None, calibration=CALIBRATION, resolution=0.1, output=None):
+        self.pca = pca
+        self.output = output or PCA9685Output(pca, bus)
+        self.frequency = self.output.frequency
+        self.resolution = resolution
+
+        self.lock = threading.Lock()
+        self.channels = {}     # Voie -> canal de l'etage de sortie
+        self.ranges = {}       # Voie -> course (degres)
+        self.tables = {}       # Voie -> rapports cycliques, un par pas de resolution
+        self.angles = {}       # Dernier angle commande par voie
+
+        # Statistiques
+        self.stats = {
+            'commands': 0,
+            'writes': 0,
+            'skipped': 0
+        }
+
+        for channel, (min_pulse, max_pulse, actuation_range) in calibration.items():
+            self.add_channel(channel, min_pulse, max_pulse, actuation_range)
+
+    def add_channel(self, channel, min_pulse=500, max_pulse=2400, actuation_range=180):
+        """Garde la voie et precalcule sa table sur toute la course"""
+        min_duty = int((min_pulse * self.frequency) / 1000000 * 0xFFFF)
+        max_duty = (max_pulse * self.frequency) / 1000000 * 0xFFFF
+        duty_range = int(max_duty - min_duty)
+        steps = int(round(actuation_range / self.resolution))
+        with self.lock:
+            self.channels[channel] = self.output.channel(channel, servo_priority(channel))
+            self.ranges[channel] = actuation_range
+            self.tables[channel] = tuple(min_duty + int(i / steps * duty_range)
+                                         for i in range(steps + 1))
+
+    def check_range(self, channel, *angles):
+        """ValueError si un angle (limites, positions par defaut...) sort de la table"""
+        if channel not in self.tables:
+            raise ValueError(f"Voie servo {channel} non calibree")
+        for angle in angles:
+            if not 0 <= angle <= self.ranges[channel]:
+                raise ValueError(f"Voie servo {channel} : {angle} hors course "
+                                 f"(0 a {self.ranges[channel]})")
+
+    def duty(self, channel, angle):
+        """Rapport cyclique d'un angle (borne a la course de la voie)"""
+        table = self.tables[channel]
+        index = int(angle / self.resolution + 0.5)
+        return table[max(0, min(len(table) - 1, index))]
+
+    def set_angle(self, channel, angle, priority=None):
+        """
+        Commande un servo. Retourne True si le rapport cyclique est ecrit
+        (ou retenu dans le lot en cours), False si la voie y etait deja.
+        """
+        duty = self.duty(channel, angle)
+        if priority is None:
+            priority = self.channels[channel].priority
+        written = self.output.set_duty(channel, duty, priority)
+        with self.lock:
+            self.stats['commands'] += 1
+            self.stats['writes' if written else 'skipped'] += 1
+            self.angles[channel] = angle
+        if written and hardware.SIMULATED:
+            hardware.sim.record('angles', channel, angle)
+        return written
+
+    def invalidate(self, channel=None):
+        """Oublie le dernier rapport ecrit (apres un deinit du PCA9685...)"""
+        self.output.invalidate(None if channel is None else (channel,))
+
+    def get_status(self):
+        """Retourne les derniers angles et les statistiques d'ecriture"""
+        with self.lock:
+            return {
+                'frequency': self.frequency,
+                'resolution': self.resolution,
+                'angles': dict(self.angles),
+                'stats': self.stats.copy()
+            }
+
+
+# Sur l'etage de sortie du PCA9685 partage
+@shared_instance
+def get_servo_driver():
+    """Driver servo partage (cree au premier appel)"""
+    output = get_output()
+    return ServoDriver(output.pca, output=output)
@@ -8,23 +8,19 @@
 # sudo pip3 install adafruit-circuitpython-pca9685
 '''
 import time
-from board import SCL, SDA
-import busio
-from adafruit_motor import servo
-from adafruit_pca9685 import PCA9685
+from i2c_bus import get_bus
+from servo_driver import get_servo_driver
 
-i2c = busio.I2C(SCL, SDA)
-# Create a simple PCA9685 class instance.
-pca = PCA9685(i2c, address=0x5f) #default 0x40
-
-pca.frequency = 50
+# PCA9685 partage (0x5f) du gestionnaire de bus
+bus = get_bus()
+pca = bus.pca
+driver = get_servo_driver()
 
 # The pulse range is 750 - 2250 by default. This range typically gives 135 degrees of
 # range, but the default is to use 180 degrees. You can specify the expected range if you wish:
 # servo7 = servo.Servo(pca.channels[7], actuation_range=135)
 def set_angle(ID):
-    servo_angle = servo.Servo(pca.channels[ID], min_pulse=500, max_pulse=2400,actuation_range=180)
-    servo_angle.angle = 90
+    driver.set_angle(ID, 90)
 
 
 def reboot():
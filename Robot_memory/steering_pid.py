@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+# steering_pid.py - Direction continue par PID sur l'ecart a la ligne
+"""
+Remplace les angles fixes (ANGLE_LEFT, ANGLE_SHARP_LEFT...) par un angle
+de servo continu calcule a chaque tick :
+
+    ecart a la ligne (IR ou camera) -> PID -> angle du servo 0
+
+Convention commune : ecart en [-1, 1] (au-dela si ligne perdue), negatif
+quand la ligne est a gauche du robot, positif a droite ; comme pour
+LineDetector, une ligne a gauche donne un angle > 90.
+"""
+import collections
+import time
+
+
+class PIDController:
+    """
+    PID discret sur une erreur (consigne 0).
+
+    - anti-windup : integrale bornee (integral_limit) et gelee tant que la
+      sortie est saturee dans le sens de l'erreur
+    - derivee filtree passe-bas du premier ordre (constante derivative_tau)
+      : les sauts de l'erreur IR (valeurs discretes) ne donnent pas de pic
+    - sortie limitee a output_limits et en vitesse de variation
+      (rate_limit unites par seconde)
+    """
+
+    def __init__(self, kp, ki=0.0, kd=0.0, output_limits=(-1.0, 1.0), integral_limit=None,
+                 derivative_tau=0.05, rate_limit=None):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.output_limits = output_limits
+        self.integral_limit = integral_limit
+        self.derivative_tau = derivative_tau
+        self.rate_limit = rate_limit
+
+        # Statistiques
+        self.stats = {
+            'updates': 0,
+            'saturated': 0,
+            'rate_limited': 0
+        }
+        self.reset()
+
+    def reset(self):
+        """Oublie l'integrale, la derivee et la derniere sortie"""
+        self.integral = 0.0
+        self.derivative = 0.0
+        self.last_error = None
+        self.last_time = None
+        self.output = 0.0
+
+    def update(self, error, now=None):
+        """Nouvelle erreur mesuree, retourne la commande"""
+        now = time.monotonic() if now is None else now
+        dt = 0.0 if self.last_time is None else now - self.last_time
+        if self.last_time is not None and dt <= 0:
+            return self.output
+
+        # Derivee de l'erreur, filtree
+        if dt > 0:
+            raw = (error - self.last_error) / dt
+            self.derivative += dt / (self.derivative_tau + dt) * (raw - self.derivative)
+
+        integral = self.integral + error * dt
+        if self.integral_limit is not None:
+            integral = max(-self.integral_limit, min(self.integral_limit, integral))
+
+        low, high = self.output_limits
+        command = self.kp * error + self.ki * integral + self.kd * self.derivative
+        output = max(low, min(high, command))
+        if output != command:
+            self.stats['saturated'] += 1
+        # Anti-windup : on n'integre pas si la sortie sature dans le sens de l'erreur
+        if output == command or (command > high) != (error > 0):
+            self.integral = integral
+
+        # Limitation de la vitesse de variation
+        if self.rate_limit is not None and self.last_time is not None:
+            step = self.rate_limit * dt
+            limited = max(self.output - step, min(self.output + step, output))
+            if limited != output:
+                self.stats['rate_limited'] += 1
+                output = limited
+
+        self.last_error = error
+        self.last_time = now
+        self.output = output
+        self.stats['updates'] += 1
+        return output
+
+    def get_status(self):
+        """Etat interne et statistiques"""
+        return {
+            'gains': (self.kp, self.ki, self.kd),
+            'integral': self.integral,
+            'derivative': self.derivative,
+            'output': self.output,
+            'stats': self.stats.copy()
+        }
+
+
+class IRLineError:
+    """
+    Ecart a la ligne estime par les trois capteurs IR, donnes dans l'ordre
+    physique (gauche, milieu, droite) : moyenne des poids des capteurs sur
+    la ligne (-1, 0, 1 par defaut), soit -1, -0.5, 0, 0.5 ou 1.
+
+    L'historique leve les ambiguites : motif 1,0,1 (croisement) = dernier
+    ecart ; ligne perdue = ligne sortie du cote du dernier ecart non nul,
+    au-dela du capteur exterieur (lost_error).
+    """
+
+    def __init__(self, weights=(-1.0, 0.0, 1.0), lost_error=1.5, history=100):
+        self.weights = weights
+        self.lost_error = lost_error
+        self.error = 0.0
+        self.side = 0.0   # Cote de la ligne au dernier ecart non nul
+        self.lost = False
+        self.history = collections.deque(maxlen=history)  # (monotonic, ecart)
+
+    def reset(self):
+        self.error = 0.0
+        self.side = 0.0
+        self.lost = False
+        self.history.clear()
+
+    def update(self, values, now=None):
+        """Valeurs (gauche, milieu, droite), retourne l'ecart"""
+        active = [w for w, v in zip(self.weights, values) if v]
+        self.lost = not active
+        if self.lost:
+            self.error = self.side * self.lost_error
+        elif values[0] and values[2] and not values[1]:
+            pass  # Ambigu : on garde le dernier ecart
+        else:
+            self.error = sum(active) / len(active)
+            if self.error:
+                self.side = 1.0 if self.error > 0 else -1.0
+        self.history.append((time.monotonic() if now is None else now, self.error))
+        return self.error
+
+
+def camera_line_error(result, min_confidence=0.3, lookahead=0.5):
+    """
+    Ecart a la ligne d'un resultat de LineDetector : decalage en bas de
+    l'image plus lookahead fois le cap (anticipe les virages).
+    None si pas de ligne ou confiance insuffisante.
+    """
+    if not result or result.get('offset') is None:
+        return None
+    if result.get('confidence', 0.0) < min_confidence:
+        return None
+    return result['offset'] + lookahead * (result.get('heading') or 0.0)
+
+
+class SteeringController:
+    """
+    PID d'ecart -> angle du servo de direction, envoye a chaque tick.
+    La commande n'est renvoyee que si l'angle change d'au moins min_step
+    degres (pas d'ecriture I2C pour rien a 100 Hz).
+    """
+
+    def __init__(self, pid=None, center=90, max_angle=40, channel=0, min_step=1.0,
+                 actuator=None):
+        self.pid = pid or PIDController(kp=0.8, ki=0.3, kd=0.06, integral_limit=0.5,
+                                        derivative_tau=0.03, rate_limit=8.0)
+        self.center = center
+        self.max_angle = max_angle  # Braquage a sortie 1 (degres de servo)
+        self.channel = channel
+        self.min_step = min_step
+        if actuator is None:
+            from servo_controller import set_angle as actuator
+        self.actuator = actuator
+        self.angle = None
+
+    def reset(self):
+        self.pid.reset()
+        self.angle = None
+
+    def update(self, error, now=None):
+        """Nouvel ecart, commande le servo et retourne l'angle"""
+        output = self.pid.update(error, now)
+        angle = self.center - self.max_angle * output
+        if self.angle is None or abs(angle - self.angle) >= self.min_step:
+            self.actuator(self.channel, angle)
+            self.angle = angle
+        return angle
+
+    def get_status(self):
+        return {
+            'angle': self.angle,
+            'pid': self.pid.get_status()
+        }
@@ -0,0 +1,564 @@
+# -*- coding: utf-8 -*-
+# track_sim.py - Simulateur 2D de piste pour regler les suiveurs de ligne
+"""
+Simulateur cinematique (modele bicyclette) du robot sur une piste en
+image, branche sur les peripheriques simules de hardware.py.
+
+Le throttle commande par Motor() et l'angle du servo de direction (canal
+0) pilotent le modele ; les trois capteurs IR sont synthetises a leur
+position sous le robot. Une horloge virtuelle remplace time.sleep /
+time.time dans les modules du controleur : un sleep(0.5) fait avancer la
+simulation de 0.5 s sans attendre, et chaque lecture de capteur coute
+read_cost secondes de temps simule (boucles sans sleep).
+
+Mesures par tour : temps au tour, pertes de ligne (passage a 0,0,0),
+ecart lateral (cross-track error) RMS et max.
+
+    python track_sim.py --controller challenge2 --laps 50
+    python track_sim.py --controller improved --track piste.png --scale 0.002 \\
+        --start 1.2 0.2 0
+
+La piste est une image en niveaux de gris : ligne sombre sur fond clair.
+"""
+import argparse
+import contextlib
+import math
+import os
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+os.environ.setdefault("ROBOT_HARDWARE", "sim")
+import hardware  # noqa: E402
+
+# Brochage des capteurs IR (voir challenge2.py : gauche=22, milieu=27, droite=17)
+IR_PINS = {'left': 22, 'middle': 27, 'right': 17}
+MOTOR_CHANNELS = (15, 14)  # MOTOR_M1_IN1, MOTOR_M1_IN2 (motor.py)
+STEERING_CHANNEL = 0
+
+# Modules du flux camera : gardent le temps reel
+REAL_TIME_MODULES = {'camera', 'frame_replay', 'detector_scheduler', 'vision_worker',
+                     'mjpeg_broadcaster', 'arrow_voting'}
+
+
+class SimulationDone(BaseException):
+    """Fin de simulation levee dans la boucle du controleur (comme KeyboardInterrupt)"""
+
+
+class VirtualClock:
+    """
+    Horloge simulee. Seul le thread du controleur fait avancer le temps.
+    Dans les autres threads (planificateur des servos...), sleep() attend
+    que le temps simule ait avance d'autant : ces threads tournent a leur
+    cadence en temps simule au lieu de boucler a vide. Un sleep() du
+    controleur avance par etapes jusqu'a chaque echeance et laisse les
+    threads reveilles faire leur pas avant de continuer.
+
+    Une attente hors controleur dure au plus max_block secondes reelles :
+    si le controleur attend lui-meme ce thread (mouvement bloquant), le
+    temps simule ne peut pas avancer et l'attente ne doit pas le bloquer.
+
+    Les petites avances (lectures de capteurs) sont cumulees et ne sont
+    transmises a on_advance qu'une fois resolution atteinte, ou au
+    prochain sleep().
+    """
+
+    def __init__(self, on_advance=None, resolution=0.002, max_block=0.002):
+        self.now = 0.0
+        self.pending = 0.0
+        self.epoch = time.time()
+        self.on_advance = on_advance  # Appelee avec la duree ecoulee
+        self.resolution = resolution
+        self.max_block = max_block
+        self.owner = None             # Thread du controleur
+        self.condition = threading.Condition()
+        self.sleepers = {}            # Thread -> echeance, hors controleur
+        self.woken = set()            # Threads reveilles pas encore rendormis
+
+    def advance(self, dt, flush=True):
+        if dt <= 0 or threading.current_thread() is not self.owner:
+            return
+        self.now += dt
+        self.pending += dt
+        if self.on_advance and (flush or self.pending >= self.resolution):
+            pending, self.pending = self.pending, 0.0
+            self.on_advance(pending)
+        if self.sleepers and self.now >= self._next_wake():
+            with self.condition:
+                self._wake()
+
+    def _next_wake(self):
+        """Plus proche echeance d'un sleep hors controleur"""
+        with self.condition:
+            return min(self.sleepers.values(), default=math.inf)
+
+    def _wake(self):
+        """Reveille les threads arrives a echeance (sous verrou)"""
+        for thread, deadline in list(self.sleepers.items()):
+            if self.now >= deadline:
+                del self.sleepers[thread]
+                self.woken.add(thread)
+        self.condition.notify_all()
+
+    def _settle(self):
+        """Laisse les threads reveilles faire leur pas (au plus max_block reel)"""
+        with self.condition:
+            if self.woken:
+                self.condition.wait_for(lambda: not self.woken, self.max_block)
+                self.woken.clear()  # Partis attendre autre chose
+
+    def release(self):
+        """Fin de simulation : reveille toutes les attentes"""
+        with self.condition:
+            self.sleepers.clear()
+            self.woken.clear()
+            self.condition.notify_all()
+
+    def sleep(self, seconds):
+        thread = threading.current_thread()
+        if thread is self.owner:
+            end = self.now + seconds
+            self._settle()
+            while True:
+                next_wake = self._next_wake()
+                if next_wake >= end:
+                    self.advance(end - self.now)
+                    _real_sleep(0)  # Threads reveilles autrement (move_to_angle non bloquant...)
+                    return
+                self.advance(next_wake - self.now)
+                if self.now < next_wake:
+                    self.now = next_wake  # Arrondi flottant
+                with self.condition:
+                    self._wake()
+                self._settle()
+        if self.owner is None or seconds <= 0:
+            return
+        with self.condition:
+            self.woken.discard(thread)
+            self.condition.notify_all()  # Controleur en attente dans _settle
+            deadline = self.now + seconds
+            self.sleepers[thread] = deadline
+            while thread in self.sleepers and self.owner is not None:
+                if not self.condition.wait(self.max_block):
+                    break
+            self.sleepers.pop(thread, None)
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.epoch + self.now
+
+
+_real_sleep = time.sleep
+
+
+class _VirtualTimeModule:
+    """Remplace le module time dans les modules patches"""
+
+    def __init__(self, clock):
+        self.sleep = clock.sleep
+        self.time = clock.time
+        self.monotonic = clock.monotonic
+        self.perf_counter = clock.monotonic
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+@contextlib.contextmanager
+def virtual_time(clock, modules):
+    """Remplace time / sleep / time() dans les modules donnes, puis restaure"""
+    proxy = _VirtualTimeModule(clock)
+    replacements = {time: proxy, time.sleep: clock.sleep, time.time: clock.time,
+                    time.monotonic: clock.monotonic}
+    saved = []
+    for module in modules:
+        for name, value in list(vars(module).items()):
+            try:
+                new = replacements.get(value)
+            except TypeError:  # Valeur non hachable
+                continue
+            if new is not None:
+                saved.append((module, name, value))
+                setattr(module, name, new)
+    try:
+        yield
+    finally:
+        for module, name, value in saved:
+            setattr(module, name, value)
+
+
+def controller_modules():
+    """Modules du robot charges (hors flux camera), a passer en temps virtuel"""
+    this = os.path.abspath(__file__)
+    here = os.path.dirname(this)
+    modules = []
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, '__file__', None)
+        if not path or os.path.abspath(path) == this:  # Aussi lance en __main__
+            continue
+        if os.path.dirname(os.path.abspath(path)) == here and name not in REAL_TIME_MODULES:
+            modules.append(module)
+    return modules
+
+
+def make_oval_track(length=2.4, width=1.6, line_width=0.02, scale=0.002, margin=0.2):
+    """
+    Piste ovale (deux droites, deux demi-cercles), ligne noire sur fond
+    blanc. Retourne (image, scale, depart) avec depart = (x, y, cap en
+    degres) au milieu de la droite du bas, sens anti-horaire.
+    """
+    w_px = int(round((length + 2 * margin) / scale))
+    h_px = int(round((width + 2 * margin) / scale))
+    image = np.full((h_px, w_px), 255, dtype=np.uint8)
+
+    radius = width / 2
+    x0, x1 = margin + radius, margin + length - radius
+    yc = margin + radius
+    thickness = max(1, int(round(line_width / scale)))
+
+    def px(x, y):
+        return int(round(x / scale)), int(round(h_px - y / scale))
+
+    cv2.line(image, px(x0, yc - radius), px(x1, yc - radius), 0, thickness)
+    cv2.line(image, px(x0, yc + radius), px(x1, yc + radius), 0, thickness)
+    r_px = int(round(radius / scale))
+    cv2.ellipse(image, px(x0, yc), (r_px, r_px), 0, 90, 270, 0, thickness)
+    cv2.ellipse(image, px(x1, yc), (r_px, r_px), 0, -90, 90, 0, thickness)
+
+    start = ((x0 + x1) / 2, yc - radius, 0.0)
+    return image, scale, start
+
+
+class TrackSimulator:
+    """
+    Robot simule sur une piste. Repere monde en metres, y vers le haut
+    (ligne 0 de l'image = haut de la piste), cap en radians, positif a
+    gauche. La position de reference est l'essieu arriere.
+    """
+
+    def __init__(self, track, scale, start, wheelbase=0.15, max_speed=1.0,
+                 speed_tau=0.15, steering_center=90, steering_ratio=0.8,
+                 max_steer=35, sensor_offset=0.12, sensor_spacing=0.015,
+                 read_cost=0.001, max_cte=0.3, dt=0.002):
+        if track.ndim == 3:
+            track = cv2.cvtColor(track, cv2.COLOR_BGR2GRAY)
+        self.line_mask = track < 128
+        self.scale = scale
+        self.height_m = track.shape[0] * scale
+        self.start = start
+
+        # Parametres du robot
+        self.wheelbase = wheelbase            # Empattement (m)
+        self.max_speed = max_speed            # Vitesse a throttle 1.0 (m/s)
+        self.speed_tau = speed_tau            # Constante de temps moteur (s)
+        self.steering_center = steering_center
+        self.steering_ratio = steering_ratio  # Degres de roue par degre de servo
+        self.max_steer = max_steer            # Braquage max des roues (degres)
+        self.sensor_offset = sensor_offset    # Capteurs IR devant l'essieu arriere (m)
+        self.sensor_spacing = sensor_spacing  # Ecart entre capteurs IR (m)
+        self.read_cost = read_cost            # Temps simule par lecture de capteur (s)
+        self.max_cte = max_cte                # Ecart au-dela duquel le robot est sorti
+        self.dt = dt                          # Pas d'integration (s)
+
+        # Ecart au centre de la ligne en tout point (m) : distance au bord
+        # de la ligne a l'exterieur, demi-largeur moins distance au bord a
+        # l'interieur
+        mask = self.line_mask.astype(np.uint8)
+        outside = cv2.distanceTransform(1 - mask, cv2.DIST_L2, 5)
+        inside = cv2.distanceTransform(mask, cv2.DIST_L2, 5)
+        half = float(inside.max())
+        self.cte_map = np.where(self.line_mask, half - inside, half + outside) * scale
+
+        # Centre de la piste pour compter les tours (angle parcouru autour)
+        rows, cols = np.nonzero(self.line_mask)
+        self.center = (cols.mean() * scale, self.height_m - rows.mean() * scale)
+
+        self.clock = VirtualClock(on_advance=self.step, resolution=dt)
+        self.reset()
+
+    # --- Etat et mesures ---
+
+    def reset(self):
+        """Replace le robot au depart et remet les mesures a zero"""
+        x, y, heading = self.start
+        self.x, self.y = x, y
+        self.heading = math.radians(heading)
+        self.speed = 0.0
+        self.clock.now = 0.0
+        self.clock.pending = 0.0
+
+        self.progress = 0.0
+        self.last_bearing = self._bearing()
+        self.laps = []
+        self.lap_start = 0.0
+        self._lap_stats()
+        self.line_losses = 0
+        self.pattern = None       # Capteurs a la position courante (calcul paresseux)
+        self.last_pattern = None  # Derniere lecture : True si ligne perdue
+        self.off_track = False
+
+    def _lap_stats(self):
+        self.lap_losses = 0
+        self.lap_sq_error = 0.0
+        self.lap_max_error = 0.0
+        self.lap_time_on = 0.0
+
+    def _bearing(self):
+        return math.atan2(self.y - self.center[1], self.x - self.center[0])
+
+    def _lookup(self, grid, x, y):
+        col = int(x / self.scale)
+        row = int((self.height_m - y) / self.scale)
+        if 0 <= row < grid.shape[0] and 0 <= col < grid.shape[1]:
+            return grid[row, col]
+        return None
+
+    def sensor_positions(self):
+        """Positions (x, y) des capteurs gauche, milieu, droit"""
+        cos_h, sin_h = math.cos(self.heading), math.sin(self.heading)
+        fx = self.x + self.sensor_offset * cos_h
+        fy = self.y + self.sensor_offset * sin_h
+        lx, ly = -sin_h * self.sensor_spacing, cos_h * self.sensor_spacing
+        return {
+            'left': (fx + lx, fy + ly),
+            'middle': (fx, fy),
+            'right': (fx - lx, fy - ly),
+        }
+
+    def read_sensor(self, name):
+        """Valeur d'un capteur IR (1 sur la ligne), lue par les entrees GPIO simulees"""
+        self.clock.advance(self.read_cost, flush=False)
+        if self.pattern is None:
+            self._update_pattern()
+        return self.pattern[name]
+
+    def _update_pattern(self):
+        """Etat des trois capteurs a la position courante, et pertes de ligne"""
+        positions = self.sensor_positions()
+        self.pattern = {name: int(bool(self._lookup(self.line_mask, *positions[name])))
+                        for name in ('left', 'middle', 'right')}
+        lost = not any(self.pattern.values())
+        if lost and self.last_pattern is False:
+            self.line_losses += 1
+            self.lap_losses += 1
+        self.last_pattern = lost
+
+    # --- Dynamique ---
+
+    def commands(self):
+        """(throttle, angle servo) actuellement commandes"""
+        throttle = hardware.sim.throttles.get(MOTOR_CHANNELS) or 0.0
+        angle = hardware.sim.angles.get(STEERING_CHANNEL)
+        if angle is None:
+            angle = self.steering_center
+        return throttle, angle
+
+    def step(self, duration):
+        """Integre le modele sur les duration dernieres secondes (appele par l'horloge)"""
+        throttle, angle = self.commands()
+        steer = (angle - self.steering_center) * self.steering_ratio
+        steer = math.radians(max(-self.max_steer, min(self.max_steer, steer)))
+        target = throttle * self.max_speed
+        turn = math.tan(steer) / self.wheelbase
+
+        self.pattern = None
+        remaining = duration
+        while remaining > 1e-9:
+            dt = min(self.dt, remaining)
+            remaining -= dt
+            self.speed += (target - self.speed) * min(1.0, dt / self.speed_tau)
+            cos_h, sin_h = math.cos(self.heading), math.sin(self.heading)
+            self.x += self.speed * cos_h * dt
+            self.y += self.speed * sin_h * dt
+            self.heading += self.speed * turn * dt
+
+            # Ecart lateral mesure sous le capteur du milieu
+            error = self._lookup(self.cte_map, self.x + self.sensor_offset * cos_h,
+                                 self.y + self.sensor_offset * sin_h)
+            if error is None or error > self.max_cte:
+                self.off_track = True
+                raise SimulationDone("off_track")
+            self.lap_sq_error += error * error * dt
+            self.lap_max_error = max(self.lap_max_error, error)
+            self.lap_time_on += dt
+
+            # Tours : angle parcouru autour du centre de la piste
+            bearing = self._bearing()
+            delta = (bearing - self.last_bearing + math.pi) % (2 * math.pi) - math.pi
+            self.last_bearing = bearing
+            self.progress += delta
+            if abs(self.progress) >= 2 * math.pi * (len(self.laps) + 1):
+                self._finish_lap(self.clock.now - remaining)
+
+        if self.done():
+            raise SimulationDone("laps")
+        if self.clock.now >= self.max_time:
+            raise SimulationDone("timeout")
+
+    def _finish_lap(self, now):
+        self.laps.append({
+            'lap': len(self.laps) + 1,
+            'time': now - self.lap_start,
+            'line_losses': self.lap_losses,
+            'cte_rms': math.sqrt(self.lap_sq_error / max(self.lap_time_on, 1e-9)),
+            'cte_max': self.lap_max_error,
+        })
+        self.lap_start = now
+        self._lap_stats()
+
+    def done(self):
+        return len(self.laps) >= self.target_laps
+
+    # --- Execution ---
+
+    def run(self, target, laps=10, max_time=None, modules=None, quiet=True):
+        """
+        Lance target() (la boucle du controleur, qui ne retourne pas) dans
+        le thread courant, ses modules deja importes jusqu'a laps tours, une sortie de piste ou
+        max_time secondes simulees (120 s par tour par defaut).
+        Retourne un dict de resultats.
+        """
+        self.reset()
+        self.target_laps = laps
+        self.max_time = max_time or 120.0 * laps
+        hardware.sim.reset()
+        for name, pin in IR_PINS.items():
+            hardware.sim.set_input(pin, lambda name=name: self.read_sensor(name))
+
+        if modules is None:
+            modules = controller_modules()
+        self.clock.owner = threading.current_thread()
+        reason = "returned"
+        real_start = time.perf_counter()
+        output = open(os.devnull, 'w') if quiet else None
+        try:
+            with virtual_time(self.clock, modules), \
+                    contextlib.redirect_stdout(output or sys.stdout):
+                target()
+        except SimulationDone as e:
+            reason = str(e)
+        finally:
+            self.clock.owner = None
+            self.clock.release()
+            if output:
+                output.close()
+        real_time = time.perf_counter() - real_start
+
+        lap_times = [lap['time'] for lap in self.laps]
+        total_on = sum(lap['time'] for lap in self.laps) or 1e-9
+        return {
+            'reason': reason,
+            'laps': self.laps,
+            'sim_time': self.clock.now,
+            'real_time': real_time,
+            'speedup': self.clock.now / real_time if real_time else None,
+            'line_losses': self.line_losses,
+            'best_lap': min(lap_times) if lap_times else None,
+            'mean_lap': float(np.mean(lap_times)) if lap_times else None,
+            'cte_rms': (math.sqrt(sum(lap['cte_rms'] ** 2 * lap['time'] for lap in self.laps)
+                                  / total_on) if self.laps else None),
+            'cte_max': max((lap['cte_max'] for lap in self.laps), default=None),
+        }
+
+
+# --- Controleurs du depot ---
+# Chaque fabrique importe son module (avant run(), pour que ses sleep
+# soient remplaces par l'horloge virtuelle) et retourne la boucle a lancer.
+
+def challenge1_controller():
+    import challenge1
+    return challenge1.create_control_loop().run
+
+
+def challenge1_pid_controller():
+    import challenge1
+    return challenge1.create_pid_control_loop().run
+
+
+def challenge2_controller():
+    import challenge2
+    return challenge2.create_control_loop().run
+
+
+def challenge3_controller():
+    # Sort de la piste vers 4.9 s : led_left()/led_right() clignotent 2.4 s
+    # dans la boucle de suivi, le robot continue sans lire les capteurs
+    import challenge3
+    challenge3.bar = challenge3.Adeept_SPI_LedPixel(count=14, bright=255, sequence='GRB',
+                                                    bus=0, device=0)
+
+    def loop():
+        virage = 0
+        while True:
+            _, _, _, virage = challenge3.tracking(virage)
+    return loop
+
+
+def improved_controller(steering='table'):
+    from line_follower_improved import LineFollowerImproved
+    follower = LineFollowerImproved(camera_instance=hardware.create_camera(), steering=steering)
+
+    def loop():
+        follower.running = True
+        try:
+            follower._main_loop()
+        finally:
+            follower.running = False
+            follower.camera.stop()
+    return loop
+
+
+CONTROLLERS = {
+    'challenge1': challenge1_controller,
+    'challenge1_pid': challenge1_pid_controller,
+    'challenge2': challenge2_controller,
+    'challenge3': challenge3_controller,
+    'improved': improved_controller,
+    'improved_pid': lambda: improved_controller(steering='pid'),
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulation des suiveurs de ligne sur piste")
+    parser.add_argument("--controller", choices=sorted(CONTROLLERS), default="challenge2")
+    parser.add_argument("--laps", type=int, default=20, help="Tours a simuler")
+    parser.add_argument("--track", help="Image de la piste (ligne sombre), ovale par defaut")
+    parser.add_argument("--scale", type=float, default=0.002, help="Metres par pixel de l'image")
+    parser.add_argument("--start", type=float, nargs=3, metavar=("X", "Y", "CAP"),
+                        help="Depart en metres et cap en degres (obligatoire avec --track)")
+    parser.add_argument("--max-speed", type=float, default=1.0, help="Vitesse a plein gaz (m/s)")
+    parser.add_argument("--verbose", action="store_true", help="Garde les print du controleur")
+    args = parser.parse_args()
+
+    if args.track:
+        if not args.start:
+            parser.error("--start est obligatoire avec --track")
+        track = cv2.imread(args.track, cv2.IMREAD_GRAYSCALE)
+        if track is None:
+            parser.error(f"image illisible: {args.track}")
+        scale, start = args.scale, tuple(args.start)
+    else:
+        track, scale, start = make_oval_track(scale=args.scale)
+
+    simulator = TrackSimulator(track, scale, start, max_speed=args.max_speed)
+    controller = CONTROLLERS[args.controller]()
+    result = simulator.run(controller, laps=args.laps, quiet=not args.verbose)
+
+    print(f"{args.controller}: {len(result['laps'])}/{args.laps} tours, fin: {result['reason']}")
+    print(f"{'tour':>4s} {'temps':>8s} {'pertes':>7s} {'cte rms':>8s} {'cte max':>8s}")
+    for lap in result['laps']:
+        print(f"{lap['lap']:4d} {lap['time']:7.2f}s {lap['line_losses']:7d} "
+              f"{lap['cte_rms'] * 1000:6.1f}mm {lap['cte_max'] * 1000:6.1f}mm")
+    if result['laps']:
+        laps_per_min = 60 * len(result['laps']) / result['real_time']
+        print(f"meilleur tour {result['best_lap']:.2f}s, moyen {result['mean_lap']:.2f}s, "
+              f"pertes {result['line_losses']}, cte rms {result['cte_rms'] * 1000:.1f}mm")
+    else:
+        laps_per_min = 0.0
+    print(f"{result['sim_time']:.1f}s simulees en {result['real_time']:.2f}s "
+          f"(x{result['speedup'] or 0:.0f}, {laps_per_min:.0f} tours/min)")
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+# ultrasonic_sampler.py - Capteur ultrason echantillonne en tache de fond
+import collections
+import math
+import statistics
+import threading
+import time
+
+import hardware
+from hardware import DistanceSensor
+from robot_utils import shared_instance
+
+TRIGGER_PIN = 23
+ECHO_PIN = 24
+
+
+class UltrasonicSampler:
+    """
+    Service du capteur ultrason (distances en mm).
+
+    Un thread mesure a frequence fixe, filtre et publie la derniere
+    distance avec son horodatage : une lecture ne touche plus au capteur
+    et ne bloque jamais.
+
+    Filtrage : une mesure invalide (pas de valeur, negative) est ignoree ;
+    une mesure qui saute de plus de outlier mm par rapport a la distance
+    filtree est mise de cote, et n'est prise que si confirm mesures
+    consecutives concordent (vrai changement : obstacle qui apparait,
+    virage). Un saut vers le loin (obstacle qui disparait, ou echo perdu
+    lu comme max_distance) demande confirm_far mesures : on croit plus
+    vite a un obstacle qu'a la voie libre. La distance publiee est la
+    mediane des window dernieres mesures retenues.
+
+    Historique (horodatage, distance filtree) et vitesse d'approche de
+    l'obstacle (mm/s, positive quand la distance diminue, pente des
+    moindres carres sur velocity_window secondes) pour freiner plus tot.
+
+    En simulation, pas de thread : la lecture mesure a la demande, au
+    plus une fois par periode (horloge virtuelle de track_sim).
+    """
+
+    def __init__(self, echo=ECHO_PIN, trigger=TRIGGER_PIN, max_distance=2.0, rate=15.0,
+                 window=5, outlier=300.0, confirm=2, confirm_far=3, history=100,
+                 velocity_window=0.5, sensor=None):
+        # queue_len=1 : la mediane de gpiozero (9 mesures) est remplacee par la notre
+        self.sensor = sensor or DistanceSensor(echo=echo, trigger=trigger,
+                                               max_distance=max_distance, queue_len=1)
+        self.max_distance = max_distance * 1000
+        self.period = 1.0 / rate
+        self.outlier = outlier
+        self.confirm = confirm
+        self.confirm_far = confirm_far
+        self.velocity_window = velocity_window
+
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread = None
+
+        self.samples = collections.deque(maxlen=window)   # Mesures retenues (mm)
+        self.suspects = []                                # Sauts en attente de confirmation
+        self.history = collections.deque(maxlen=history)  # (horodatage, distance filtree)
+        self.distance = None                              # Distance filtree (mm)
+        self.raw = None                                   # Derniere mesure brute (mm)
+        self.timestamp = None                             # Horodatage de la distance publiee
+        self.last_sample = None
+        self.seq = 0                                      # Incremente a chaque publication
+
+        # Statistiques
+        self.stats = {
+            'samples': 0,
+            'invalid': 0,
+            'outliers': 0,
+            'jumps': 0,
+            'errors': 0
+        }
+
+        # Premiere mesure tout de suite : une lecture a toujours une valeur
+        self._sample()
+
+    def _measure(self):
+        """Mesure brute (mm), None si le capteur ne repond pas"""
+        try:
+            distance = self.sensor.distance
+        except Exception as e:
+            print(f"Erreur ultrason: {e}")
+            with self.condition:
+                self.stats['errors'] += 1
+            return None
+        return None if distance is None else distance * 1000
+
+    def _sample(self):
+        """Une mesure : filtre et publie"""
+        raw = self._measure()
+        now = time.monotonic()
+        with self.condition:
+            self.last_sample = now
+            self.stats['samples'] += 1
+            if raw is None or not math.isfinite(raw) or raw < 0:
+                self.stats['invalid'] += 1
+                return
+            self.raw = raw
+            if self.samples and abs(raw - self.distance) > self.outlier:
+                self.suspects.append(raw)
+                if max(self.suspects) - min(self.suspects) > self.outlier:
+                    self.suspects = [raw]  # Sauts incoherents entre eux : on repart du dernier
+                needed = self.confirm_far if raw > self.distance else self.confirm
+                if len(self.suspects) < needed:
+                    self.stats['outliers'] += 1
+                    return
+                # Saut confirme : la fenetre et la vitesse d'approche repartent
+                # des nouvelles mesures (changement de scene, pas une approche)
+                self.samples.clear()
+                self.samples.extend(self.suspects)
+                self.history.clear()
+                self.stats['jumps'] += 1
+            else:
+                self.samples.append(raw)
+            self.suspects = []
+            self.distance = statistics.median(self.samples)
+            self.timestamp = now
+            self.history.append((now, self.distance))
+            self.seq += 1
+            self.condition.notify_all()
+
+    def reset_filter(self):
+        """
+        La scene change (tete tournee...) : la prochaine mesure est prise
+        telle quelle, fenetre et historique repartent de zero. La derniere
+        distance reste lisible d'ici la.
+        """
+        with self.condition:
+            self.samples.clear()
+            self.suspects = []
+            self.history.clear()
+
+    def _poll(self):
+        """Sans thread (simulation) : mesure si la derniere a plus d'une periode"""
+        if self.running:
+            return
+        if self.last_sample is None or time.monotonic() - self.last_sample >= self.period:
+            self._sample()
+
+    def _run(self):
+        next_time = time.monotonic()
+        while self.running:
+            self._sample()
+            next_time += self.period
+            delay = next_time - time.monotonic()
+            if delay <= 0:
+                next_time = time.monotonic()  # En retard : pas de rattrapage
+                continue
+            with self.condition:
+                self.condition.wait_for(lambda: not self.running, delay)
+
+    def start(self):
+        """Lance le thread d'echantillonnage"""
+        with self.condition:
+            if self.running:
+                return False
+            self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self):
+        """Arrete le thread ; les lectures repassent en mesure a la demande"""
+        with self.condition:
+            if not self.running:
+                return False
+            self.running = False
+            self.condition.notify_all()
+        if self.thread and self.thread.is_alive() and threading.current_thread() is not self.thread:
+            self.thread.join(timeout=1.0)
+        return True
+
+    def read(self):
+        """Derniere distance filtree (mm), sans bloquer"""
+        self._poll()
+        with self.condition:
+            return self.distance if self.distance is not None else self.max_distance
+
+    def _velocity(self, now):
+        """Vitesse d'approche (mm/s) sur la fenetre, sous verrou"""
+        points = [(t, d) for t, d in self.history if t >= now - self.velocity_window]
+        if len(points) < 3:
+            return 0.0
+        mean_t = sum(t for t, _ in points) / len(points)
+        mean_d = sum(d for _, d in points) / len(points)
+        var_t = sum((t - mean_t) ** 2 for t, _ in points)
+        if var_t <= 0:
+            return 0.0
+        slope = sum((t - mean_t) * (d - mean_d) for t, d in points) / var_t
+        return -slope
+
+    def approach_velocity(self):
+        """Vitesse d'approche de l'obstacle (mm/s, positive s'il se rapproche)"""
+        self._poll()
+        with self.condition:
+            return self._velocity(time.monotonic())
+
+    def get_reading(self):
+        """Derniere lecture : distance filtree, mesure brute, age, vitesse d'approche"""
+        self._poll()
+        now = time.monotonic()
+        with self.condition:
+            velocity = self._velocity(now)
+            distance = self.distance if self.distance is not None else self.max_distance
+            return {
+                'distance': distance,
+                'raw': self.raw,
+                'timestamp': self.timestamp,
+                'age': None if self.timestamp is None else now - self.timestamp,
+                'velocity': velocity,
+                'time_to_contact': distance / velocity if velocity > 0 else None,
+                'seq': self.seq
+            }
+
+    def get_history(self):
+        """Liste des (horodatage, distance filtree), la plus ancienne en premier"""
+        with self.condition:
+            return list(self.history)
+
+    def obstacle_within(self, distance, horizon=0.0):
+        """
+        Vrai si l'obstacle est a moins de distance mm, ou y sera dans
+        horizon secondes a la vitesse d'approche actuelle (freinage
+        anticipe).
+        """
+        reading = self.get_reading()
+        return reading['distance'] - max(reading['velocity'], 0.0) * horizon < distance
+
+    def wait_update(self, seq=None, timeout=None):
+        """
+        Attend une distance publiee apres la sequence seq (la courante par
+        defaut). Retourne la lecture, ou None si timeout.
+        """
+        if not self.running:
+            # Sans thread : une periode puis une mesure
+            time.sleep(self.period)
+            self._poll()
+            return self.get_reading()
+        with self.condition:
+            if seq is None:
+                seq = self.seq
+            if not self.condition.wait_for(lambda: self.seq != seq or not self.running, timeout):
+                return None
+        return self.get_reading()
+
+    def get_status(self):
+        """Retourne la derniere lecture et les statistiques de filtrage"""
+        reading = self.get_reading()
+        with self.condition:
+            return {
+                'running': self.running,
+                'rate': 1.0 / self.period,
+                'reading': reading,
+                'window': list(self.samples),
+                'stats': self.stats.copy()
+            }
+
+    def close(self):
+        """Arrete le thread et libere les GPIO"""
+        self.stop()
+        self.sensor.close()
+
+
+# gpiozero refuse deux objets sur les memes pins : tous les scripts
+# (checkdist, evitement, labyrinthe...) passent par le meme service
+@shared_instance
+def get_ultrasonic():
+    """Service ultrason partage (cree et lance au premier appel)"""
+    sampler = UltrasonicSampler()
+    if not hardware.SIMULATED:
+        sampler.start()
+    return sampler
@@ -1,14 +1,16 @@
-from gpiozero import DistanceSensor
+from ultrasonic_sampler import get_ultrasonic
 from time import sleep
 
 Tr = 23
 Ec = 24
 
-sensor = DistanceSensor(echo=Ec, trigger=Tr,max_distance=2) # Maximum detection distance 2m.
+# Capteur echantillonne en tache de fond (filtre median, vitesse d'approche)
+ultrasonic = get_ultrasonic()
+sensor = ultrasonic.sensor # Maximum detection distance 2m.
 
-# Get the distance of ultrasonic detection.
+# Get the distance of ultrasonic detection (derniere mesure filtree, sans bloquer).
 def checkdist():
-    return (sensor.distance) *1000 # Unit: mm
+    return ultrasonic.read() # Unit: mm
 
 if __name__ == "__main__":
     while True:
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+# vision_worker.py - Detecteurs de vision dans un processus separe
+import multiprocessing
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+def _worker_main(shm_name, shape, factories, tasks, results):
+    """
+    Boucle du processus de vision.
+    Construit ses propres detecteurs, puis lit la frame dans la memoire
+    partagee a chaque tache recue, lance les detecteurs demandes et
+    renvoie un dict de resultats.
+    """
+    detectors = {name: factory() for name, factory in factories.items() if factory}
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    try:
+        while True:
+            task = tasks.recv()
+            if task is None:
+                break
+            seq, timestamp, wanted = task
+
+            result = {'seq': seq, 'timestamp': timestamp}
+            start = time.perf_counter()
+            try:
+                if 'color' in wanted:
+                    result['colors'] = detectors['color'].detect_colors(frame)
+                if 'arrow' in wanted:
+                    result['arrow'] = detectors['arrow'].analyze(frame)
+                if 'line' in wanted:
+                    result['line'] = detectors['line'].detect_line_in_frame(frame)
+            except Exception as e:
+                result['error'] = str(e)
+            result['duration'] = time.perf_counter() - start
+            results.send(result)
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        del frame
+        shm.close()
+
+
+class VisionWorker:
+    """
+    Fait tourner les detecteurs (couleur, fleche, ligne) dans un processus
+    separe pour qu'ils ne prennent pas le GIL aux boucles de controle.
+
+    Un thread du processus principal copie la derniere frame dans une zone
+    de memoire partagee et envoie au processus la liste des detecteurs a
+    lancer ; les resultats reviennent par un second tube. Chaque tube n'a
+    qu'un ecrivain et un lecteur, sans verrou. Une seule frame est en cours
+    a la fois : le processus travaille toujours sur la frame la plus recente
+    et les frames intermediaires sont sautees.
+
+    Le processus est cree par fork : start_process() doit etre appele avant
+    que le processus principal ne lance des threads (bus I2C, ultrason,
+    gpiozero, Picamera2, capture, detecteurs...), sinon le fils herite de
+    verrous pris par ces threads et peut se bloquer dans OpenCV. C'est
+    pourquoi webserver.py cree la camera avant d'importer les autres
+    modules du robot. Les detecteurs sont passes sous forme de
+    classes et construits dans le fils.
+    """
+
+    def __init__(self, camera, detectors, shape, main_size, stream="lores", timeout=2.0):
+        self.camera = camera
+        self.detectors = detectors  # Classes {'color': ..., 'arrow': ..., 'line': ...} (None : absent)
+        self.shape = tuple(shape)   # Frames analysees (hauteur, largeur, 3)
+        self.main_size = main_size  # (largeur, hauteur) du flux principal
+        self.stream = stream
+        self.timeout = timeout      # Attente max d'un resultat avant d'abandonner
+
+        # Detecteurs demandes en plus de ceux actives sur la camera
+        self.requested = set()
+
+        self.lock = threading.Lock()
+        self.results = {}           # Dernier resultat par detecteur
+        self.result_seq = {}        # Numero de frame de ce resultat
+
+        self.shm = None
+        self.process = None
+        self.thread = None
+        self.running = False
+
+        # Statistiques
+        self.stats = {
+            'frames_processed': 0,
+            'frames_skipped': 0,
+            'errors': 0,
+            'last_duration': 0.0
+        }
+
+    def _wanted(self):
+        """Detecteurs a lancer sur la prochaine frame"""
+        wanted = set(self.requested)
+        if self.camera.show_color_detection:
+            wanted.add('color')
+        if self.camera.arrow_detection_enabled:
+            wanted.add('arrow')
+        return tuple(name for name in wanted if self.detectors.get(name))
+
+    def _feed_loop(self):
+        """Envoie les frames au processus de vision et recupere les resultats"""
+        last_seq = 0
+        while self.running:
+            wanted = self._wanted()
+            if not wanted:
+                time.sleep(0.05)
+                continue
+
+            entry = self.camera.wait_for_frame(last_seq, timeout=1.0, stream=self.stream)
+            if entry is None:
+                continue
+            if last_seq:
+                self.stats['frames_skipped'] += entry[0] - last_seq - 1
+            last_seq = entry[0]
+
+            # Le processus est inactif : la zone partagee peut etre reecrite
+            np.copyto(self.frame, entry[2])
+            self.tasks.send((entry[0], entry[1], wanted))
+
+            if not self.results_conn.poll(self.timeout):
+                print("Erreur processus de vision: pas de reponse, arret")
+                self.running = False
+                break
+            result = self.results_conn.recv()
+            self._store(result, wanted)
+
+    def _store(self, result, wanted):
+        """Enregistre un resultat et le reporte sur la camera"""
+        self.stats['frames_processed'] += 1
+        self.stats['last_duration'] = result['duration']
+        if 'error' in result:
+            print(f"Erreur detection (processus de vision): {result['error']}")
+            self.stats['errors'] += 1
+            return
+
+        with self.lock:
+            for name, key in (('color', 'colors'), ('arrow', 'arrow'), ('line', 'line')):
+                if name in wanted:
+                    self.results[name] = result[key]
+                    self.result_seq[name] = result['seq']
+
+        # Les detections couleur sont ramenees aux coordonnees du flux principal
+        if 'color' in wanted:
+            main_w, main_h = self.main_size
+            self.camera.detected_colors = self.camera._scale_detections(
+                result['colors'], main_w / self.shape[1], main_h / self.shape[0])
+        if 'arrow' in wanted:
+            self.camera.arrow_result = result['arrow']
+            self.camera.arrow_direction = result['arrow']['direction']
+
+    def get_result(self, name):
+        """Dernier resultat d'un detecteur ('color', 'arrow', 'line'), ou None"""
+        with self.lock:
+            return self.results.get(name)
+
+    def start_process(self):
+        """Cree la memoire partagee et lance le processus de vision"""
+        if self.process is not None:
+            return False
+
+        size = int(np.prod(self.shape))
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.frame = np.ndarray(self.shape, dtype=np.uint8, buffer=self.shm.buf)
+
+        # fork plutot que spawn : le module principal (webserver, qui cree
+        # la camera) n'est pas reexecute dans le fils
+        if threading.active_count() > 1:
+            names = [t.name for t in threading.enumerate() if t is not threading.current_thread()]
+            print(f"Attention processus de vision: fork avec d'autres threads actifs {names}")
+        context = multiprocessing.get_context("fork")
+        task_recv, self.tasks = context.Pipe(duplex=False)
+        self.results_conn, result_send = context.Pipe(duplex=False)
+        self.process = context.Process(
+            target=_worker_main,
+            args=(self.shm.name, self.shape, self.detectors, task_recv, result_send),
+            daemon=True)
+        self.process.start()
+        task_recv.close()
+        result_send.close()
+        print(f"Processus de vision demarre (pid {self.process.pid})")
+        return True
+
+    def start(self):
+        """Lance le processus s'il ne l'est pas deja, puis le thread qui l'alimente"""
+        if self.running:
+            return False
+        self.start_process()
+
+        self.running = True
+        self.thread = threading.Thread(target=self._feed_loop, daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self):
+        """Arrete le processus de vision et libere la memoire partagee"""
+        if self.process is None:
+            return False
+
+        self.running = False
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=self.timeout + 1.0)
+        try:
+            self.tasks.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=2.0)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process = None
+
+        self.tasks.close()
+        self.results_conn.close()
+        del self.frame
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
+        return True
+
+    def get_status(self):
+        """Retourne le statut du processus de vision"""
+        return {
+            'running': self.running,
+            'pid': self.process.pid if self.process else None,
+            'detectors': list(self._wanted()),
+            'stats': self.stats.copy()
+        }
@@ -1,12 +1,22 @@
 # -*- coding: Windows-1252 -*-
+import os  # Pour la gestion des fichiers
+from hardware import create_camera  # Camera reelle ou simulee (ROBOT_HARDWARE=sim)
+
+# CREATION DE L'INSTANCE CAMERA UNIQUE, avant tout autre module du robot :
+# avec ROBOT_VISION_PROCESS=1 le processus de vision est cree (fork) ici,
+# quand aucun thread ne tourne encore (bus I2C, ultrason, gpiozero, LEDs...)
+camera = create_camera(vision_process=os.environ.get("ROBOT_VISION_PROCESS") == "1")
+
 from flask import Flask, render_template, redirect, url_for, request, Response, send_file, jsonify
 from temp import Adeept_SPI_LedPixel
 import atexit  # Pour executer une fonction a l'arret du serveur
 import threading
 import time
-import os  # Pour la gestion des fichiers
 from led_controller_improved import led_controller_improved, set_front_leds  # Version am?lior?e
 from motor import Motor, motorStop, motor_drive  # Import specifique des fonctions necessaires
+from i2c_bus import get_bus
+from ultrasonic_sampler import get_ultrasonic
+from radar_scanner import get_radar
 from led_techno import * 
 from servo_reboot import *
 from camera import *  # Version modifiee avec detection couleurs et lignes
@@ -14,9 +24,9 @@ from power_control import *  # Import du module de controle d'alimentation
 from servo_controller_improved import servo_controller  # Nouveau controleur servo
 from back_light_2 import create_back_light_controller  # Import du contr?leur de feux arri?re
 from voice_controller import VoiceController
+from mjpeg_broadcaster import MjpegBroadcaster  # Diffusion MJPEG partagee entre clients
 
-# CR?ATION DE L'INSTANCE CAM?RA UNIQUE
-camera = PiCameraStream()
+mjpeg_broadcaster = MjpegBroadcaster(camera)
 
 voice_controller_instance = None
 # from line_follower_improved import LineFollowerImproved
@@ -34,7 +44,6 @@ app = Flask(__name__)
 
 # Variables globales pour gerer les mouvements
 current_movement = None
-movement_thread = None
 steering_thread = None
 return_to_center_timer = None
 
@@ -129,57 +138,25 @@ def leds():
 
 @app.route('/moteur/start', methods=['POST'])
 def moteur_start():
-    global movement_thread, current_movement
+    global current_movement
     direction = request.form.get("direction")
     
-    # Arreter le mouvement precedent
-    if movement_thread and movement_thread.is_alive():
-        current_movement = None
-        movement_thread.join(timeout=0.5)
-    
-    # Demarrer le nouveau mouvement
+    # La rampe moteur converge en arriere-plan (motor_ramp) : la requete
+    # repart tout de suite, la vitesse est maintenue jusqu'a /moteur/stop
     current_movement = direction
-    movement_thread = threading.Thread(target=continuous_movement, args=(direction,))
-    movement_thread.daemon = True
-    movement_thread.start()
-    
-    return '', 204
-
-def continuous_movement(direction):
-    """Mouvement continu jusqu'a l'arret avec feux arri?re"""
-    global current_movement
-    
     if direction == "haut":
-        # Notifier le contr?leur que le robot avance
+        # Notifier le controleur que le robot avance
         if back_light_controller:
             back_light_controller.on_move_forward()
-        
-        # Demarrage immediat puis maintien
-        motor_drive(25, 1, 0.2)  # Demarrage plus rapide
-        while current_movement == "haut":
-            Motor(1, 1, 25)  # Maintien du mouvement
-            time.sleep(0.02)  # Controle plus frequent
-        motorStop()  # Arret immediat
-        
-        # Notifier l'arr?t
-        if back_light_controller:
-            back_light_controller.on_stop()
+        motor_drive(25, 1, 0.2)  # Demarrage rapide
         
     elif direction == "bas":
-        # Notifier le contr?leur que le robot recule
+        # Notifier le controleur que le robot recule
         if back_light_controller:
             back_light_controller.on_move_backward()
-        
-        # Demarrage immediat puis maintien
-        motor_drive(25, -1, 0.2)  # Demarrage plus rapide
-        while current_movement == "bas":
-            Motor(1, -1, 25)  # Maintien du mouvement
-            time.sleep(0.02)  # Controle plus frequent
-        motorStop()  # Arret immediat
-        
-        # Notifier l'arr?t
-        if back_light_controller:
-            back_light_controller.on_stop()
+        motor_drive(25, -1, 0.2)  # Demarrage rapide
+    
+    return '', 204
 
 @app.route('/moove', methods=['POST'])
 def moove():
@@ -295,6 +272,23 @@ def head_center_all():
         servo_controller.return_to_center(servo_id, blocking=False)
     return '', 204
 
+@app.route('/i2c_bus/status', methods=['GET'])
+def i2c_bus_status():
+    """Latences des transactions et occupation du bus I2C (PCA9685)"""
+    return jsonify(get_bus().get_status())
+
+@app.route('/ultrasonic/status', methods=['GET'])
+def ultrasonic_status():
+    """Derniere distance filtree, age, vitesse d'approche et historique"""
+    status = get_ultrasonic().get_status()
+    status['history'] = get_ultrasonic().get_history()
+    return jsonify(status)
+
+@app.route('/radar/status', methods=['GET'])
+def radar_status():
+    """Derniere carte du radar (distance et age par secteur), sans lancer le balayage"""
+    return jsonify(get_radar().get_status())
+
 # Nouvelles routes pour la detection de couleurs
 @app.route('/toggle_color_detection', methods=['POST'])
 def toggle_color_detection():
@@ -1142,11 +1136,8 @@ def back_light_emergency_stop():
 # ============================================================================
 
 def gen():
-    while True:
-        frame = camera.get_frame()
-        if frame:
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+    # Chaque frame est encodee une seule fois et partagee entre tous les clients
+    return mjpeg_broadcaster.stream()
   
 @app.route('/video_feed')
 def video():
@@ -2,8 +2,9 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import robot_memory_path  # Modules partages de Robot_memory/ (hardware, i2c_bus...)
 import time
-import spidev
+from hardware import spidev
 import threading
 import numpy
 
@@ -1,18 +1,19 @@
+import robot_memory_path  # Modules partages de Robot_memory/ (hardware, i2c_bus...)
 from servo_controller_improved import *
 from motor import *
 from servo_controller_improved import servo_controller
-from gpiozero import InputDevice
+from ir_sensors import get_ir_sensors
 from servo_controller import *
+from ir_state_machine import IRStateMachine, CHALLENGE1_TABLE
 
 # Configuration des pins des capteurs de ligne
 line_pin_left = 22
 line_pin_middle = 27
 line_pin_right = 17
 
-# Initialisation des capteurs (attention: assignation inversee dans le code original)
-left = InputDevice(pin=line_pin_right)    # Capteur gauche sur pin droite
-middle = InputDevice(pin=line_pin_middle) # Capteur milieu
-right = InputDevice(pin=line_pin_left)    # Capteur droit sur pin gauche
+# Capteurs IR sur callbacks de front (attention: assignation inversee dans le code original)
+ir_sensors = get_ir_sensors()
+IR_PINS = (line_pin_right, line_pin_middle, line_pin_left)  # Gauche sur pin droite, droit sur pin gauche
 
 # Configuration des angles du servo de direction
 ANGLE_CENTER = 90     # Position centrale
@@ -25,51 +26,35 @@ ANGLE_SHARP_RIGHT = 50   # Virage serre a droite
 MOTOR_SPEED_NORMAL = 25   # Vitesse normale
 MOTOR_SPEED_SLOW = 15     # Vitesse reduite en virage
 MOTOR_SPEED_SEARCH = 10   # Vitesse de recherche
+MOTOR_SPEED_DRIVE = 20    # Vitesse de drive() (motor_25)
+
+# Decision capteurs -> angle et vitesse : table partagee (ir_state_machine)
+ANGLES = {
+    'center': ANGLE_CENTER,
+    'left': ANGLE_LEFT,
+    'right': ANGLE_RIGHT,
+    'sharp_left': ANGLE_SHARP_LEFT,
+    'sharp_right': ANGLE_SHARP_RIGHT,
+}
+state_machine = IRStateMachine(CHALLENGE1_TABLE, angles=ANGLES,
+                               speeds={'normal': MOTOR_SPEED_DRIVE}, name="challenge1")
+
+
+def read_sensors():
+    """Etat des capteurs (gauche, milieu, droite)"""
+    return ir_sensors.read(IR_PINS)
 
 
 def tracking(status_left, status_middle, status_right):
 
-    status_right = right.value
-    status_middle = middle.value
-    status_left = left.value
+    status_left, status_middle, status_right = read_sensors()
 
     print("Current : ",status_left," +", status_middle, " + ", status_right,"\n")
 
-    if status_left == 0 and status_middle == 0 and status_right == 0: #1
-    
-      #motorStop()
-      pass
-    
-    elif status_left == 0 and status_middle == 0 and status_right == 1: #2
-      set_angle(0,ANGLE_SHARP_LEFT)
-      
-    elif status_left == 0 and status_middle == 1 and status_right == 0: #3
-      
-      #ne rien faire
-      set_angle(0,ANGLE_CENTER)
-      pass
-      
-    elif status_left == 0 and status_middle == 1 and status_right == 1: #4
-      
-      set_angle(0,ANGLE_LEFT)
-      
-    elif status_left == 1 and status_middle == 0 and status_right == 0: #5
-    
-      set_angle(0,ANGLE_SHARP_RIGHT)
-      
-    elif status_left == 1 and status_middle == 0 and status_right == 1: #6
-    
-      #tracking(status_left_before, status_middle_before, status_right_before)
-      pass
-    
-    elif status_left == 1 and status_middle == 1 and status_right == 0: #7
-    
-      set_angle(0, ANGLE_RIGHT)
-      
-    elif status_left == 1 and status_middle == 1 and status_right == 1: #8
-      
-      #tracking(status_left_before, status_middle_before, status_right_before)
-      set_angle(0,ANGLE_CENTER)
+    # Angle None (ligne perdue, cas rare 101) : on garde l'angle actuel
+    angle = state_machine.decide((status_left, status_middle, status_right)).angle
+    if angle is not None:
+      set_angle(0, angle)
       
     return status_left, status_middle, status_right
 
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# robot_memory_path.py - Rend importables les modules partages de Robot_memory/
+"""
+Les scripts hors de Robot_memory/ (racine, challenge1/, obstacle_contournement/)
+utilisent les modules partages qui s'y trouvent (hardware, i2c_bus, pca_output,
+motor_ramp, ultrasonic_sampler...). Importer ce module en premier ajoute
+Robot_memory/ (voisin de ce fichier ou de son dossier parent) a la fin de
+sys.path : les copies locales (motor, servo_controller...) restent prioritaires.
+"""
+import os
+import sys
+
+_here = os.path.dirname(os.path.abspath(__file__))
+for _base in (_here, os.path.dirname(_here)):
+    _path = os.path.join(_base, "Robot_memory")
+    if os.path.isdir(_path):
+        if _path not in sys.path:
+            sys.path.append(_path)
+        break
@@ -1,4 +1,5 @@
-import RPi.GPIO as GPIO
+import robot_memory_path  # Modules partages de Robot_memory/ (hardware, i2c_bus...)
+from hardware import GPIO
 import time
 
 def switchSetup(): # Python function designed to configure
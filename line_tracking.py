@@ -1,6 +1,7 @@
+import robot_memory_path  # Modules partages de Robot_memory/ (hardware, i2c_bus...)
 import time
 import argparse
-from gpiozero import InputDevice
+from hardware import InputDevice
 
 line_pin_left = 22
 line_pin_middle = 27
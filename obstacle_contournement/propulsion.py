@@ -2,11 +2,11 @@
 
 
 #!/usr/bin/env python3
+import robot_memory_path  # Modules partages de Robot_memory/ (hardware, i2c_bus...)
 import time
-from board import SCL, SDA
-import busio
-from adafruit_pca9685 import PCA9685
-from adafruit_motor import motor
+from hardware import DCMotor, SLOW_DECAY
+from i2c_bus import get_bus, PRIORITY_STOP, PRIORITY_MOTOR
+from pca_output import get_output
 #from servo_controller import *
 
 
@@ -17,12 +17,20 @@ MOTOR_M1_IN2 = 14
 def map(x, in_min, in_max, out_min, out_max):
     return (x - in_min)/(in_max - in_min)*(out_max - out_min) + out_min
 
-i2c = busio.I2C(SCL, SDA)
-pwm_motor = PCA9685(i2c, address=0x5f)
-pwm_motor.frequency = 50
+# PCA9685 partage (0x5f) avec les servos : une seule instance, ecritures
+# par l'etage de sortie (rien si inchange) puis en file de priorite (un
+# arret moteur passe devant tout le reste)
+bus = get_bus()
+pwm_motor = bus.pca
+output = get_output()
 
-motor1 = motor.DCMotor(pwm_motor.channels[MOTOR_M1_IN1], pwm_motor.channels[MOTOR_M1_IN2])
-motor1.decay_mode = motor.SLOW_DECAY
+motor1 = DCMotor(output.channel(MOTOR_M1_IN1, PRIORITY_MOTOR),
+                       output.channel(MOTOR_M1_IN2, PRIORITY_MOTOR))
+motor1.decay_mode = SLOW_DECAY
+
+# Dernier throttle commande (le getter de DCMotor le recalcule depuis les
+# rapports cycliques arrondis, il ne sert pas a la comparaison)
+last_throttle = None
 
 
 init = 90
@@ -36,18 +44,28 @@ def Motor(channel,direction,motor_speed):
   speed = map(motor_speed, 0, 100, 0, 1.0)
   if direction == -1:
     speed = -speed
-  if channel == 1:
-    motor1.throttle = speed
+  global last_throttle
+  if channel == 1 and speed != last_throttle:
+    last_throttle = speed
+    with output.batch(PRIORITY_STOP if speed == 0 else PRIORITY_MOTOR):
+      motor1.throttle = speed
     # print("1111")
 
 
 def motorStop():
-    motor1.throttle = 0
+    global last_throttle
+    last_throttle = 0
+    with output.batch(PRIORITY_STOP):
+        motor1.throttle = 0
+        output.flush()
 
 
 def destroy():
+    global last_throttle
     motorStop()
-    pwm_motor.deinit()
+    bus.execute(pwm_motor.deinit, priority=PRIORITY_STOP)
+    last_throttle = None
+    output.invalidate()
 
 
 def ramp(sens):
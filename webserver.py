@@ -1,4 +1,5 @@
 # -*- coding: Windows-1252 -*-
+import robot_memory_path  # Modules partages de Robot_memory/ (hardware, i2c_bus...)
 from flask import Flask, render_template, redirect, url_for, request, Response, send_file
 from temp import Adeept_SPI_LedPixel
 import atexit  # Pour exécuter une fonction à l'arrêt du serveur
@@ -8,8 +9,11 @@ from motor import *
 from led_techno import * 
 from servo_reboot import *
 from camera import *
+from mjpeg_broadcaster import MjpegBroadcaster
+from hardware import create_camera  # Camera reelle ou simulee (ROBOT_HARDWARE=sim)
 
-camera = PiCameraStream()
+camera = create_camera()
+mjpeg_broadcaster = MjpegBroadcaster(camera)
 
 
 app = Flask(__name__)
@@ -67,11 +71,8 @@ def angle_reboot():
   
 #camera 
 def gen():
-        while True:
-            frame = camera.get_frame()
-            if frame:
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+        # Un seul encodage JPEG par frame, partage entre tous les clients
+        return mjpeg_broadcaster.stream()
   
 @app.route('/video_feed')
 def video():
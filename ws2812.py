@@ -1,7 +1,8 @@
 # -*- coding: Windows-1252 -*-
 
+import robot_memory_path  # Modules partages de Robot_memory/ (hardware, i2c_bus...)
 import time
-import spidev
+from hardware import spidev
 import threading
 import numpy
 